@@ -0,0 +1,450 @@
+"""
+Mergeable statistics accumulators.
+
+Each accumulator can be updated with a chunk of values and merged with
+another accumulator of the same kind, so summaries can be computed in one
+pass over data that never fits in memory at once, or combined across
+workers.
+"""
+import warnings
+import numpy as np
+import pandas as pd
+from analysis.correlation import pairwise_sums, corr_from_sums
+
+# Capacity of a quantile sketch level; rank error is roughly 1/k
+DEFAULT_SKETCH_K = 2048
+
+# Number of distinct categories tracked exactly before falling back to heavy hitters
+DEFAULT_TOPK_CAPACITY = 1000
+
+# Differences below this count as floating point noise when verifying accumulators
+EXACT_TOLERANCE = 1e-9
+
+class MomentAccumulator:
+    """Count, mean, variance, min and max via Welford/Chan updates."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        """
+        Add a chunk of values (NaNs are ignored).
+
+        Args:
+            values (ndarray): Numeric values
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+
+        chunk = MomentAccumulator()
+        chunk.count = values.size
+        chunk.mean = float(values.mean())
+        chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        self.merge(chunk)
+
+    def merge(self, other):
+        """Combine another accumulator into this one."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance (ddof=1), matching pandas."""
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.variance))
+
+class QuantileSketch:
+    """
+    Mergeable approximate quantile sketch (a simplified KLL compactor).
+
+    Values are buffered in levels; whenever a level holds more than k items
+    it is sorted and every other item is promoted to the next level with
+    twice the weight. Memory stays O(k log(n / k)).
+    """
+
+    def __init__(self, k=DEFAULT_SKETCH_K, seed=42):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size:
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+
+    def merge(self, other):
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if items.size > self.k:
+                items = np.sort(items)
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level] = np.empty(0)
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    @property
+    def count(self):
+        """Approximate number of values seen."""
+        return int(sum(items.size * 2 ** level for level, items in enumerate(self.levels)))
+
+    def quantiles(self, qs):
+        """
+        Estimate quantiles.
+
+        Args:
+            qs (list): Quantiles between 0 and 1
+
+        Returns:
+            list: Estimated values (NaN when empty)
+        """
+        values = np.concatenate(self.levels)
+        if values.size == 0:
+            return [np.nan for _ in qs]
+        weights = np.concatenate([
+            np.full(items.size, 2.0 ** level) for level, items in enumerate(self.levels)
+        ])
+        order = np.argsort(values)
+        values, cumulative = values[order], np.cumsum(weights[order])
+        targets = np.asarray(qs) * cumulative[-1]
+        idx = np.minimum(np.searchsorted(cumulative, targets, side='left'), values.size - 1)
+        return [float(v) for v in values[idx]]
+
+class TopKAccumulator:
+    """
+    Category counts that stay exact up to a capacity.
+
+    Beyond the capacity only the most frequent categories are kept, so
+    counts become lower bounds and the distinct count is reported as
+    unknown.
+    """
+
+    def __init__(self, capacity=DEFAULT_TOPK_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.truncated = False
+
+    def update(self, values):
+        counts = pd.Series(values).value_counts(dropna=True)
+        self._add(counts.items())
+
+    def merge(self, other):
+        self._add(other.counts.items())
+        self.truncated = self.truncated or other.truncated
+        return self
+
+    def _add(self, items):
+        for value, count in items:
+            if count:
+                self.counts[value] = self.counts.get(value, 0) + int(count)
+        if len(self.counts) > self.capacity:
+            top = sorted(self.counts.items(), key=lambda x: x[1], reverse=True)[:self.capacity]
+            self.counts = dict(top)
+            self.truncated = True
+
+    @property
+    def n_unique(self):
+        """Exact distinct count, or None once the capacity was exceeded."""
+        return None if self.truncated else len(self.counts)
+
+    def top(self, n=10):
+        return dict(sorted(self.counts.items(), key=lambda x: x[1], reverse=True)[:n])
+
+class CoMomentAccumulator:
+    """
+    Pairwise-complete co-moments of numeric columns, for exact correlations.
+
+    Sums are kept relative to a fixed shift (the means of the first chunk),
+    which keeps them well conditioned; merging re-bases the other side's
+    sums onto this shift, so the result does not depend on chunking.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.rows = 0
+        self.shift = None
+        size = (len(self.columns), len(self.columns))
+        self.n = np.zeros(size)
+        self.sum_x = np.zeros(size)
+        self.sum_xx = np.zeros(size)
+        self.sum_xy = np.zeros(size)
+
+    def update(self, chunk):
+        """
+        Add a chunk of rows.
+
+        Args:
+            chunk (DataFrame): Rows containing the accumulated columns
+        """
+        values = chunk[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        if len(values) == 0:
+            return
+        if self.shift is None:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                self.shift = np.nan_to_num(np.nanmean(values, axis=0))
+
+        n, sum_x, sum_xx, sum_xy = pairwise_sums(values, self.shift, np.float64)
+        self.n = self.n + n
+        self.sum_x = self.sum_x + sum_x
+        self.sum_xx = self.sum_xx + sum_xx
+        self.sum_xy = self.sum_xy + sum_xy
+        self.rows += len(values)
+
+    def merge(self, other):
+        """Combine another accumulator over the same columns into this one."""
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge co-moments of different columns")
+        if other.shift is None:
+            return self
+        if self.shift is None:
+            self.shift = other.shift.copy()
+
+        # Sums of (x - other.shift) become sums of (x - self.shift) = (x - other.shift) + d
+        d = other.shift - self.shift
+        n, sum_x = other.n, other.sum_x
+        self.n = self.n + n
+        self.sum_x = self.sum_x + sum_x + d[:, None] * n
+        self.sum_xx = self.sum_xx + other.sum_xx + 2 * d[:, None] * sum_x + (d ** 2)[:, None] * n
+        self.sum_xy = (self.sum_xy + other.sum_xy + d[None, :] * sum_x + d[:, None] * sum_x.T
+                       + np.outer(d, d) * n)
+        self.rows += other.rows
+        return self
+
+    def correlation(self):
+        """Pearson correlation matrix as a DataFrame (NaN where undefined)."""
+        corr = corr_from_sums(self.n, self.sum_x, self.sum_xx, self.sum_xy)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+class ColumnAccumulator:
+    """Per-column accumulator combining missing counts with moments, quantiles or top-k."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.rows = 0
+        self.missing = 0
+        self.moments = MomentAccumulator() if kind == 'numeric' else None
+        self.sketch = QuantileSketch() if kind == 'numeric' else None
+        self.topk = TopKAccumulator() if kind == 'categorical' else None
+
+    def update(self, series):
+        self.rows += len(series)
+        self.missing += int(series.isna().sum())
+        if self.kind == 'numeric':
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            self.moments.update(values)
+            self.sketch.update(values)
+        elif self.kind == 'categorical':
+            self.topk.update(series)
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.missing += other.missing
+        if self.moments is not None:
+            self.moments.merge(other.moments)
+            self.sketch.merge(other.sketch)
+        if self.topk is not None:
+            self.topk.merge(other.topk)
+        return self
+
+    def describe(self):
+        """Numeric summary in the shape of DataFrame.describe()."""
+        m = self.moments
+        q25, q50, q75 = self.sketch.quantiles([0.25, 0.5, 0.75])
+        return {
+            "count": float(m.count),
+            "mean": m.mean if m.count else np.nan,
+            "std": m.std,
+            "min": m.min if m.count else np.nan,
+            "25%": q25,
+            "50%": q50,
+            "75%": q75,
+            "max": m.max if m.count else np.nan,
+        }
+
+def column_kind(dtype):
+    """Classify a dtype as numeric, categorical, datetime or other."""
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'other'
+    if pd.api.types.is_numeric_dtype(dtype):
+        return 'numeric'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'datetime'
+    if isinstance(dtype, pd.CategoricalDtype) or dtype == object:
+        return 'categorical'
+    return 'other'
+
+class DatasetAccumulator:
+    """
+    One-pass, mergeable equivalent of DataAnalysisTool._generate_data_summary.
+
+    Feed it DataFrame chunks with update(); summary() returns the same
+    structure as the in-memory summary, with approximate quartiles flagged
+    by an "approximate" entry.
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self.dtypes = {}
+        self.n_rows = 0
+        # Co-moments of the columns that were numeric in the first chunk
+        self.comoments = None
+
+    def update(self, chunk):
+        self.n_rows += len(chunk)
+        for col in chunk.columns:
+            if col not in self.columns:
+                self.dtypes[col] = chunk[col].dtype
+                self.columns[col] = ColumnAccumulator(column_kind(chunk[col].dtype))
+            self.columns[col].update(chunk[col])
+
+        if self.comoments is None:
+            self.comoments = CoMomentAccumulator(self.numeric_columns)
+        self.comoments.update(chunk)
+
+    def merge(self, other):
+        self.n_rows += other.n_rows
+        for col, acc in other.columns.items():
+            if col in self.columns:
+                self.columns[col].merge(acc)
+            else:
+                self.columns[col] = acc
+                self.dtypes[col] = other.dtypes[col]
+        if other.comoments is not None:
+            if self.comoments is None:
+                self.comoments = CoMomentAccumulator(other.comoments.columns)
+            self.comoments.merge(other.comoments)
+        return self
+
+    @property
+    def numeric_columns(self):
+        return [col for col, acc in self.columns.items() if acc.kind == 'numeric']
+
+    def summary(self):
+        n_rows, n_cols = self.n_rows, len(self.columns)
+
+        data_types = {}
+        for dtype in self.dtypes.values():
+            data_types[str(dtype)] = data_types.get(str(dtype), 0) + 1
+
+        missing_values = sum(acc.missing for acc in self.columns.values())
+        missing_percentage = (missing_values / (n_rows * n_cols)) * 100 if n_rows and n_cols else 0.0
+
+        by_kind = {'numeric': [], 'categorical': [], 'datetime': []}
+        for col, acc in self.columns.items():
+            if acc.kind in by_kind:
+                by_kind[acc.kind].append(col)
+
+        numeric_summary = None
+        approximate = None
+        if by_kind['numeric']:
+            numeric_summary = {col: self.columns[col].describe() for col in by_kind['numeric']}
+            approximate = {
+                "fields": ["25%", "50%", "75%"],
+                "method": "quantile_sketch",
+                "rank_error": 1 / DEFAULT_SKETCH_K
+            }
+
+        categorical_summary = {}
+        for col in by_kind['categorical']:
+            topk = self.columns[col].topk
+            if topk.n_unique is not None and topk.n_unique <= 20:
+                categorical_summary[col] = topk.top(10)
+
+        return {
+            "n_rows": n_rows,
+            "n_cols": n_cols,
+            "data_types": data_types,
+            "missing_values": {
+                "count": int(missing_values),
+                "percentage": float(missing_percentage)
+            },
+            "columns": by_kind,
+            "numeric_summary": numeric_summary,
+            "categorical_summary": categorical_summary,
+            "approximate": approximate
+        }
+
+def verify_accumulator(accumulator, chunks):
+    """
+    Compare accumulated statistics with a recomputation from all rows.
+
+    Row and missing counts must match exactly; moments and correlations
+    must agree to floating point precision. Quartiles come from randomized
+    sketches and are approximate by design, so they are not compared.
+
+    Args:
+        accumulator (DatasetAccumulator): Incrementally updated accumulator
+        chunks (iterable): Every row of the dataset, as DataFrames
+
+    Returns:
+        dict: Differences found and whether the results are exact
+    """
+    recomputed = DatasetAccumulator()
+    for chunk in chunks:
+        recomputed.update(chunk)
+
+    counts_equal = accumulator.n_rows == recomputed.n_rows and all(
+        acc.rows == recomputed.columns[col].rows and acc.missing == recomputed.columns[col].missing
+        for col, acc in accumulator.columns.items()
+    )
+
+    moment_diff = 0.0
+    for col in accumulator.numeric_columns:
+        ours, theirs = accumulator.columns[col].moments, recomputed.columns[col].moments
+        for a, b in ((ours.count, theirs.count), (ours.mean, theirs.mean), (ours.variance, theirs.variance),
+                     (ours.min, theirs.min), (ours.max, theirs.max)):
+            if np.isfinite(a) or np.isfinite(b):
+                moment_diff = max(moment_diff, abs(a - b) / max(abs(b), 1.0))
+
+    corr_diff = 0.0
+    if accumulator.comoments is not None and recomputed.comoments is not None:
+        ours, theirs = accumulator.comoments.correlation().to_numpy(), recomputed.comoments.correlation().to_numpy()
+        if not np.array_equal(np.isnan(ours), np.isnan(theirs)):
+            corr_diff = np.inf
+        elif ours.size:
+            corr_diff = float(np.nanmax(np.abs(ours - theirs), initial=0.0))
+
+    return {
+        "rows": int(recomputed.n_rows),
+        "counts_equal": bool(counts_equal),
+        "moments_max_relative_diff": float(moment_diff),
+        "correlation_max_abs_diff": float(corr_diff),
+        "exact": bool(counts_equal and moment_diff < EXACT_TOLERANCE and corr_diff < EXACT_TOLERANCE)
+    }
@@ -0,0 +1,108 @@
+"""
+K-means clustering with a parallel sweep over the number of clusters.
+
+Every candidate k is fitted once, in parallel, and scored with a silhouette
+computed on a bounded random sample. The winning model's labels are reused
+directly, and per-cluster statistics come from a single groupby.
+scikit-learn and joblib are imported on first use.
+"""
+import os
+
+# Largest number of clusters tried
+MAX_CLUSTERS = 10
+
+# Rows above which MiniBatchKMeans replaces full KMeans
+MINIBATCH_ROWS = int(os.environ.get("CLUSTERING_MINIBATCH_ROWS", 10000))
+
+# Rows used to compute each silhouette score
+SILHOUETTE_SAMPLE_ROWS = int(os.environ.get("CLUSTERING_SILHOUETTE_ROWS", 5000))
+
+# Parallel fits; -1 uses every core
+CLUSTERING_JOBS = int(os.environ.get("CLUSTERING_JOBS", -1))
+
+def _make_model(k, n_rows):
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    if n_rows > MINIBATCH_ROWS:
+        return MiniBatchKMeans(n_clusters=k, random_state=42, n_init=3, batch_size=4096)
+    return KMeans(n_clusters=k, random_state=42, n_init=10)
+
+def _fit_candidate(k, scaled_data):
+    """Fit one k and score it; returns (k, score, model, labels)."""
+    from sklearn.metrics import silhouette_score
+
+    model = _make_model(k, len(scaled_data))
+    labels = model.fit_predict(scaled_data)
+    sample_size = SILHOUETTE_SAMPLE_ROWS if len(scaled_data) > SILHOUETTE_SAMPLE_ROWS else None
+    score = silhouette_score(scaled_data, labels, sample_size=sample_size, random_state=42)
+    return k, float(score), model, labels
+
+def cluster_numeric(numeric_data, max_clusters=MAX_CLUSTERS, n_jobs=CLUSTERING_JOBS):
+    """
+    Cluster rows of numeric data, choosing k by silhouette score.
+
+    Args:
+        numeric_data (DataFrame): Numeric columns only (missing values allowed)
+        max_clusters (int): Largest k to try
+        n_jobs (int): Parallel fits
+
+    Returns:
+        dict: optimal_clusters, silhouette_scores and per-cluster analysis
+    """
+    from sklearn.preprocessing import StandardScaler
+    from joblib import Parallel, delayed, cpu_count
+    from threadpoolctl import threadpool_limits
+
+    # Handle missing values for clustering
+    numeric_data_clean = numeric_data.fillna(numeric_data.mean())
+    scaled_data = StandardScaler().fit_transform(numeric_data_clean)
+
+    n_rows = len(numeric_data)
+    max_clusters = max(2, min(max_clusters, n_rows // 10))  # Limit based on data size
+
+    # Spread cores over candidates first, then over the OpenMP threads of each fit;
+    # unlimited threads per fit would oversubscribe the CPU
+    ks = range(2, max_clusters + 1)
+    cores = cpu_count() if n_jobs == -1 else max(1, n_jobs)
+    candidate_jobs = min(cores, len(ks))
+    fit_threads = max(1, cpu_count() // candidate_jobs)
+
+    # Threads share the scaled matrix; the estimators release the GIL while fitting
+    with threadpool_limits(limits=fit_threads):
+        candidates = Parallel(n_jobs=candidate_jobs, prefer="threads")(
+            delayed(_fit_candidate)(k, scaled_data) for k in ks
+        )
+    best_k, _, _, labels = max(candidates, key=lambda c: c[1])
+
+    # Summarize every cluster and column in one pass
+    grouped = numeric_data.groupby(labels)
+    sizes = grouped.size()
+    stats = grouped.agg(['mean', 'median', 'std'])
+
+    cluster_analysis = {}
+    for cluster_id in range(best_k):
+        size = int(sizes.get(cluster_id, 0))
+        summary = {}
+        if cluster_id in stats.index:
+            row = stats.loc[cluster_id]
+            summary = {
+                col: {
+                    "mean": float(row[(col, 'mean')]),
+                    "median": float(row[(col, 'median')]),
+                    "std": float(row[(col, 'std')])
+                }
+                for col in numeric_data.columns
+            }
+        cluster_analysis[f"cluster_{cluster_id}"] = {
+            "size": size,
+            "percentage": round((size / n_rows) * 100, 2),
+            "summary": summary
+        }
+
+    return {
+        "optimal_clusters": int(best_k),
+        "silhouette_scores": {k: score for k, score, _, _ in candidates},
+        "cluster_analysis": cluster_analysis,
+        "algorithm": "minibatch_kmeans" if n_rows > MINIBATCH_ROWS else "kmeans",
+        "silhouette_sample_rows": min(n_rows, SILHOUETTE_SAMPLE_ROWS)
+    }
@@ -0,0 +1,254 @@
+"""
+Correlation matrices computed once per dataset version.
+
+Pearson correlations are computed with matrix products, so the work runs
+in BLAS instead of pandas' per-pair loop. Missing values are handled
+pairwise like DataFrame.corr(): every pair only uses the rows where both
+columns are present. Spearman correlations are Pearson correlations of
+column ranks. Tall data can be correlated on a uniform row sample.
+"""
+import os
+import warnings
+import numpy as np
+import pandas as pd
+
+# Supported correlation methods
+CORRELATION_METHODS = ('pearson', 'spearman')
+
+# Absolute correlation above which a pair is reported as strong
+STRONG_CORRELATION = 0.7
+
+# Rows above which correlations are estimated on a sample
+DEFAULT_SAMPLE_ROWS = int(os.environ.get("CORRELATION_SAMPLE_ROWS", 1000000))
+
+# Floating point type of the matrix products (float64 or float32)
+DEFAULT_DTYPE = np.dtype(os.environ.get("CORRELATION_DTYPE", "float64"))
+
+def pairwise_sums(values, means, dtype):
+    """
+    Pairwise-complete sums of mean-centered columns.
+
+    Returns:
+        tuple: (n, sum_x, sum_xx, sum_xy), where [i, j] only covers rows
+            where both columns i and j are present
+    """
+    present = ~np.isnan(values)
+    x = np.where(present, values - means, 0).astype(dtype, copy=False)
+
+    if present.all():
+        n = np.asarray(values.shape[0], dtype=dtype)
+        sx = x.sum(axis=0)
+        sum_x = np.broadcast_to(sx[:, None], (x.shape[1], x.shape[1]))
+        sum_xx = np.broadcast_to((x * x).sum(axis=0)[:, None], sum_x.shape)
+    else:
+        m = present.astype(dtype)
+        n = m.T @ m
+        sum_x = x.T @ m
+        sum_xx = (x * x).T @ m
+    return n, sum_x, sum_xx, x.T @ x
+
+def corr_from_sums(n, sum_x, sum_xx, sum_xy):
+    """Correlation matrix from the output of pairwise_sums."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sum_xy - sum_x * sum_x.T / n
+        var = sum_xx - sum_x * sum_x / n
+        corr = cov / np.sqrt(var * var.T)
+
+    corr = np.clip(corr.astype(np.float64), -1.0, 1.0)
+    np.fill_diagonal(corr, np.where(np.diag(var) > 0, 1.0, np.nan))
+    return corr
+
+def pairwise_corr(values, dtype=DEFAULT_DTYPE):
+    """
+    Pearson correlation of the columns of a 2-D array with pairwise-complete rows.
+
+    Args:
+        values (ndarray): n_rows x n_cols array, NaN for missing
+        dtype (dtype): float32 or float64 for the matrix products
+
+    Returns:
+        ndarray: n_cols x n_cols correlation matrix (NaN where undefined)
+    """
+    values = np.asarray(values, dtype=dtype)
+
+    # Center on column means first so the sums stay well conditioned
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        means = np.nan_to_num(np.nanmean(values, axis=0))
+    return corr_from_sums(*pairwise_sums(values, means, dtype))
+
+def chunked_corr(chunks, columns, means, dtype=DEFAULT_DTYPE):
+    """
+    Exact Pearson correlation over data read in chunks.
+
+    The pairwise sums of every chunk are added up, so the result matches
+    pairwise_corr on the concatenated data without holding it in memory.
+
+    Args:
+        chunks (iterable): DataFrames containing the columns
+        columns (list): Columns to correlate
+        means (ndarray): Column means of the whole data, used for centering
+        dtype (dtype): float32 or float64 for the matrix products
+
+    Returns:
+        tuple: (correlation DataFrame, rows read)
+    """
+    means = np.nan_to_num(np.asarray(means, dtype=dtype))
+    totals, rows = None, 0
+    for chunk in chunks:
+        values = chunk[columns].to_numpy(dtype=dtype, na_value=np.nan)
+        sums = pairwise_sums(values, means, dtype)
+        totals = sums if totals is None else tuple(a + b for a, b in zip(totals, sums))
+        rows += len(values)
+
+    corr = corr_from_sums(*totals) if totals is not None and columns else np.full((len(columns),) * 2, np.nan)
+    return pd.DataFrame(corr, index=columns, columns=columns), rows
+
+def strong_pairs(corr_matrix, threshold=STRONG_CORRELATION):
+    """
+    Column pairs whose absolute correlation exceeds a threshold.
+
+    Args:
+        corr_matrix (DataFrame): Square correlation matrix
+        threshold (float): Absolute correlation cut-off
+
+    Returns:
+        list: {"variables", "correlation", "interpretation"} dicts in
+            row-major upper-triangle order
+    """
+    columns = corr_matrix.columns.tolist()
+    i, j = np.triu_indices(len(columns), k=1)
+    values = corr_matrix.to_numpy()[i, j]
+    keep = np.abs(values) > threshold
+    return [
+        {
+            "variables": [columns[a], columns[b]],
+            "correlation": float(value),
+            "interpretation": "strong positive" if value > 0 else "strong negative"
+        }
+        for a, b, value in zip(i[keep], j[keep], values[keep])
+    ]
+
+def correlation_report(corr_matrix, method, rows_used, threshold=STRONG_CORRELATION):
+    """
+    Rounded matrix and strong pairs in the /api/analyze result format.
+
+    Returns:
+        dict: correlation_matrix, strong_correlations, method and rows used
+    """
+    corr_matrix = corr_matrix.round(2)
+    return {
+        "correlation_matrix": corr_matrix.to_dict(),
+        "strong_correlations": strong_pairs(corr_matrix, threshold),
+        "method": method,
+        "rows_used": int(rows_used),
+    }
+
+class CorrelationEngine:
+    """
+    Correlation matrices of one data version, computed lazily and cached.
+
+    Matrices are cached per method and mode, so the analysis report, the
+    heatmap and the scatter plot of the most correlated pair share one
+    computation.
+    """
+
+    def __init__(self, data, columns, version=0, sample_rows=DEFAULT_SAMPLE_ROWS, dtype=DEFAULT_DTYPE):
+        """
+        Args:
+            data (DataFrame): Dataset
+            columns (list): Numeric columns to correlate
+            version (int): Data version the engine belongs to
+            sample_rows (int): Row count above which approximate mode samples
+            dtype (dtype): float32 or float64 for the matrix products
+        """
+        self.data = data
+        self.columns = list(columns)
+        self.version = version
+        self.sample_rows = sample_rows
+        self.dtype = dtype
+        self._matrices = {}
+
+    def _values(self, method, approximate):
+        frame = self.data[self.columns]
+        rows = len(frame)
+        if approximate and rows > self.sample_rows:
+            frame = frame.sample(n=self.sample_rows, random_state=42)
+            rows = self.sample_rows
+        if method == 'spearman':
+            frame = frame.rank()
+        return frame.to_numpy(dtype=self.dtype, na_value=np.nan), rows
+
+    def matrix(self, method='pearson', approximate=None):
+        """
+        Correlation matrix of the numeric columns.
+
+        Args:
+            method (str): 'pearson' or 'spearman'
+            approximate (bool, optional): Use a row sample; by default only
+                when the data has more than sample_rows rows
+
+        Returns:
+            DataFrame: Correlation matrix
+        """
+        if method not in CORRELATION_METHODS:
+            raise ValueError(f"Unsupported correlation method: {method}")
+        if approximate is None:
+            approximate = len(self.data) > self.sample_rows
+
+        key = (method, bool(approximate))
+        if key not in self._matrices:
+            values, rows = self._values(method, approximate)
+            corr = pairwise_corr(values, self.dtype) if self.columns else np.empty((0, 0))
+            self._matrices[key] = (pd.DataFrame(corr, index=self.columns, columns=self.columns), rows)
+        return self._matrices[key][0]
+
+    def seed(self, method, corr_matrix, rows):
+        """
+        Install a matrix computed elsewhere from every row (e.g. by
+        accumulators), so it is not recomputed; it serves exact and
+        approximate requests alike.
+        """
+        for approximate in (False, True):
+            self._matrices[(method, approximate)] = (corr_matrix, rows)
+
+    def rows_used(self, method='pearson', approximate=None):
+        """Number of rows the cached matrix was computed from."""
+        if approximate is None:
+            approximate = len(self.data) > self.sample_rows
+        self.matrix(method, approximate)
+        return self._matrices[(method, bool(approximate))][1]
+
+    def top_pair(self, method='pearson'):
+        """
+        The most strongly correlated distinct pair of columns.
+
+        Returns:
+            tuple: (column, column), or None with fewer than two usable columns
+        """
+        corr = self.matrix(method).to_numpy()
+        if corr.shape[0] < 2:
+            return None
+        i, j = np.triu_indices(corr.shape[0], k=1)
+        strength = np.abs(corr[i, j])
+        # Perfect correlations are excluded, as they usually are derived columns
+        strength[~(strength < 1)] = np.nan
+        if np.isnan(strength).all():
+            return None
+        best = int(np.nanargmax(strength))
+        return self.columns[i[best]], self.columns[j[best]]
+
+    def report(self, method='pearson', threshold=STRONG_CORRELATION, approximate=None):
+        """
+        Rounded matrix and strong pairs in the /api/analyze result format.
+
+        Args:
+            method (str): 'pearson' or 'spearman'
+            threshold (float): Absolute correlation of a strong pair
+            approximate (bool, optional): As in matrix()
+
+        Returns:
+            dict: correlation_matrix, strong_correlations, method and rows used
+        """
+        return correlation_report(self.matrix(method, approximate), method,
+                                  self.rows_used(method, approximate), threshold)
@@ -0,0 +1,146 @@
+"""
+Byte budgets for the on-disk caches.
+
+Each cache directory has a size limit. After a write, the least recently
+used files (or, for dataset stores, whole subdirectories) are deleted until
+the directory fits it again. Readers touch a file's modification time on
+every hit, so mtime serves as the access time and no index has to be kept
+in sync across processes.
+"""
+import os
+import time
+import shutil
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Files used this recently are never evicted, e.g. a snapshot a worker is about to open
+EVICTION_GRACE_SECONDS = 60
+
+def touch(path):
+    """Mark a cached file as just used."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def remove_file(path):
+    """Delete a cached file that may already be gone."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def evict_lru(directory, max_bytes, suffix, keep=None, delete=None, grace=EVICTION_GRACE_SECONDS):
+    """
+    Delete least recently used files until a cache directory fits its budget.
+
+    Args:
+        directory (str): Cache root, scanned recursively
+        max_bytes (int): Budget for the matching files
+        suffix (str or tuple): Suffixes of the files that count, e.g. ".arrow";
+            temporary files being written never match
+        keep (str, optional): Path never evicted, e.g. the file just written
+        delete (callable, optional): Called with each evicted path instead of
+            removing the file, e.g. to remove sidecar files with it
+        grace (float): Seconds since last use during which a file is kept
+
+    Returns:
+        list: Evicted paths
+    """
+    if not os.path.isdir(directory):
+        return []
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if not name.endswith(suffix):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    if total <= max_bytes:
+        return []
+    cutoff = time.time() - grace
+    evicted = []
+    for mtime, size, path in sorted(files):
+        if total <= max_bytes or mtime > cutoff:
+            break
+        if path == keep:
+            continue
+        if delete is not None:
+            delete(path)
+        else:
+            remove_file(path)
+        total -= size
+        evicted.append(path)
+        logger.info(f"Evicted {path} ({size} bytes)")
+    if total > max_bytes:
+        logger.warning(f"Cache {directory} still holds {total} bytes, over its {max_bytes} byte budget; "
+                       f"the remaining files are in use")
+    return evicted
+
+def directory_size(path):
+    """Total bytes of the files below a directory."""
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                continue
+    return total
+
+def evict_lru_dirs(directory, max_bytes, keep=(), grace=EVICTION_GRACE_SECONDS):
+    """
+    Delete least recently used subdirectories until a cache directory fits its budget.
+
+    Each immediate subdirectory (e.g. one dataset store) is evicted as a
+    whole. Its modification time, updated whenever a file is added or the
+    directory is touched, serves as the access time.
+
+    Args:
+        directory (str): Cache root
+        max_bytes (int): Budget for all subdirectories
+        keep (iterable): Paths never evicted, e.g. directories still in use
+        grace (float): Seconds since last use during which a directory is kept
+
+    Returns:
+        list: Evicted paths
+    """
+    if not os.path.isdir(directory):
+        return []
+    keep = {os.path.abspath(path) for path in keep}
+    dirs = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if not os.path.isdir(path):
+                continue
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            continue
+        dirs.append((mtime, directory_size(path), path))
+
+    total = sum(size for _, size, _ in dirs)
+    if total <= max_bytes:
+        return []
+    cutoff = time.time() - grace
+    evicted = []
+    for mtime, size, path in sorted(dirs):
+        if total <= max_bytes or mtime > cutoff:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        evicted.append(path)
+        logger.info(f"Evicted {path} ({size} bytes)")
+    if total > max_bytes:
+        logger.warning(f"Cache {directory} still holds {total} bytes, over its {max_bytes} byte budget; "
+                       f"the remaining directories are in use")
+    return evicted
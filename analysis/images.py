@@ -0,0 +1,197 @@
+"""
+Preparation of chart images for vision models, and a cache of their analyses.
+
+Uploaded charts are decoded once, checked against size limits before any
+pixels are decompressed, downscaled to CHART_MAX_SIDE and re-encoded in
+whichever of palette PNG or JPEG is smaller.
+
+Analyses are cached under an exact key: a SHA-256 of the prompt and the
+prepared image bytes. Charts with the same layout and different data look
+alike at thumbnail scale, so no similarity matching is attempted.
+"""
+import os
+import re
+import time
+import base64
+import hashlib
+import binascii
+import logging
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+from PIL import Image, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Largest accepted upload, in decoded bytes
+CHART_MAX_BYTES = int(os.environ.get("CHART_MAX_MB", 8)) * 1024 * 1024
+
+# Largest accepted image before downscaling, in pixels (guards against decompression bombs)
+CHART_MAX_INPUT_PIXELS = int(os.environ.get("CHART_MAX_INPUT_PIXELS", 40000000))
+
+# Longest side of the image sent to the model
+CHART_MAX_SIDE = int(os.environ.get("CHART_MAX_SIDE", 1024))
+
+# JPEG quality when JPEG is the smaller encoding
+JPEG_QUALITY = 85
+
+# Formats accepted from clients
+ALLOWED_FORMATS = {"PNG", "JPEG", "WEBP", "GIF", "BMP"}
+
+# Cached analyses and how long they stay valid
+CHART_CACHE_SIZE = int(os.environ.get("CHART_CACHE_SIZE", 256))
+CHART_CACHE_TTL_SECONDS = float(os.environ.get("CHART_CACHE_TTL_SECONDS", 3600))
+
+_DATA_URL = re.compile(r"^data:[^,]*?;base64,")
+
+class ImageTooLarge(ValueError):
+    """The image exceeds CHART_MAX_BYTES or CHART_MAX_INPUT_PIXELS."""
+
+def decode_image_data(image_data, max_bytes=CHART_MAX_BYTES):
+    """
+    Raw bytes of an uploaded image, rejecting oversized payloads before decoding.
+
+    Args:
+        image_data (str or bytes): Base64 string, optionally a data URL, or raw bytes
+        max_bytes (int): Largest accepted size in bytes
+
+    Returns:
+        bytes: Image file content
+
+    Raises:
+        ImageTooLarge: If the payload is larger than max_bytes
+        ValueError: If the string is not valid base64
+    """
+    if isinstance(image_data, bytes):
+        if len(image_data) > max_bytes:
+            raise ImageTooLarge(f"Image is larger than {max_bytes // (1024 * 1024)} MB")
+        return image_data
+
+    image_data = _DATA_URL.sub("", image_data.strip(), count=1)
+    # Four base64 characters carry three bytes; check before allocating the decoded copy
+    if len(image_data) * 3 // 4 > max_bytes:
+        raise ImageTooLarge(f"Image is larger than {max_bytes // (1024 * 1024)} MB")
+    try:
+        return base64.b64decode(image_data, validate=True)
+    except binascii.Error:
+        raise ValueError("Image data is not valid base64")
+
+def _encode(image):
+    """Smallest of palette PNG (flat chart colors) and JPEG (photos, gradients)."""
+    candidates = []
+
+    png = BytesIO()
+    image.quantize(colors=256, method=Image.Quantize.MEDIANCUT).save(png, format="PNG", optimize=True)
+    candidates.append((png.getvalue(), "image/png"))
+
+    jpeg = BytesIO()
+    image.save(jpeg, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    candidates.append((jpeg.getvalue(), "image/jpeg"))
+
+    return min(candidates, key=lambda candidate: len(candidate[0]))
+
+def prepare_chart(image_data, max_side=CHART_MAX_SIDE, max_bytes=CHART_MAX_BYTES,
+                  max_pixels=CHART_MAX_INPUT_PIXELS):
+    """
+    Decode, validate, downscale and re-encode a chart image.
+
+    Args:
+        image_data (str or bytes): Base64 string, data URL or raw bytes
+        max_side (int): Longest side of the prepared image
+        max_bytes (int): Largest accepted upload in bytes
+        max_pixels (int): Largest accepted image in pixels
+
+    Returns:
+        dict: data_url, digest (SHA-256 of the prepared bytes), width,
+            height, bytes and original_bytes
+
+    Raises:
+        ImageTooLarge: If the upload or its pixel count exceeds the limits
+        ValueError: If the data is not a supported image
+    """
+    raw = decode_image_data(image_data, max_bytes)
+    try:
+        # Opening only reads the header, so the pixel check runs before decompression
+        image = Image.open(BytesIO(raw))
+    except UnidentifiedImageError:
+        raise ValueError("Image data is not a recognized image format")
+    if image.format not in ALLOWED_FORMATS:
+        raise ValueError(f"Unsupported image format: {image.format}")
+    if image.width * image.height > max_pixels:
+        raise ImageTooLarge(f"Image has more than {max_pixels} pixels")
+
+    # draft() lets JPEG decode directly at a reduced scale
+    image.draft("RGB", (max_side, max_side))
+    image.load()
+    if image.mode in ("RGBA", "LA", "P"):
+        # Charts with transparent backgrounds are shown on white
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, "white")
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    else:
+        image = image.convert("RGB")
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    content, mime = _encode(image)
+    return {
+        "data_url": f"data:{mime};base64,{base64.b64encode(content).decode('ascii')}",
+        "digest": hashlib.sha256(content).hexdigest(),
+        "width": image.width,
+        "height": image.height,
+        "bytes": len(content),
+        "original_bytes": len(raw),
+    }
+
+def chart_cache_key(prompt, chart):
+    """Exact cache key of an analysis: the prompt and the prepared image bytes."""
+    return hashlib.sha256(f"{prompt}\0{chart['digest']}".encode()).hexdigest()
+
+class ChartAnalysisCache:
+    """Analyses of chart images by exact key, least recently used first out."""
+
+    def __init__(self, size=CHART_CACHE_SIZE, ttl=CHART_CACHE_TTL_SECONDS):
+        """
+        Args:
+            size (int): Analyses kept; 0 disables the cache
+            ttl (float): Seconds an analysis stays valid
+        """
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key):
+        """
+        Cached analysis of a chart, or None.
+
+        Args:
+            key (str): Output of chart_cache_key
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, analysis):
+        """Store the analysis of a chart."""
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), analysis)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached analyses."""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,183 @@
+"""
+Feature importance of every numeric column as a target, fitted in parallel.
+
+Each numeric column is predicted from the others. Targets are fitted in a
+joblib process pool, with trees of a random forest spread over the cores
+left per target. Rows are subsampled above a threshold, and results are
+cached on disk by dataset fingerprint and mode so repeated analyses of the
+same data do no model fitting at all. The least recently used results are
+evicted beyond IMPORTANCE_CACHE_MB.
+"""
+import os
+import json
+import logging
+import numpy as np
+
+from analysis.diskcache import evict_lru, touch
+from analysis.jobs import cores_per_stage
+
+logger = logging.getLogger(__name__)
+
+# Supported estimators
+IMPORTANCE_MODES = ('random_forest', 'hist_gradient_boosting', 'mutual_information')
+
+# Rows above which a random sample is used
+IMPORTANCE_SAMPLE_ROWS = int(os.environ.get("IMPORTANCE_SAMPLE_ROWS", 50000))
+
+# Worker processes; -1 uses every core (inside an analysis job, that worker's share of them)
+IMPORTANCE_JOBS = int(os.environ.get("IMPORTANCE_JOBS", -1))
+
+# Where results are cached
+DEFAULT_IMPORTANCE_CACHE_DIR = os.environ.get("IMPORTANCE_CACHE_DIR", os.path.join("cache", "importance"))
+
+# Disk space for cached results
+IMPORTANCE_CACHE_BYTES = int(os.environ.get("IMPORTANCE_CACHE_MB", 64)) * 1024 * 1024
+
+# Targets with a larger share of missing values are skipped
+MAX_TARGET_MISSING = 0.2
+
+def _fill_missing(values):
+    """Replace NaNs with column means (0 for columns without values)."""
+    with np.errstate(invalid='ignore'):
+        means = np.nan_to_num(np.nanmean(np.where(np.isnan(values).all(axis=0), 0, values), axis=0))
+    return np.where(np.isnan(values), means, values)
+
+def _target_importance(values, columns, target, mode, tree_jobs):
+    """
+    Importance of the other columns for predicting one target.
+
+    Args:
+        values (ndarray): Numeric data, rows x columns
+        columns (list): Column names
+        target (int): Index of the target column
+        mode (str): One of IMPORTANCE_MODES
+        tree_jobs (int): Threads for forest fitting
+
+    Returns:
+        dict: features and model_score, or None when the target is skipped
+    """
+    from sklearn.model_selection import train_test_split
+
+    y = values[:, target]
+    X = np.delete(values, target, axis=1)
+    features = [col for i, col in enumerate(columns) if i != target]
+
+    # Skip if too many missing values, or if all remaining columns are empty
+    if np.isnan(y).mean() > MAX_TARGET_MISSING or np.isnan(X).all():
+        return None
+
+    X = _fill_missing(X)
+    y = np.where(np.isnan(y), np.nanmean(y), y)
+
+    if mode == 'mutual_information':
+        from sklearn.feature_selection import mutual_info_regression
+
+        importance = mutual_info_regression(X, y, random_state=42)
+        model_score = None
+    else:
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+        if mode == 'random_forest':
+            from sklearn.ensemble import RandomForestRegressor
+
+            model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=tree_jobs)
+            model.fit(X_train, y_train)
+            importance = model.feature_importances_
+        else:
+            from sklearn.ensemble import HistGradientBoostingRegressor
+            from sklearn.inspection import permutation_importance
+
+            model = HistGradientBoostingRegressor(random_state=42)
+            model.fit(X_train, y_train)
+            importance = permutation_importance(
+                model, X_test, y_test, n_repeats=5, random_state=42
+            ).importances_mean
+        model_score = float(model.score(X_test, y_test))
+
+    # Normalize to shares so every mode reads like forest importances
+    importance = np.clip(np.nan_to_num(importance), 0, None)
+    total = importance.sum()
+    if total > 0:
+        importance = importance / total
+
+    result = {
+        "features": [
+            {"feature": col, "importance": float(imp)}
+            for col, imp in zip(features, importance)
+        ],
+        "model_score": model_score
+    }
+    # Sort features by importance
+    result["features"].sort(key=lambda x: x["importance"], reverse=True)
+    return result
+
+def _cache_path(cache_dir, fingerprint, mode):
+    return os.path.join(cache_dir, f"{fingerprint}-{mode}.json")
+
+def feature_importance(numeric_data, mode='random_forest', fingerprint=None,
+                       cache_dir=DEFAULT_IMPORTANCE_CACHE_DIR, n_jobs=IMPORTANCE_JOBS,
+                       sample_rows=IMPORTANCE_SAMPLE_ROWS, cache_bytes=IMPORTANCE_CACHE_BYTES):
+    """
+    Feature importance with every numeric column in turn as the target.
+
+    Args:
+        numeric_data (DataFrame): Numeric columns only
+        mode (str): 'random_forest', 'hist_gradient_boosting' or 'mutual_information'
+        fingerprint (str, optional): Dataset fingerprint; enables the result cache
+        cache_dir (str): Directory of cached results
+        n_jobs (int): Worker processes (-1 for all cores, or this job
+            worker's share of them)
+        sample_rows (int): Rows above which a random sample is used
+        cache_bytes (int): Disk space for cached results
+
+    Returns:
+        dict: {target: {"features", "model_score", "mode", "rows_used"}}
+    """
+    if mode not in IMPORTANCE_MODES:
+        raise ValueError(f"Unsupported feature importance mode: {mode}")
+
+    # Cached results need no model fitting, so joblib is only imported past this point
+    if fingerprint is not None:
+        path = _cache_path(cache_dir, fingerprint, mode)
+        try:
+            with open(path) as f:
+                importance = json.load(f)
+            touch(path)
+            return importance
+        except FileNotFoundError:
+            pass
+
+    data = numeric_data
+    if len(data) > sample_rows:
+        data = data.sample(n=sample_rows, random_state=42)
+    values = data.to_numpy(dtype=np.float64, na_value=np.nan)
+    columns = list(data.columns)
+
+    from joblib import Parallel, delayed, cpu_count
+
+    # Spread cores over targets first, then over the trees of each forest; job workers
+    # running other stages alongside this one get only their share of the cores
+    cores = cores_per_stage(cpu_count()) if n_jobs == -1 else max(1, n_jobs)
+    target_jobs = min(cores, len(columns))
+    tree_jobs = max(1, cores // target_jobs)
+
+    results = Parallel(n_jobs=target_jobs)(
+        delayed(_target_importance)(values, columns, target, mode, tree_jobs)
+        for target in range(len(columns))
+    )
+
+    importance = {}
+    for col, result in zip(columns, results):
+        if result is not None:
+            result.update({"mode": mode, "rows_used": len(data)})
+            importance[col] = result
+
+    if fingerprint is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(importance, f, default=str)
+        os.replace(tmp_path, path)
+        logger.info(f"Cached feature importance for {fingerprint[:12]} ({mode})")
+        evict_lru(cache_dir, cache_bytes, ".json", keep=path)
+
+    return importance
@@ -0,0 +1,99 @@
+"""
+Heavy dependencies loaded on first use, with their import times recorded.
+
+scikit-learn, matplotlib/seaborn and the OpenAI SDK each take from a few
+hundred milliseconds to over a second to import and hold tens of MB once
+loaded. Modules import them inside the functions that need them, so the
+web app and spawned workers only pay for what they run. Each stage calls
+ensure_loaded() first, which imports the stage's modules and records how
+long each took.
+
+Setting WARM_UP_STAGES (comma-separated stage names, or "all") imports those
+modules when the app is imported. Under gunicorn with preload_app, that
+happens once in the master, and forked workers share the loaded pages.
+"""
+import os
+import sys
+import time
+import logging
+import importlib
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Modules each stage needs beyond pandas and numpy
+STAGE_MODULES = {
+    "outliers": ["sklearn.ensemble"],
+    "clusters": ["joblib", "sklearn.cluster", "sklearn.metrics", "sklearn.preprocessing"],
+    "important_features": ["joblib", "sklearn.ensemble", "sklearn.model_selection",
+                           "sklearn.feature_selection", "sklearn.inspection"],
+    "predict": ["sklearn.ensemble", "sklearn.model_selection", "sklearn.metrics",
+                "sklearn.linear_model", "sklearn.inspection"],
+    "plots": ["matplotlib.pyplot", "seaborn"],
+    "llm": ["openai"],
+}
+
+# Stages whose modules are imported with the app; "all" for every stage
+WARM_UP_STAGES = os.environ.get("WARM_UP_STAGES", "")
+
+# Seconds each module took to import, including dependencies not loaded before it
+IMPORT_TIMES = {}
+
+_lock = threading.Lock()
+
+def record_import_time(name, seconds):
+    """Record the import time of a module, e.g. one measured by its importer."""
+    with _lock:
+        IMPORT_TIMES[name] = round(seconds, 4)
+
+def ensure_loaded(stage):
+    """
+    Import the modules a stage needs, timing those not loaded yet.
+
+    Args:
+        stage (str): Key of STAGE_MODULES; unknown stages need nothing extra
+
+    Returns:
+        float: Seconds spent importing
+    """
+    total = 0.0
+    for name in STAGE_MODULES.get(stage, ()):
+        if name in sys.modules:
+            continue
+        started = time.perf_counter()
+        importlib.import_module(name)
+        elapsed = time.perf_counter() - started
+        record_import_time(name, elapsed)
+        total += elapsed
+    if total:
+        logger.info(f"Loaded modules for {stage} in {total:.2f}s")
+    return total
+
+def warm_up(stages=None):
+    """
+    Import the modules of several stages ahead of their first use.
+
+    Args:
+        stages (str or list, optional): Stage names, a comma-separated
+            string, or "all"; WARM_UP_STAGES by default
+
+    Returns:
+        dict: Seconds spent per stage
+    """
+    stages = WARM_UP_STAGES if stages is None else stages
+    if isinstance(stages, str):
+        stages = list(STAGE_MODULES) if stages.strip() == "all" else \
+            [stage.strip() for stage in stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGE_MODULES]
+    if unknown:
+        raise ValueError(f"Unknown warm-up stages: {', '.join(unknown)}")
+    return {stage: round(ensure_loaded(stage), 4) for stage in stages}
+
+def import_report():
+    """Which stages are ready and how long their imports took."""
+    with _lock:
+        times = dict(IMPORT_TIMES)
+    return {
+        "loaded": {stage: all(name in sys.modules for name in names) for stage, names in STAGE_MODULES.items()},
+        "import_seconds": times,
+    }
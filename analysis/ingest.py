@@ -0,0 +1,256 @@
+import os
+import time
+import logging
+import threading
+import warnings
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Rows read up front to infer the dtype plan
+DEFAULT_SAMPLE_ROWS = 10000
+
+# String columns with at most this share of distinct values become categorical
+CATEGORY_MAX_RATIO = 0.5
+
+# Share of sampled values that must parse for a column to be treated as dates
+DATE_MIN_PARSE_RATIO = 0.95
+
+class MemoryMonitor:
+    """
+    Tracks the peak resident set size of the process while active.
+
+    Used as a context manager around a load; samples /proc/self/statm on a
+    background thread so the parser itself is not slowed down.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.baseline = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+    def rss(self):
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * self._page_size
+        except OSError:
+            return 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.rss())
+
+    def __enter__(self):
+        self.baseline = self.peak = self.rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.rss())
+        return False
+
+    @property
+    def peak_increase(self):
+        """Peak RSS growth over the baseline, in bytes."""
+        return max(0, self.peak - self.baseline)
+
+def _looks_like_dates(values):
+    """Check whether sampled string values parse as dates."""
+    values = values.dropna()
+    if values.empty:
+        return False
+    # Require digits so plain labels are never coerced
+    if values.astype(str).str.contains(r'\d').mean() < DATE_MIN_PARSE_RATIO:
+        return False
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        parsed = pd.to_datetime(values, errors='coerce')
+    return parsed.notna().mean() >= DATE_MIN_PARSE_RATIO
+
+def infer_read_plan(sample):
+    """
+    Infer a dtype plan from a sample of the data.
+
+    Args:
+        sample (DataFrame): First rows of the dataset
+
+    Returns:
+        dict: {"dtype": {column: "category"}, "parse_dates": [columns]}
+    """
+    plan = {"dtype": {}, "parse_dates": []}
+
+    for col in sample.select_dtypes(include=['object']).columns:
+        values = sample[col]
+        if _looks_like_dates(values):
+            plan["parse_dates"].append(col)
+        elif values.nunique() <= max(1, len(values) * CATEGORY_MAX_RATIO):
+            plan["dtype"][col] = "category"
+
+    return plan
+
+def downcast_numeric(series):
+    """
+    Downcast a numeric column to the smallest lossless dtype.
+
+    Integers shrink to the narrowest (unsigned) integer type that holds their
+    range. Floats become float32 only when every value survives the
+    round trip exactly.
+    """
+    if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+        return series
+
+    if pd.api.types.is_integer_dtype(series):
+        if series.min() >= 0:
+            return pd.to_numeric(series, downcast='unsigned')
+        return pd.to_numeric(series, downcast='integer')
+
+    if series.dtype == np.float64:
+        as_float32 = series.astype(np.float32)
+        if np.array_equal(series.to_numpy(), as_float32.to_numpy(dtype=np.float64), equal_nan=True):
+            return as_float32
+    return series
+
+def optimize_dtypes(df, plan=None):
+    """
+    Shrink a DataFrame in place: downcast numerics, categorize low-cardinality
+    strings and parse date columns.
+
+    Args:
+        df (DataFrame): Data to optimize (modified in place)
+        plan (dict, optional): Read plan from infer_read_plan; inferred from
+            the head of df if omitted
+
+    Returns:
+        dict: Column dtype changes, e.g. {"city": "object -> category"}
+    """
+    if plan is None:
+        plan = infer_read_plan(df.head(DEFAULT_SAMPLE_ROWS))
+
+    changes = {}
+    for col in df.columns:
+        before = df[col].dtype
+
+        if col in plan["parse_dates"] and not pd.api.types.is_datetime64_any_dtype(before):
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                converted = pd.to_datetime(df[col], errors='coerce')
+        elif plan["dtype"].get(col) == "category" and before == object:
+            converted = df[col].astype('category')
+        else:
+            converted = downcast_numeric(df[col])
+
+        if converted.dtype != before:
+            df[col] = converted
+            changes[col] = f"{before} -> {converted.dtype}"
+
+    return changes
+
+def read_dataset(file_path, sample_rows=DEFAULT_SAMPLE_ROWS, plan=None):
+    """
+    Read a csv, excel or json file with a memory-lean dtype plan.
+
+    For CSV the plan is inferred from the first sample_rows rows and applied
+    while parsing, so low-cardinality strings never materialize as Python
+    objects and dates are parsed once.
+
+    Args:
+        file_path (str): Path to the file
+        sample_rows (int): Rows used to infer dtypes
+        plan (dict, optional): Previously inferred read plan to reuse
+
+    Returns:
+        tuple: (DataFrame, report dict with plan, dtype changes and memory usage)
+    """
+    file_extension = os.path.splitext(file_path)[1].lower()
+    started = time.perf_counter()
+
+    with MemoryMonitor() as monitor:
+        if file_extension == '.csv':
+            if plan is None:
+                plan = infer_read_plan(pd.read_csv(file_path, nrows=sample_rows))
+            df = pd.read_csv(file_path, dtype=plan["dtype"] or None,
+                             parse_dates=plan["parse_dates"] or None)
+        elif file_extension in ['.xls', '.xlsx']:
+            df = pd.read_excel(file_path)
+        elif file_extension == '.json':
+            df = pd.read_json(file_path)
+        else:
+            raise ValueError(f"Unsupported file format: {file_extension}")
+
+        if plan is None:
+            plan = infer_read_plan(df.head(sample_rows))
+        changes = optimize_dtypes(df, plan)
+
+    report = {
+        "plan": plan,
+        "dtype_changes": changes,
+        "memory": {
+            "steady_state_bytes": int(df.memory_usage(deep=True).sum()),
+            "peak_bytes": monitor.peak_increase,
+        },
+        "load_seconds": round(time.perf_counter() - started, 3),
+    }
+    return df, report
+
+def conform_rows(rows, like):
+    """
+    Cast new rows to the dtypes of an existing dataset.
+
+    Categories missing from the existing columns are appended (existing
+    codes stay valid), date and numeric columns are coerced, and extra
+    columns are dropped.
+
+    Args:
+        rows (DataFrame): New rows
+        like (DataFrame): Existing data whose columns and dtypes to follow
+
+    Returns:
+        tuple: (conformed rows, {column: widened CategoricalDtype})
+    """
+    missing = [col for col in like.columns if col not in rows.columns]
+    if missing:
+        raise ValueError(f"Appended rows are missing columns: {', '.join(map(str, missing))}")
+
+    rows = rows[list(like.columns)].copy()
+    widened = {}
+    for col in like.columns:
+        dtype = like[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            new = pd.Index(rows[col].dropna().unique()).difference(dtype.categories)
+            if len(new):
+                dtype = pd.CategoricalDtype(dtype.categories.append(new), ordered=dtype.ordered)
+                widened[col] = dtype
+            rows[col] = rows[col].astype(dtype)
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                rows[col] = pd.to_datetime(rows[col], errors='coerce')
+        elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            rows[col] = pd.to_numeric(rows[col], errors='coerce')
+    return rows, widened
+
+def append_rows(data, rows):
+    """
+    Concatenate new rows onto a dataset, keeping its dtypes where the new
+    values fit (numeric columns widen when they do not).
+
+    Args:
+        data (DataFrame): Existing data (not modified)
+        rows (DataFrame): New rows
+
+    Returns:
+        DataFrame: Combined data with a fresh RangeIndex
+    """
+    rows, widened = conform_rows(rows, data)
+    if widened:
+        data = data.copy(deep=False)
+        for col, dtype in widened.items():
+            data[col] = data[col].cat.set_categories(dtype.categories)
+    return pd.concat([data, rows], ignore_index=True)
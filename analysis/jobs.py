@@ -0,0 +1,285 @@
+"""
+Background jobs whose stages run in a local process pool.
+
+A job is a set of named stages, each a picklable function call. Stages are
+submitted to a ProcessPoolExecutor as soon as the job is created; every
+stage result is published the moment it completes, so clients can render
+partial results by polling the job or following its event stream. Results
+are handed to the caller's on_result hook (e.g. to store them with the
+dataset) on a dedicated thread, so a slow hook never delays other jobs. No
+external broker is involved: jobs live in the web process that created
+them, so the app serving them must run as a single process (gunicorn.conf.py
+forces one worker for app_ai; threads provide request concurrency).
+"""
+import os
+import time
+import uuid
+import queue
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Processes executing stages
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Finished jobs kept for clients that poll late
+MAX_FINISHED_JOBS = int(os.environ.get("ANALYSIS_MAX_JOBS", 100))
+
+# Worker processes of the pool this process belongs to; 0 outside the pool
+_pool_workers = 0
+
+# Job and stage states
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = 'queued', 'running', 'completed', 'failed', 'cancelled'
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+def _init_worker(workers):
+    global _pool_workers
+    _pool_workers = workers
+
+def cores_per_stage(cores):
+    """
+    Cores a stage may use for its own parallelism.
+
+    Stages run side by side in the pool's workers, so inside a worker each
+    gets an even share of the cores instead of all of them.
+
+    Args:
+        cores (int): Cores available to the machine
+
+    Returns:
+        int: All cores outside a job worker, else this worker's share (at least 1)
+    """
+    if not _pool_workers:
+        return cores
+    return max(1, cores // _pool_workers)
+
+class Job:
+    """State and event log of one job."""
+
+    def __init__(self, owner, stages, meta=None):
+        """
+        Args:
+            owner (str): Dataset or session the job belongs to
+            stages (list): Stage names
+            meta (dict, optional): Caller data kept with the job
+        """
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.stages = OrderedDict((stage, QUEUED) for stage in stages)
+        self.results = {}
+        self.errors = {}
+        self.created = time.time()
+        self.finished = None
+        self.events = []
+        self._futures = {}
+        # Completed stages whose on_result hook has not run yet
+        self._storing = 0
+        self._cond = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in FINISHED_STATES
+
+    def _publish(self, event, data):
+        # Caller holds self._cond
+        self.events.append((len(self.events) + 1, event, data))
+        self._cond.notify_all()
+
+    def _set_status(self, status):
+        self.status = status
+        if status in FINISHED_STATES:
+            self.finished = time.time()
+        self._publish('status', {'status': status})
+
+    def to_dict(self):
+        """Snapshot of the job for the polling API."""
+        with self._cond:
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'stages': dict(self.stages),
+                'results': dict(self.results),
+                'errors': dict(self.errors),
+                'elapsed': round((self.finished or time.time()) - self.created, 3),
+            }
+
+    def events_after(self, seq, timeout=None):
+        """
+        Events newer than a sequence number, waiting for one if there are none.
+
+        Args:
+            seq (int): Last sequence number the client has seen
+            timeout (float, optional): Seconds to wait for a new event
+
+        Returns:
+            list: (seq, event, data) tuples; empty on timeout
+        """
+        with self._cond:
+            if len(self.events) <= seq and not self.done:
+                self._cond.wait(timeout)
+            return self.events[seq:]
+
+class JobManager:
+    """
+    Creates jobs, runs their stages in a process pool and tracks results.
+
+    Stages of all jobs share the pool, so concurrent analyses are bounded
+    by ANALYSIS_WORKERS processes.
+    """
+
+    def __init__(self, workers=ANALYSIS_WORKERS, max_finished=MAX_FINISHED_JOBS):
+        """
+        Args:
+            workers (int): Worker processes
+            max_finished (int): Finished jobs retained
+        """
+        self.workers = workers
+        self.max_finished = max_finished
+        self._jobs = OrderedDict()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._results = queue.Queue()
+        self._result_thread = None
+
+    def _pool(self):
+        # Spawned on first use, so workers do not inherit the server's threads or locks
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.workers,)
+            )
+        return self._executor
+
+    def submit(self, owner, tasks, on_result=None, meta=None):
+        """
+        Start a job.
+
+        Args:
+            owner (str): Dataset or session the job belongs to
+            tasks (dict): {stage: (function, args)}; functions must be picklable
+            on_result (callable, optional): Called as on_result(job, stage, result)
+                in the web process when a stage completes, on the result thread;
+                the job only completes once every hook has returned
+            meta (dict, optional): Caller data kept with the job
+
+        Returns:
+            Job: The new job
+        """
+        job = Job(owner, list(tasks), meta)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+
+        with job._cond:
+            job._set_status(RUNNING)
+            for stage, (fn, args) in tasks.items():
+                try:
+                    future = self._pool().submit(fn, *args)
+                except BrokenProcessPool:
+                    # A crashed worker breaks the pool; start a fresh one
+                    logger.warning("Analysis worker pool was broken, restarting it")
+                    self._executor = None
+                    future = self._pool().submit(fn, *args)
+                job._futures[stage] = future
+
+        for stage, future in job._futures.items():
+            future.add_done_callback(
+                lambda f, stage=stage: self._stage_done(job, stage, f, on_result)
+            )
+        return job
+
+    def _stage_done(self, job, stage, future, on_result):
+        # Runs on the pool's callback thread: publish and hand off, never block here
+        if future.cancelled():
+            return
+        error = future.exception()
+        result = None if error is not None else future.result()
+
+        with job._cond:
+            # Stages still running when the job was cancelled finish unobserved
+            if job.status == CANCELLED:
+                return
+            if error is None:
+                job.stages[stage] = COMPLETED
+                job.results[stage] = result
+                job._publish('stage', {'stage': stage, 'status': COMPLETED, 'result': result})
+            else:
+                logger.error(f"Job {job.id} stage {stage} failed: {str(error)}")
+                job.stages[stage] = FAILED
+                job.errors[stage] = str(error)
+                job._publish('stage', {'stage': stage, 'status': FAILED, 'error': str(error)})
+            store = error is None and on_result is not None
+            if store:
+                job._storing += 1
+
+        if store:
+            self._start_result_thread()
+            self._results.put((job, stage, result, on_result))
+        else:
+            self._finish_if_done(job)
+
+    def _start_result_thread(self):
+        with self._lock:
+            if self._result_thread is None:
+                self._result_thread = threading.Thread(target=self._store_results, name="job-results",
+                                                       daemon=True)
+                self._result_thread.start()
+
+    def _store_results(self):
+        """Run on_result hooks one at a time, off the pool's callback thread."""
+        while True:
+            job, stage, result, on_result = self._results.get()
+            try:
+                on_result(job, stage, result)
+            except Exception as e:
+                logger.error(f"Error storing result of job {job.id} stage {stage}: {str(e)}")
+            with job._cond:
+                job._storing -= 1
+            self._finish_if_done(job)
+
+    def _finish_if_done(self, job):
+        with job._cond:
+            if (job.status == RUNNING and job._storing == 0
+                    and all(s in FINISHED_STATES for s in job.stages.values())):
+                job._set_status(FAILED if job.errors else COMPLETED)
+
+    def get(self, job_id):
+        """Job by ID, or None."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Cancel a job. Queued stages are dropped; stages already running finish
+        in the background and their results are discarded.
+
+        Returns:
+            Job: The job, or None if unknown
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        with job._cond:
+            if job.done:
+                return job
+            for stage, future in job._futures.items():
+                future.cancel()
+                if job.stages[stage] not in FINISHED_STATES:
+                    job.stages[stage] = CANCELLED
+            job._set_status(CANCELLED)
+        return job
+
+    def _prune(self):
+        # Caller holds self._lock; drop the oldest finished jobs beyond the limit
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
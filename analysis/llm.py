@@ -0,0 +1,388 @@
+"""
+Gateway for LLM chat completions: caching, single-flight and timeouts.
+
+Every call goes through LLMGateway.complete(). Responses are cached in
+memory keyed by model, parameters and a hash of the normalized prompt
+(whitespace collapsed), with a TTL and an LRU size bound. Concurrent
+identical calls share one backend request. Backends are pluggable: the
+OpenAI API (optionally pointed at another base URL, such as the local stub
+server in analysis.llm_stub) or an in-process stub returning canned JSON.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Backend used by default: 'openai' or 'stub'
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "openai")
+
+# Alternative OpenAI-compatible endpoint, e.g. the local stub server
+LLM_BASE_URL = os.environ.get("LLM_BASE_URL")
+
+# Seconds a single call may take before it fails
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", 60))
+
+# Cached responses and how long they stay valid
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", 256))
+LLM_CACHE_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_SECONDS", 3600))
+
+# Retries of failed OpenAI requests (within the timeout of each attempt)
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 1))
+
+_WHITESPACE = re.compile(r"\s+")
+
+def _normalize(messages):
+    """Messages with whitespace runs in text collapsed, so indentation changes hit the cache."""
+    normalized = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            content = _WHITESPACE.sub(" ", content).strip()
+        else:
+            content = [
+                dict(part, text=_WHITESPACE.sub(" ", part["text"]).strip()) if part.get("type") == "text" else part
+                for part in content or []
+            ]
+        normalized.append(dict(message, content=content))
+    return normalized
+
+def cache_key(model, messages, **params):
+    """
+    Cache key of a completion request.
+
+    Args:
+        model (str): Model name
+        messages (list): Chat messages
+        **params: Other request parameters that change the response
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    content = json.dumps({"model": model, "messages": _normalize(messages), "params": params},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+class OpenAIBackend:
+    """Chat completions through the OpenAI client, created on first use."""
+
+    name = "openai"
+
+    def __init__(self, api_key=None, base_url=LLM_BASE_URL, max_retries=LLM_MAX_RETRIES):
+        """
+        Args:
+            api_key (str, optional): API key; OPENAI_API_KEY by default
+            base_url (str, optional): OpenAI-compatible endpoint
+            max_retries (int): Retries of failed requests
+        """
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                from analysis.imports import ensure_loaded
+
+                ensure_loaded("llm")
+                from openai import OpenAI
+
+                self._client = OpenAI(api_key=self.api_key or os.environ.get("OPENAI_API_KEY"),
+                                      base_url=self.base_url, max_retries=self.max_retries)
+            return self._client
+
+    def complete(self, model, messages, timeout, **params):
+        from openai import APITimeoutError
+
+        try:
+            response = self._get_client().chat.completions.create(
+                model=model, messages=messages, timeout=timeout, **params
+            )
+        except APITimeoutError:
+            raise TimeoutError(f"LLM call timed out after {timeout}s")
+        return response.choices[0].message.content
+
+    def stream(self, model, messages, timeout, **params):
+        """Yield content deltas as the model produces them."""
+        from openai import APITimeoutError
+
+        try:
+            response = self._get_client().chat.completions.create(
+                model=model, messages=messages, timeout=timeout, stream=True, **params
+            )
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except APITimeoutError:
+            raise TimeoutError(f"LLM call timed out after {timeout}s")
+
+class StubBackend:
+    """Canned responses without any network access, for offline runs and tests."""
+
+    name = "stub"
+
+    def __init__(self, delay=0.0):
+        """
+        Args:
+            delay (float): Seconds each call takes, to simulate latency
+        """
+        self.delay = delay
+        self.calls = 0
+
+    def complete(self, model, messages, timeout, **params):
+        from analysis.llm_stub import canned_response
+
+        self.calls += 1
+        if self.delay:
+            time.sleep(min(self.delay, timeout))
+            if self.delay > timeout:
+                raise TimeoutError(f"Stub call exceeded {timeout}s")
+        json_mode = (params.get("response_format") or {}).get("type") == "json_object"
+        return canned_response(messages, json_mode)
+
+    def stream(self, model, messages, timeout, **params):
+        """The canned response in small pieces, spread over the delay."""
+        from analysis.llm_stub import canned_response, split_stream
+
+        self.calls += 1
+        json_mode = (params.get("response_format") or {}).get("type") == "json_object"
+        pieces = split_stream(canned_response(messages, json_mode))
+        for piece in pieces:
+            if self.delay:
+                time.sleep(self.delay / len(pieces))
+            yield piece
+
+def backend_from_env():
+    """Backend selected by LLM_BACKEND."""
+    if LLM_BACKEND == "stub":
+        return StubBackend()
+    if LLM_BACKEND == "openai":
+        return OpenAIBackend()
+    raise ValueError(f"Unknown LLM backend: {LLM_BACKEND}")
+
+class LLMGateway:
+    """
+    Cached, deduplicated chat completions with per-call timeouts.
+
+    Failed calls are never cached; every waiter of a failed call sees its
+    error.
+    """
+
+    def __init__(self, backend=None, cache_size=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL_SECONDS,
+                 timeout=LLM_TIMEOUT_SECONDS):
+        """
+        Args:
+            backend (optional): Object with complete(model, messages, timeout, **params);
+                chosen by LLM_BACKEND if omitted
+            cache_size (int): Responses kept; 0 disables the cache
+            ttl (float): Seconds a cached response stays valid
+            timeout (float): Default seconds per call
+        """
+        self._backend = backend
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.timeout = timeout
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "shared": 0, "errors": 0}
+
+    @property
+    def backend(self):
+        # Resolved lazily, so importing the gateway never builds an API client
+        if self._backend is None:
+            self._backend = backend_from_env()
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend):
+        with self._lock:
+            self._backend = backend
+            self._cache.clear()
+
+    def _cached(self, key):
+        # Caller holds self._lock
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        stored, content = entry
+        if time.monotonic() - stored > self.ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return content
+
+    def _store(self, key, content):
+        # Caller holds self._lock
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = (time.monotonic(), content)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def complete(self, messages, model="gpt-4o", timeout=None, use_cache=True, **params):
+        """
+        Completion content for a chat request.
+
+        Args:
+            messages (list): Chat messages
+            model (str): Model name
+            timeout (float, optional): Seconds before the call fails; the
+                gateway default if omitted
+            use_cache (bool): Read and write the response cache
+            **params: Extra request parameters (temperature, max_tokens,
+                response_format, ...)
+
+        Returns:
+            str: Completion content
+
+        Raises:
+            TimeoutError: If no response arrived in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        key = cache_key(model, messages, **params)
+
+        with self._lock:
+            if use_cache:
+                content = self._cached(key)
+                if content is not None:
+                    self.stats["hits"] += 1
+                    return content
+            future = self._pending.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._pending[key] = future
+                self.stats["misses"] += 1
+            else:
+                self.stats["shared"] += 1
+
+        if not leader:
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeoutError:
+                raise TimeoutError(f"LLM call timed out after {timeout}s")
+
+        try:
+            content = self.backend.complete(model, messages, timeout, **params)
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(key, None)
+                self.stats["errors"] += 1
+            logger.error(f"LLM call to {model} failed: {str(e)}")
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if use_cache:
+                self._store(key, content)
+            self._pending.pop(key, None)
+        future.set_result(content)
+        return content
+
+    def stream(self, messages, model="gpt-4o", timeout=None, use_cache=True, **params):
+        """
+        Completion content as it is generated.
+
+        A cached response is yielded in one piece; a streamed response is
+        cached once it is complete. Streams are not deduplicated.
+
+        Args:
+            messages (list): Chat messages
+            model (str): Model name
+            timeout (float, optional): Seconds the backend may wait for data
+            use_cache (bool): Read and write the response cache
+            **params: Extra request parameters
+
+        Yields:
+            str: Content deltas
+        """
+        timeout = self.timeout if timeout is None else timeout
+        key = cache_key(model, messages, **params)
+
+        with self._lock:
+            content = self._cached(key) if use_cache else None
+            self.stats["hits" if content is not None else "misses"] += 1
+        if content is not None:
+            yield content
+            return
+
+        parts = []
+        try:
+            for delta in self.backend.stream(model, messages, timeout, **params):
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            logger.error(f"LLM stream from {model} failed: {str(e)}")
+            raise
+
+        if use_cache:
+            with self._lock:
+                self._store(key, "".join(parts))
+
+    def complete_json(self, messages, model="gpt-4o", **kwargs):
+        """Like complete() in JSON mode, returning the parsed object."""
+        content = self.complete(messages, model=model, response_format={"type": "json_object"}, **kwargs)
+        return json.loads(content)
+
+    def clear(self):
+        """Drop all cached responses."""
+        with self._lock:
+            self._cache.clear()
+
+def stream_concurrently(gateway, calls, executor, idle_timeout=None):
+    """
+    Stream several completions at once and interleave their output.
+
+    Each call runs on a thread of the executor, so the slowest call bounds
+    the total time and the first delta of any call arrives as soon as the
+    model produces it.
+
+    Args:
+        gateway (LLMGateway): Gateway to stream through
+        calls (dict): {name: keyword arguments for gateway.stream()}
+        executor (Executor): Thread pool running the calls
+        idle_timeout (float, optional): Yield an 'idle' event after this
+            many seconds without output
+
+    Yields:
+        tuple: (name, 'delta', text), then per call (name, 'done', content)
+            or (name, 'error', message); (None, 'idle', None) while waiting
+    """
+    events = queue.Queue()
+
+    def run(name, kwargs):
+        parts = []
+        try:
+            for delta in gateway.stream(**kwargs):
+                parts.append(delta)
+                events.put((name, 'delta', delta))
+            events.put((name, 'done', "".join(parts)))
+        except Exception as e:
+            events.put((name, 'error', str(e)))
+
+    for name, kwargs in calls.items():
+        executor.submit(run, name, kwargs)
+
+    remaining = len(calls)
+    while remaining:
+        try:
+            event = events.get(timeout=idle_timeout)
+        except queue.Empty:
+            yield None, 'idle', None
+            continue
+        if event[1] != 'delta':
+            remaining -= 1
+        yield event
@@ -0,0 +1,150 @@
+"""
+Canned LLM responses and a local server that speaks the chat completions API.
+
+Used instead of the OpenAI API for offline development and tests: the
+StubBackend in analysis.llm answers in-process, and the server lets the
+real OpenAI client run unchanged against a local endpoint:
+
+    python -m analysis.llm_stub --port 8765
+    LLM_BACKEND=openai LLM_BASE_URL=http://127.0.0.1:8765/v1 python app_ai.py
+
+Responses are chosen from the prompt: insights and data stories get JSON
+in the shape DataAnalysisTool expects, image prompts get plain text.
+"""
+import json
+import time
+import uuid
+import argparse
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+INSIGHTS_RESPONSE = {
+    "key_insights": ["Stub insight: the dataset was analyzed by the local stand-in backend."],
+    "patterns_and_trends": {"summary": "No model was called; this is canned output."},
+    "unusual_findings": {},
+    "important_relationships": {},
+    "business_implications": {},
+    "recommendations": {"next": "Configure an OpenAI API key for real insights."}
+}
+
+STORY_RESPONSE = {
+    "executive_summary": "Stub story generated by the local stand-in backend.",
+    "background": "No model was called; this is canned output.",
+    "main_narrative": [
+        {"title": "Stub insight", "insight": "Canned content", "explanation": "Used for offline runs."}
+    ],
+    "business_implications": {"key_points": [], "details": ""},
+    "recommended_actions": [],
+    "next_steps": []
+}
+
+IMAGE_RESPONSE = "Stub analysis: this visualization was not sent to a model."
+
+def _prompt_text(messages):
+    """Text parts of all messages, joined."""
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(part.get("text", "") for part in content or [] if part.get("type") == "text")
+    return "\n".join(parts)
+
+def canned_response(messages, json_mode=False):
+    """
+    Canned completion text for a chat request.
+
+    Args:
+        messages (list): Chat messages
+        json_mode (bool): Whether a JSON object was requested
+
+    Returns:
+        str: Completion content
+    """
+    text = _prompt_text(messages).lower()
+    if "storyteller" in text or "data story" in text:
+        return json.dumps(STORY_RESPONSE)
+    if json_mode or "json" in text:
+        return json.dumps(INSIGHTS_RESPONSE)
+    return IMAGE_RESPONSE
+
+def split_stream(content, pieces=20):
+    """Split content into roughly equal pieces, like streamed tokens."""
+    size = max(1, -(-len(content) // pieces))
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal POST /v1/chat/completions endpoint."""
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        json_mode = (request.get("response_format") or {}).get("type") == "json_object"
+        content = canned_response(request.get("messages", []), json_mode)
+        completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+        if request.get("stream"):
+            self._stream(completion_id, request.get("model", "stub"), content)
+            return
+
+        body = json.dumps({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, completion_id, model, content):
+        """Send the content as server-sent chat.completion.chunk events."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        pieces = [{"role": "assistant", "content": ""}] + [{"content": piece} for piece in split_stream(content)]
+        for delta in pieces + [{}]:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None if delta else "stop"}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+def serve(host="127.0.0.1", port=8765):
+    """Run the stub server until interrupted."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    logger.info(f"LLM stub listening on http://{host}:{port}/v1")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    serve(args.host, args.port)
@@ -0,0 +1,331 @@
+"""
+Fitted prediction models, kept for reuse and batch scoring.
+
+A trained model is stored with the feature encoding it was trained on
+(column order, one-hot categories, fill values), so new rows can be scored
+exactly as the training rows were prepared. Models are keyed by owner
+(the dataset or session that trained them), dataset fingerprint, target,
+features and training parameters: repeating a training request returns the
+stored model instead of fitting again, and one session's models are not
+visible to another.
+
+Models are pickled to disk next to a small JSON metadata file. The least
+recently used files are evicted beyond MODEL_STORE_MB, and a few models
+stay loaded in memory.
+"""
+import os
+import json
+import time
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from analysis.diskcache import evict_lru, touch
+
+logger = logging.getLogger(__name__)
+
+# Where fitted models are stored
+DEFAULT_MODEL_DIR = os.environ.get("MODEL_DIR", os.path.join("cache", "models"))
+
+# Disk space for stored models; least recently used models are evicted beyond it
+MODEL_STORE_BYTES = int(os.environ.get("MODEL_STORE_MB", 512)) * 1024 * 1024
+
+# Models kept unpickled in memory
+MAX_LOADED_MODELS = int(os.environ.get("MAX_LOADED_MODELS", 8))
+
+# Rows scored per batch when streaming predictions
+SCORE_BATCH_ROWS = int(os.environ.get("SCORE_BATCH_ROWS", 10000))
+
+# Categorical columns with more distinct values than this are dropped, not one-hot encoded
+MAX_CATEGORIES = 10
+
+def model_key(owner, fingerprint, target, features, params):
+    """
+    Registry key of a model.
+
+    Args:
+        owner (str): Dataset or session the model belongs to
+        fingerprint (str): Dataset fingerprint
+        target (str): Target column
+        features (list, optional): Requested feature columns; None for all
+        params (dict): Training parameters
+
+    Returns:
+        str: Hex digest
+    """
+    content = json.dumps({"owner": owner, "fingerprint": fingerprint, "target": target, "features": features, "params": params},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()[:32]
+
+class FeatureEncoder:
+    """
+    Turns raw rows into the model's feature matrix.
+
+    Numeric columns are kept, categorical columns with at most
+    MAX_CATEGORIES values are one-hot encoded (first level dropped), and
+    missing values are filled with training means. Unknown categories
+    encode as all zeros and missing columns as their fill value.
+    """
+
+    def __init__(self, include_categorical=False):
+        """
+        Args:
+            include_categorical (bool): Whether to one-hot encode categorical features
+        """
+        self.include_categorical = include_categorical
+        self.numeric = []
+        self.categories = {}
+        self.columns = []
+        self.fill_values = {}
+
+    def fit(self, X):
+        """
+        Learn the encoding from training features.
+
+        Args:
+            X (DataFrame): Training feature columns
+
+        Returns:
+            FeatureEncoder: self
+        """
+        self.numeric = X.select_dtypes(include=['number']).columns.tolist()
+        self.categories = {}
+        if self.include_categorical:
+            for col in X.select_dtypes(include=['object', 'category']).columns:
+                levels = X[col].dropna().unique()
+                # Skip if too many unique values
+                if len(levels) <= MAX_CATEGORIES:
+                    self.categories[col] = sorted(levels.tolist(), key=str)
+
+        encoded = self._encode(X)
+        self.columns = encoded.columns.tolist()
+        self.fill_values = encoded.mean().to_dict()
+        return self
+
+    def _encode(self, X):
+        parts = [X.reindex(columns=self.numeric).apply(pd.to_numeric, errors='coerce')]
+        for col, levels in self.categories.items():
+            values = X[col] if col in X.columns else pd.Series(np.nan, index=X.index)
+            parts.append(pd.get_dummies(pd.Categorical(values, categories=levels), prefix=col,
+                                        drop_first=True, dtype=np.float64).set_index(X.index))
+        return pd.concat(parts, axis=1)
+
+    def transform(self, X):
+        """
+        Feature matrix of rows, in training column order.
+
+        Args:
+            X (DataFrame): Rows with (at least some of) the training feature columns
+
+        Returns:
+            DataFrame: Encoded, filled features
+        """
+        encoded = self._encode(X).reindex(columns=self.columns)
+        return encoded.fillna(self.fill_values)
+
+    @property
+    def input_columns(self):
+        """Raw columns the encoder reads."""
+        return self.numeric + list(self.categories)
+
+class ModelRegistry:
+    """
+    Fitted models on disk, with the most recently used ones kept in memory.
+
+    Each model is stored as {key}.pkl (the entry: encoder, model and
+    training report) and {key}.json (metadata readable without unpickling).
+    """
+
+    def __init__(self, model_dir=DEFAULT_MODEL_DIR, max_bytes=MODEL_STORE_BYTES, max_loaded=MAX_LOADED_MODELS):
+        """
+        Args:
+            model_dir (str): Directory of stored models
+            max_bytes (int): Disk space for stored models
+            max_loaded (int): Models kept in memory
+        """
+        self.model_dir = model_dir
+        self.max_bytes = max_bytes
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.model_dir, f"{key}{suffix}")
+
+    def get(self, key):
+        """
+        Stored model entry, or None.
+
+        Returns:
+            dict: encoder, model, meta and result
+        """
+        with self._lock:
+            entry = self._loaded.get(key)
+            if entry is not None:
+                self._loaded.move_to_end(key)
+                return entry
+
+        path = self._path(key, ".pkl")
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+            # Access time drives eviction; touch the file on every load
+            touch(path)
+        except FileNotFoundError:
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._loaded[key] = entry
+            self._loaded.move_to_end(key)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+
+    def put(self, key, encoder, model, meta, result):
+        """
+        Store a fitted model.
+
+        Args:
+            key (str): Output of model_key
+            encoder (FeatureEncoder): Fitted feature encoder
+            model: Fitted estimator
+            meta (dict): JSON metadata (owner, target, model type, features, ...)
+            result (dict): Training report returned to clients
+
+        Returns:
+            dict: The stored entry
+        """
+        meta = dict(meta, model_id=key, created=time.time())
+        entry = {"encoder": encoder, "model": model, "meta": meta, "result": result}
+
+        os.makedirs(self.model_dir, exist_ok=True)
+        tmp_path = self._path(key, f".pkl.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        meta["bytes"] = os.path.getsize(tmp_path)
+        os.replace(tmp_path, self._path(key, ".pkl"))
+
+        # Metadata is what list() sees, so it only appears once the model can be loaded
+        tmp_path = self._path(key, f".json.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f, default=str)
+        os.replace(tmp_path, self._path(key, ".json"))
+
+        self._remember(key, entry)
+        self._evict(keep=key)
+        return entry
+
+    def _evict(self, keep=None):
+        """Delete least recently used models until the store fits max_bytes."""
+        # Models are unpickled whole, so no reader depends on a file staying on disk
+        evict_lru(self.model_dir, self.max_bytes, ".pkl", keep=self._path(keep, ".pkl"),
+                  delete=lambda path: self.delete(os.path.basename(path)[:-len(".pkl")]), grace=0)
+
+    def delete(self, key):
+        """Remove a stored model; returns whether it existed."""
+        with self._lock:
+            self._loaded.pop(key, None)
+        existed = False
+        # Metadata first, so list() never shows a model whose pickle is gone
+        for suffix in (".json", ".pkl"):
+            try:
+                os.remove(self._path(key, suffix))
+                existed = True
+            except FileNotFoundError:
+                pass
+        return existed
+
+    def meta(self, key):
+        """Metadata of a stored model without unpickling it, or None."""
+        try:
+            with open(self._path(key, ".json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def list(self, owner=None):
+        """
+        Metadata of stored models, most recently created first.
+
+        Args:
+            owner (str, optional): Only models trained by this dataset or session
+        """
+        if not os.path.isdir(self.model_dir):
+            return []
+        models = []
+        for name in os.listdir(self.model_dir):
+            if name.endswith(".json"):
+                meta = self.meta(name[:-len(".json")])
+                if meta is not None and (owner is None or meta.get("owner") == owner):
+                    models.append(meta)
+        return sorted(models, key=lambda meta: meta.get("created", 0), reverse=True)
+
+def score_frame(entry, rows, id_column=None):
+    """
+    Predictions for a batch of rows, computed in one vectorized call.
+
+    Args:
+        entry (dict): Model entry from ModelRegistry.get
+        rows (DataFrame): Raw input rows
+        id_column (str, optional): Input column echoed as the row identifier
+
+    Returns:
+        DataFrame: id (or row position), prediction and, for classifiers,
+            the probability of the predicted class
+    """
+    X = entry["encoder"].transform(rows)
+    model = entry["model"]
+    output = pd.DataFrame(index=rows.index)
+    if id_column is not None and id_column in rows.columns:
+        output[id_column] = rows[id_column].to_numpy()
+    else:
+        output["row"] = rows.index
+    output["prediction"] = model.predict(X)
+    if entry["meta"].get("model_type") == "classification" and hasattr(model, "predict_proba"):
+        output["probability"] = model.predict_proba(X).max(axis=1)
+    return output
+
+def read_batches(stream, fmt, batch_rows=SCORE_BATCH_ROWS):
+    """
+    Rows of a CSV or NDJSON stream, in batches, without reading it whole.
+
+    Args:
+        stream: Binary file-like object
+        fmt (str): 'csv' or 'ndjson'
+        batch_rows (int): Rows per batch
+
+    Yields:
+        DataFrame: Batches with a running row index
+    """
+    if fmt == "csv":
+        reader = pd.read_csv(stream, chunksize=batch_rows)
+    elif fmt == "ndjson":
+        reader = pd.read_json(stream, lines=True, chunksize=batch_rows)
+    else:
+        raise ValueError(f"Unsupported input format: {fmt}")
+    with reader:
+        yield from reader
+
+def format_batch(predictions, fmt, header=False):
+    """
+    Predictions serialized as CSV or NDJSON text.
+
+    Args:
+        predictions (DataFrame): Output of score_frame
+        fmt (str): 'csv' or 'ndjson'
+        header (bool): Include the CSV header row
+
+    Returns:
+        str: Serialized batch
+    """
+    if fmt == "csv":
+        return predictions.to_csv(index=False, header=header)
+    text = predictions.to_json(orient="records", lines=True)
+    return text if text.endswith("\n") else text + "\n"
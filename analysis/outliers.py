@@ -0,0 +1,219 @@
+"""
+Vectorized outlier detection over all numeric columns at once.
+
+Each detector turns the data into per-column lower and upper bounds (and,
+for isolation forest, a per-row anomaly flag). One boolean mask matrix
+then marks every outlying cell, so the whole table is compared in a single
+pass instead of one filtered copy per column.
+
+For out-of-core datasets the bounds come from the streaming accumulators
+(approximate quantiles and exact moments) and the mask is applied chunk by
+chunk over the on-disk store.
+"""
+import numpy as np
+from analysis.accumulators import QuantileSketch
+
+# Supported detectors
+OUTLIER_METHODS = ('iqr', 'zscore', 'mad', 'isolation_forest')
+
+# Detector cut-offs: IQR multiplier, z-score and modified z-score limits
+IQR_MULTIPLIER = 1.5
+ZSCORE_LIMIT = 3.0
+MAD_LIMIT = 3.5
+
+# Scales the median absolute deviation to the standard deviation of a normal distribution
+MAD_SCALE = 1.4826
+
+# Rows used to fit the isolation forest, and the share of rows it flags
+ISOLATION_FOREST_SAMPLE_ROWS = 100000
+ISOLATION_FOREST_CONTAMINATION = 0.01
+
+# Quantiles of unflagged rows that bound the normal range of each column
+INLIER_QUANTILES = (0.005, 0.995)
+
+# Example values reported per column
+MAX_EXAMPLES = 5
+
+class OutlierCounter:
+    """Counts outlying values per column over one or more chunks."""
+
+    def __init__(self, columns, lower, upper):
+        """
+        Args:
+            columns (list): Numeric columns
+            lower (ndarray): Lower bound per column
+            upper (ndarray): Upper bound per column
+        """
+        self.columns = list(columns)
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        self.rows = 0
+        self.counts = np.zeros(len(self.columns), dtype=np.int64)
+        self.examples = {col: [] for col in self.columns}
+
+    def update(self, chunk, row_flags=None):
+        """
+        Add a chunk of rows.
+
+        Args:
+            chunk (DataFrame): Rows containing the numeric columns
+            row_flags (ndarray, optional): Only rows flagged True can be outliers
+        """
+        values = chunk[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        # NaN compares False on both sides, so missing values are never outliers
+        mask = (values < self.lower) | (values > self.upper)
+        if row_flags is not None:
+            mask &= np.asarray(row_flags, dtype=bool)[:, None]
+
+        self.rows += len(chunk)
+        chunk_counts = mask.sum(axis=0)
+        self.counts += chunk_counts
+
+        for j in np.flatnonzero(chunk_counts):
+            col = self.columns[j]
+            needed = MAX_EXAMPLES - len(self.examples[col])
+            if needed > 0:
+                self.examples[col].extend(chunk[col].to_numpy()[mask[:, j]][:needed].tolist())
+
+    def summary(self):
+        """
+        Outliers per column in the /api/analyze result format.
+
+        Returns:
+            dict: {column: {"count", "percentage", "bounds", "examples"}} for
+                columns with at least one outlier
+        """
+        summary = {}
+        for j in np.flatnonzero(self.counts):
+            col = self.columns[j]
+            summary[col] = {
+                "count": int(self.counts[j]),
+                "percentage": round((int(self.counts[j]) / self.rows) * 100, 2),
+                "bounds": {
+                    "lower": float(self.lower[j]),
+                    "upper": float(self.upper[j])
+                },
+                "examples": self.examples[col]
+            }
+        return summary
+
+def _bounds_from_stats(method, q1=None, q3=None, center=None, spread=None):
+    """Lower and upper bounds from quartiles (iqr) or a center and spread."""
+    if method == 'iqr':
+        iqr = q3 - q1
+        return q1 - IQR_MULTIPLIER * iqr, q3 + IQR_MULTIPLIER * iqr
+    limit = ZSCORE_LIMIT if method == 'zscore' else MAD_LIMIT
+    return center - limit * spread, center + limit * spread
+
+def _fit_isolation_forest(numeric_data):
+    """Fit an isolation forest on (a sample of) the data; returns model and fill values."""
+    from sklearn.ensemble import IsolationForest
+
+    fill = numeric_data.median()
+    sample = numeric_data
+    if len(sample) > ISOLATION_FOREST_SAMPLE_ROWS:
+        sample = sample.sample(n=ISOLATION_FOREST_SAMPLE_ROWS, random_state=42)
+    model = IsolationForest(contamination=ISOLATION_FOREST_CONTAMINATION, random_state=42, n_jobs=-1)
+    model.fit(sample.fillna(fill).to_numpy(dtype=np.float64))
+    return model, fill
+
+def _isolation_flags(model, fill, numeric_data):
+    return model.predict(numeric_data.fillna(fill).to_numpy(dtype=np.float64)) == -1
+
+def _inlier_range(numeric_data, flags):
+    """
+    Per-column central range of the rows the forest did not flag.
+
+    A flagged row counts as an outlier in the columns where its value falls
+    outside this range, which attributes row anomalies to columns.
+    """
+    quantiles = numeric_data[~flags].quantile(list(INLIER_QUANTILES))
+    return (quantiles.loc[INLIER_QUANTILES[0]].to_numpy(dtype=np.float64),
+            quantiles.loc[INLIER_QUANTILES[1]].to_numpy(dtype=np.float64))
+
+def detect_outliers(numeric_data, method='iqr'):
+    """
+    Detect outliers in every numeric column of an in-memory frame.
+
+    Args:
+        numeric_data (DataFrame): Numeric columns only
+        method (str): 'iqr', 'zscore', 'mad' or 'isolation_forest'
+
+    Returns:
+        dict: Per-column outlier summary
+    """
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"Unsupported outlier method: {method}")
+
+    row_flags = None
+    if method == 'iqr':
+        # All quartiles in one call
+        quartiles = numeric_data.quantile([0.25, 0.75])
+        lower, upper = _bounds_from_stats(method, q1=quartiles.loc[0.25], q3=quartiles.loc[0.75])
+    elif method == 'zscore':
+        lower, upper = _bounds_from_stats(method, center=numeric_data.mean(), spread=numeric_data.std())
+    elif method == 'mad':
+        median = numeric_data.median()
+        mad = (numeric_data - median).abs().median() * MAD_SCALE
+        lower, upper = _bounds_from_stats(method, center=median, spread=mad)
+    else:
+        model, fill = _fit_isolation_forest(numeric_data)
+        row_flags = _isolation_flags(model, fill, numeric_data)
+        lower, upper = _inlier_range(numeric_data, row_flags)
+
+    counter = OutlierCounter(numeric_data.columns, lower, upper)
+    counter.update(numeric_data, row_flags)
+    return counter.summary()
+
+def detect_outliers_streaming(store, accumulator, columns, method='iqr', sample=None):
+    """
+    Detect outliers over an on-disk store without loading it.
+
+    Quartiles come from the accumulators' quantile sketches and are
+    therefore approximate; counts are exact for the given bounds. MAD needs
+    one extra pass to sketch absolute deviations. The isolation forest is
+    fitted on the in-memory sample and scores every stored chunk.
+
+    Args:
+        store (ChunkStore): Stored dataset
+        accumulator (DatasetAccumulator): Accumulators from ingestion
+        columns (list): Numeric columns
+        method (str): 'iqr', 'zscore', 'mad' or 'isolation_forest'
+        sample (DataFrame, optional): In-memory sample, required for isolation_forest
+
+    Returns:
+        dict: Per-column outlier summary
+    """
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"Unsupported outlier method: {method}")
+    columns = list(columns)
+    stats = [accumulator.columns[col] for col in columns]
+
+    model = fill = None
+    if method == 'iqr':
+        quartiles = np.array([acc.sketch.quantiles([0.25, 0.75]) for acc in stats])
+        lower, upper = _bounds_from_stats(method, q1=quartiles[:, 0], q3=quartiles[:, 1])
+    elif method == 'zscore':
+        center = np.array([acc.moments.mean for acc in stats])
+        spread = np.array([acc.moments.std for acc in stats])
+        lower, upper = _bounds_from_stats(method, center=center, spread=spread)
+    elif method == 'mad':
+        median = np.array([acc.sketch.quantiles([0.5])[0] for acc in stats])
+        sketches = [QuantileSketch() for _ in columns]
+        for chunk in store.iter_chunks(columns):
+            deviations = np.abs(chunk[columns].to_numpy(dtype=np.float64, na_value=np.nan) - median)
+            for j, sketch in enumerate(sketches):
+                sketch.update(deviations[:, j])
+        mad = np.array([sketch.quantiles([0.5])[0] for sketch in sketches]) * MAD_SCALE
+        lower, upper = _bounds_from_stats(method, center=median, spread=mad)
+    else:
+        if sample is None:
+            raise ValueError("isolation_forest needs an in-memory sample")
+        model, fill = _fit_isolation_forest(sample[columns])
+        lower, upper = _inlier_range(sample[columns], _isolation_flags(model, fill, sample[columns]))
+
+    counter = OutlierCounter(columns, lower, upper)
+    for chunk in store.iter_chunks(columns):
+        row_flags = _isolation_flags(model, fill, chunk) if model is not None else None
+        counter.update(chunk, row_flags)
+    return counter.summary()
@@ -0,0 +1,265 @@
+"""
+Plot specifications, rendered lazily in a process pool and cached on disk.
+
+Analysis only decides which plots exist: each plot is a small JSON spec
+with a stable ID. Figures are drawn on first request in worker processes
+using the Agg backend, from the few columns each plot needs, and written to
+cache/plots/<fingerprint>/<plot id>.<format>. Later requests for the same
+data and spec are served straight from disk. The least recently served
+images are evicted beyond PLOT_CACHE_MB.
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from analysis.diskcache import evict_lru, touch
+
+logger = logging.getLogger(__name__)
+
+# Image formats and their content types
+PLOT_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+# Where rendered figures are cached
+DEFAULT_PLOT_CACHE_DIR = os.environ.get("PLOT_CACHE_DIR", os.path.join("cache", "plots"))
+
+# Disk space for cached images
+PLOT_CACHE_BYTES = int(os.environ.get("PLOT_CACHE_MB", 256)) * 1024 * 1024
+
+# Rendering processes
+PLOT_WORKERS = int(os.environ.get("PLOT_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Points drawn in a scatter plot; larger data is sampled
+SCATTER_SAMPLE_ROWS = 20000
+
+def plot_id(spec):
+    """Stable ID of a plot spec."""
+    content = json.dumps({k: v for k, v in spec.items() if k != 'id'}, sort_keys=True, default=str)
+    return hashlib.sha1(content.encode()).hexdigest()[:16]
+
+def _spec(plot_type, title, columns, **params):
+    spec = {"type": plot_type, "title": title, "columns": [str(c) for c in columns]}
+    spec.update(params)
+    spec["id"] = plot_id(spec)
+    return spec
+
+def build_plot_specs(profile, correlations, correlation_method='pearson'):
+    """
+    Decide which plots to show for a dataset, without drawing anything.
+
+    Args:
+        profile (ColumnProfile): Column profile of the data
+        correlations (CorrelationEngine): Correlations of the data
+        correlation_method (str): Method used for the heatmap and top pair
+
+    Returns:
+        list: Plot specs with id, type, title and columns
+    """
+    specs = []
+    numeric = profile.numeric
+
+    # 1. Distribution of numeric variables
+    for col in numeric[:5]:  # Limit to first 5 columns
+        specs.append(_spec("histogram", f"Distribution of {col}", [col]))
+
+    if len(numeric) > 1:
+        # 2. Correlation heatmap
+        specs.append(_spec("heatmap", "Correlation Heatmap", numeric, method=correlation_method))
+
+        # 3. Scatter plot for the top correlated pair
+        top_pair = correlations.top_pair(correlation_method)
+        if top_pair is not None:
+            col1, col2 = top_pair
+            specs.append(_spec("scatter", f"Relationship between {col1} and {col2}", [col1, col2]))
+
+    # 4. Box plots for numeric variables
+    for col in numeric[:3]:  # Limit to first 3 columns
+        specs.append(_spec("boxplot", f"Box Plot of {col}", [col]))
+
+    # 5. Bar charts for categorical variables
+    for col in profile.categorical[:3]:  # Limit to first 3 columns
+        if profile.n_unique[col] <= 15:  # Only plot if reasonable number of categories
+            specs.append(_spec("bar", f"Frequency of {col}", [col]))
+
+    return specs
+
+def plot_payload(spec, data, profile, correlations):
+    """
+    Extract the data a plot needs, small enough to send to a worker process.
+
+    Args:
+        spec (dict): Plot spec
+        data (DataFrame): Dataset
+        profile (ColumnProfile): Column profile of the data
+        correlations (CorrelationEngine): Correlations of the data
+
+    Returns:
+        dict: Arrays or frames used by render_plot
+    """
+    columns = [next(c for c in data.columns if str(c) == name) for name in spec["columns"]]
+    plot_type = spec["type"]
+
+    if plot_type in ("histogram", "boxplot"):
+        return {"values": data[columns[0]].dropna()}
+    if plot_type == "heatmap":
+        return {"corr": correlations.matrix(spec["method"])}
+    if plot_type == "scatter":
+        pair = data[columns]
+        if len(pair) > SCATTER_SAMPLE_ROWS:
+            pair = pair.sample(n=SCATTER_SAMPLE_ROWS, random_state=42)
+        return {"x": pair[columns[0]], "y": pair[columns[1]]}
+    if plot_type == "bar":
+        return {"counts": profile.value_counts[columns[0]]}  # Top 10 categories
+    raise ValueError(f"Unknown plot type: {plot_type}")
+
+def _init_worker():
+    """Configure matplotlib once per rendering process."""
+    from analysis.imports import ensure_loaded
+
+    import matplotlib
+    matplotlib.use("Agg")
+    ensure_loaded("plots")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # Set style
+    sns.set(style="whitegrid")
+    plt.rcParams.update({'font.size': 10})
+    plt.rcParams["figure.figsize"] = (10, 6)
+
+def render_plot(spec, payload, fmt='png'):
+    """
+    Draw one plot.
+
+    Args:
+        spec (dict): Plot spec
+        payload (dict): Output of plot_payload
+        fmt (str): 'png' or 'svg'
+
+    Returns:
+        bytes: Encoded image
+    """
+    from io import BytesIO
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plot_type = spec["type"]
+    plt.figure()
+    try:
+        if plot_type == "histogram":
+            sns.histplot(payload["values"], kde=True)
+        elif plot_type == "heatmap":
+            corr = payload["corr"]
+            mask = np.triu(np.ones_like(corr, dtype=bool))
+            sns.heatmap(corr, mask=mask, annot=True, cmap='coolwarm', linewidths=0.5, fmt='.2f')
+        elif plot_type == "scatter":
+            sns.regplot(x=payload["x"], y=payload["y"], scatter_kws={'alpha':0.5})
+        elif plot_type == "boxplot":
+            sns.boxplot(y=payload["values"])
+        elif plot_type == "bar":
+            counts = payload["counts"]
+            sns.barplot(x=counts.index, y=counts.values)
+            plt.xticks(rotation=45, ha='right')
+        plt.title(spec["title"])
+        plt.tight_layout()
+
+        buf = BytesIO()
+        plt.savefig(buf, format=fmt, dpi=100)
+        return buf.getvalue()
+    finally:
+        plt.close()
+
+def _render_to_file(spec, payload, fmt, path):
+    """Render in a worker and write the image atomically; returns the path."""
+    image = render_plot(spec, payload, fmt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(image)
+    os.replace(tmp_path, path)
+    return path
+
+class PlotRenderer:
+    """
+    Renders plot specs in a process pool, caching images on disk.
+
+    Concurrent requests for the same image share one render.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_PLOT_CACHE_DIR, workers=PLOT_WORKERS, max_bytes=PLOT_CACHE_BYTES):
+        """
+        Args:
+            cache_dir (str): Root directory of cached images
+            workers (int): Rendering processes
+            max_bytes (int): Disk space for cached images
+        """
+        # Absolute, so workers and send_file agree on where images live
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self._executor = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def path(self, fingerprint, plot_id, fmt):
+        """Cache path of a rendered image."""
+        return os.path.join(self.cache_dir, fingerprint, f"{plot_id}.{fmt}")
+
+    def cached(self, fingerprint, plot_id, fmt):
+        """Path of the image if it was rendered already, else None."""
+        path = self.path(fingerprint, plot_id, fmt)
+        if not os.path.exists(path):
+            return None
+        touch(path)
+        return path
+
+    def _pool(self):
+        # Started on first use; spawned workers never inherit the server's threads or locks
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return self._executor
+
+    def render(self, fingerprint, spec, payload, fmt='png'):
+        """
+        Render a plot unless it is cached, and return the image path.
+
+        Args:
+            fingerprint (str): Dataset fingerprint
+            spec (dict): Plot spec
+            payload (dict): Output of plot_payload
+            fmt (str): 'png' or 'svg'
+
+        Returns:
+            str: Path of the cached image
+        """
+        if fmt not in PLOT_FORMATS:
+            raise ValueError(f"Unsupported plot format: {fmt}")
+        path = self.cached(fingerprint, spec["id"], fmt)
+        if path is not None:
+            return path
+
+        key = (fingerprint, spec["id"], fmt)
+        with self._lock:
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pool().submit(_render_to_file, spec, payload, fmt,
+                                             self.path(fingerprint, spec["id"], fmt))
+                future.add_done_callback(lambda _: self._forget(key))
+                self._pending[key] = future
+        path = future.result()
+        if owner:
+            evict_lru(self.cache_dir, self.max_bytes, tuple(f".{f}" for f in PLOT_FORMATS), keep=path)
+        return path
+
+    def _forget(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
@@ -0,0 +1,100 @@
+"""
+Per-column statistics computed once per dataset version.
+
+The summary, the column listing and every analysis stage need the same
+column types, missing counts, cardinalities and descriptive statistics.
+ColumnProfile computes them in a single set of vectorized passes over the
+frame; DataAnalysisTool keeps one profile per data version so repeated
+requests read cached values instead of rescanning the data.
+"""
+# Categorical columns with at most this many distinct values get value counts
+MAX_SUMMARY_CATEGORIES = 20
+
+# Number of most frequent values kept per categorical column
+TOP_VALUES = 10
+
+class ColumnProfile:
+    """Column types and statistics of one version of a DataFrame."""
+
+    def __init__(self, data, version=0):
+        """
+        Args:
+            data (DataFrame): Data to profile
+            version (int): Data version the profile belongs to
+        """
+        self.version = version
+        self.n_rows, self.n_cols = data.shape
+        self.dtypes = data.dtypes
+
+        # Column groups, resolved once instead of per select_dtypes call
+        self.numeric = data.select_dtypes(include=['number']).columns.tolist()
+        self.categorical = data.select_dtypes(include=['object', 'category']).columns.tolist()
+        self.datetime = data.select_dtypes(include=['datetime']).columns.tolist()
+
+        # One pass each over the whole frame
+        self.missing = data.isna().sum()
+        self.n_unique = data.nunique(dropna=True)
+
+        self.describe = data[self.numeric].describe() if self.numeric else None
+
+        self.value_counts = {}
+        for col in self.categorical:
+            if self.n_unique[col] <= MAX_SUMMARY_CATEGORIES:
+                self.value_counts[col] = data[col].value_counts().head(TOP_VALUES)
+
+        self._columns_info = None
+
+    def summary(self):
+        """
+        Dataset summary in the shape returned by DataAnalysisTool.load_data.
+
+        Returns:
+            dict: Shape, dtype counts, missing values, column groups and
+                numeric/categorical summaries
+        """
+        data_types = {}
+        for dtype in self.dtypes:
+            data_types[str(dtype)] = data_types.get(str(dtype), 0) + 1
+
+        missing_values = int(self.missing.sum())
+        cells = self.n_rows * self.n_cols
+        missing_percentage = (missing_values / cells) * 100 if cells else 0.0
+
+        return {
+            "n_rows": self.n_rows,
+            "n_cols": self.n_cols,
+            "data_types": data_types,
+            "missing_values": {
+                "count": missing_values,
+                "percentage": float(missing_percentage)
+            },
+            "columns": {
+                "numeric": list(self.numeric),
+                "categorical": list(self.categorical),
+                "datetime": list(self.datetime)
+            },
+            "numeric_summary": self.describe.to_dict() if self.describe is not None else None,
+            "categorical_summary": {col: counts.to_dict() for col, counts in self.value_counts.items()}
+        }
+
+    def columns_info(self):
+        """
+        Per-column listing for the /api/columns endpoint (built once).
+
+        Returns:
+            list: Dicts with name, dtype, unique_count, missing_count and
+                missing_percentage
+        """
+        if self._columns_info is None:
+            missing_pct = (self.missing / self.n_rows * 100).round(2) if self.n_rows else self.missing * 0.0
+            self._columns_info = [
+                {
+                    'name': col,
+                    'dtype': str(self.dtypes[col]),
+                    'unique_count': int(self.n_unique[col]),
+                    'missing_count': int(self.missing[col]),
+                    'missing_percentage': float(missing_pct[col])
+                }
+                for col in self.dtypes.index
+            ]
+        return self._columns_info
@@ -0,0 +1,265 @@
+"""
+Compact, token-budgeted summaries of analysis results for LLM prompts.
+
+Instead of dumping every result as indented JSON and cutting the string at
+a character limit, results are broken into small facts (one correlation
+pair, one column's outliers, one cluster profile, ...). Each fact gets a
+salience score, and the most salient facts are kept until the token budget
+is spent. The kept facts are serialized as compact JSON with rounded
+numbers, grouped by section.
+"""
+import os
+import json
+import math
+import logging
+
+try:
+    import tiktoken
+except ImportError:  # Tokens are estimated from characters without tiktoken
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Tokens available for the analysis context of one prompt
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", 2500))
+
+# Characters per token when tiktoken is not installed (conservative for JSON)
+CHARS_PER_TOKEN = 3.5
+
+# Significant digits kept for numbers
+SIGNIFICANT_DIGITS = 3
+
+# Correlations weaker than this are not worth a fact
+MIN_CORRELATION = 0.3
+
+# Facts per cluster and per target
+TOP_CLUSTER_COLUMNS = 3
+TOP_FEATURES = 3
+
+# Sections in prompt order, and the ones each AI task uses
+SECTIONS = ("dataset", "columns", "correlations", "outliers", "clusters", "important_features")
+TASK_SECTIONS = {
+    "insights": SECTIONS,
+    "story": ("dataset", "columns", "correlations", "outliers", "clusters"),
+}
+
+_encoding = None
+
+def count_tokens(text):
+    """Tokens in text: exact with tiktoken, otherwise a character-based estimate."""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _round(value):
+    """Round numbers to SIGNIFICANT_DIGITS, recursively; NaN and inf become None."""
+    if isinstance(value, dict):
+        return {str(k): _round(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_round(v) for v in value]
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if not math.isfinite(number):
+        return None
+    if number == int(number) and abs(number) < 1e15:
+        return int(number)
+    return float(f"{number:.{SIGNIFICANT_DIGITS}g}")
+
+def compact_json(value):
+    """JSON without whitespace and with rounded numbers."""
+    return json.dumps(_round(value), separators=(",", ":"), ensure_ascii=False)
+
+def compact_text(text):
+    """Strip indentation and blank lines from a prompt template."""
+    return "\n".join(line.strip() for line in text.strip().splitlines() if line.strip())
+
+def _dataset_facts(summary):
+    missing = summary.get("missing_values") or {}
+    yield math.inf, "dataset", {
+        "rows": summary.get("n_rows"),
+        "columns": summary.get("n_cols"),
+        "missing_pct": missing.get("percentage"),
+        "types": summary.get("data_types"),
+    }
+    for kind, columns in (summary.get("columns") or {}).items():
+        if columns:
+            yield 10, "dataset", {f"{kind}_columns": columns}
+
+def _column_facts(summary, focus):
+    for col, stats in (summary.get("numeric_summary") or {}).items():
+        fact = {"column": col}
+        fact.update({key: stats.get(key) for key in ("mean", "std", "min", "50%", "max") if key in stats})
+        yield (0.6 if col in focus else 0.2), "columns", fact
+    for col, counts in (summary.get("categorical_summary") or {}).items():
+        top = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:3]
+        yield (0.55 if col in focus else 0.15), "columns", {"column": col, "top_values": dict(top)}
+
+def _correlation_facts(correlation):
+    matrix = correlation.get("correlation_matrix") or {}
+    intervals = {
+        tuple(pair["variables"]): pair["confidence_interval"]
+        for pair in correlation.get("strong_correlations", []) if "confidence_interval" in pair
+    }
+    columns = list(matrix)
+    for i, a in enumerate(columns):
+        for b in columns[i + 1:]:
+            r = matrix[a].get(b)
+            if r is None or not math.isfinite(r) or abs(r) < MIN_CORRELATION:
+                continue
+            fact = {"pair": [a, b], "r": r}
+            if (a, b) in intervals:
+                fact["ci95"] = intervals[(a, b)]
+            yield abs(r), "correlations", fact
+
+def _outlier_facts(outliers):
+    for col, info in outliers.items():
+        if not isinstance(info, dict) or not info.get("count"):
+            continue
+        fact = {"column": col, "count": info["count"], "pct": info.get("percentage")}
+        if info.get("bounds"):
+            fact["normal_range"] = [info["bounds"].get("lower"), info["bounds"].get("upper")]
+        if info.get("percentage_ci"):
+            fact["pct_ci95"] = info["percentage_ci"]
+        # A few percent of outliers is already notable
+        yield min(1.0, 0.3 + (info.get("percentage") or 0) / 10), "outliers", fact
+
+def _cluster_facts(clusters, summary):
+    analysis = clusters.get("cluster_analysis") or {}
+    scores = clusters.get("silhouette_scores") or {}
+    k = clusters.get("optimal_clusters")
+    yield 0.9, "clusters", {"clusters": k, "silhouette": scores.get(k, scores.get(str(k)))}
+
+    overall = summary.get("numeric_summary") or {}
+    for name, info in analysis.items():
+        # Describe each cluster by the columns whose mean differs most from the overall mean
+        deviations = []
+        for col, stats in (info.get("summary") or {}).items():
+            base = overall.get(col) or {}
+            std = base.get("std")
+            if std and math.isfinite(std) and stats.get("mean") is not None and base.get("mean") is not None:
+                deviations.append(((stats["mean"] - base["mean"]) / std, col, stats["mean"]))
+        deviations.sort(key=lambda item: abs(item[0]), reverse=True)
+        fact = {
+            "cluster": name,
+            "pct": info.get("percentage"),
+            "distinct": {col: {"mean": mean, "z": z} for z, col, mean in deviations[:TOP_CLUSTER_COLUMNS]},
+        }
+        if info.get("percentage_ci"):
+            fact["pct_ci95"] = info["percentage_ci"]
+        yield 0.35 + 0.4 * (info.get("percentage") or 0) / 100, "clusters", fact
+
+def _importance_facts(importance):
+    for target, info in importance.items():
+        if not isinstance(info, dict) or not info.get("features"):
+            continue
+        score = info.get("model_score")
+        fact = {
+            "target": target,
+            "top_features": {f["feature"]: f["importance"] for f in info["features"][:TOP_FEATURES]},
+        }
+        if score is not None:
+            fact["r2"] = score
+        # Targets that are well explained by the other columns are the interesting ones
+        salience = min(1.0, max(0.0, score)) if score is not None else 0.5
+        yield 0.2 + 0.6 * salience, "important_features", fact
+
+def _approximation_facts(results):
+    for stage, result in results.items():
+        if not isinstance(result, dict):
+            continue
+        approximate = result.get("approximate")
+        if approximate is None:
+            first = next(iter(result.values()), None)
+            approximate = first.get("approximate") if isinstance(first, dict) else None
+        if approximate:
+            yield 5, "dataset", {"estimated_from_sample": stage, "sample_rows": approximate.get("sample_rows")}
+
+def analysis_facts(data_summary, analysis_results, sections=SECTIONS):
+    """
+    Break a data summary and analysis results into scored facts.
+
+    Args:
+        data_summary (dict): Output of DataAnalysisTool._generate_data_summary
+        analysis_results (dict): DataAnalysisTool.analysis_results
+        sections (tuple): Sections to include
+
+    Returns:
+        list: (salience, section, fact) tuples
+    """
+    summary = data_summary or {}
+    results = analysis_results or {}
+    correlation = results.get("correlation") or {}
+    importance = results.get("important_features") or {}
+
+    # Columns that appear in strong findings get their statistics promoted
+    focus = {col for pair in correlation.get("strong_correlations", []) for col in pair["variables"]}
+    focus.update(col for col, info in (results.get("outliers") or {}).items()
+                 if isinstance(info, dict) and (info.get("percentage") or 0) >= 1)
+
+    generators = {
+        "dataset": lambda: list(_dataset_facts(summary)) + list(_approximation_facts(results)),
+        "columns": lambda: _column_facts(summary, focus),
+        "correlations": lambda: _correlation_facts(correlation),
+        "outliers": lambda: _outlier_facts(results.get("outliers") or {}),
+        "clusters": lambda: _cluster_facts(results["clusters"], summary)
+            if "cluster_analysis" in (results.get("clusters") or {}) else [],
+        "important_features": lambda: _importance_facts(importance),
+    }
+    facts = []
+    for section in sections:
+        facts.extend(generators[section]())
+    return facts
+
+def _omitted_note(count):
+    return f"({count} less notable facts omitted)"
+
+def build_analysis_context(data_summary, analysis_results, budget=PROMPT_TOKEN_BUDGET, sections=SECTIONS):
+    """
+    Compact text with the most salient analysis facts that fit a token budget.
+
+    Args:
+        data_summary (dict): Data summary
+        analysis_results (dict): Analysis results by stage
+        budget (int): Maximum tokens of the returned text
+        sections (tuple): Sections to include
+
+    Returns:
+        tuple: (context text, report with tokens, facts kept and facts omitted)
+    """
+    facts = analysis_facts(data_summary, analysis_results, sections)
+    # Stable sort: equally salient facts keep their natural order
+    ranked = sorted(facts, key=lambda item: -item[0])
+
+    # Room for the note on omitted facts
+    kept, labelled, used = [], set(), count_tokens(_omitted_note(len(facts)))
+    for salience, section, fact in ranked:
+        # Each fact costs its JSON plus a separator, and the section label once
+        cost = count_tokens(compact_json(fact)) + 1
+        if section not in labelled:
+            cost += count_tokens(f"{section}: []\n")
+        if used + cost > budget:
+            continue
+        kept.append((section, fact))
+        labelled.add(section)
+        used += cost
+
+    # Within a section, facts stay in order of salience
+    by_section = {}
+    for section, fact in kept:
+        by_section.setdefault(section, []).append(fact)
+    lines = [f"{section}: {compact_json(by_section[section])}" for section in sections if section in by_section]
+    omitted = len(facts) - len(kept)
+    if omitted:
+        lines.append(_omitted_note(omitted))
+    text = "\n".join(lines)
+
+    report = {"tokens": count_tokens(text), "facts": len(kept), "omitted": omitted}
+    logger.debug(f"Analysis context: {report}")
+    return text, report
@@ -0,0 +1,267 @@
+import os
+import time
+import pickle
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Default memory budget for all resident datasets (bytes)
+DEFAULT_MEMORY_BUDGET = int(os.environ.get("DATASET_MEMORY_BUDGET_MB", 2048)) * 1024 * 1024
+
+# Where evicted datasets are spilled
+DEFAULT_SPILL_DIR = os.environ.get("DATASET_SPILL_DIR", os.path.join("cache", "spill"))
+
+# Datasets unused for this long are dropped, with their spilled copies
+DEFAULT_IDLE_TTL = float(os.environ.get("DATASET_IDLE_TTL_SECONDS", 6 * 3600))
+
+# Seconds between sweeps for idle datasets
+SWEEP_INTERVAL = 60
+
+class _Entry:
+    """Bookkeeping for one registered dataset."""
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.lock = threading.RLock()
+        self.pins = 0
+        self.nbytes = 0
+        self.measured_data = None
+        self.spill_path = None
+        self.last_used = time.monotonic()
+        # Disk data owned by the dataset alone (e.g. forked stores), known even while spilled
+        self.owned_paths = []
+        # Stores the dataset reads, kept out of store eviction
+        self.store_paths = []
+
+class DatasetRegistry:
+    """
+    Registry of DataAnalysisTool instances keyed by session or dataset ID.
+
+    Every dataset has its own lock, so concurrent requests against the same
+    dataset are serialized while different datasets are analyzed in parallel.
+    The deep memory footprint of resident datasets is kept under a global
+    budget by spilling the least recently used ones to disk; they are
+    transparently reloaded on next use. Datasets idle for longer than
+    idle_ttl are dropped altogether, and their spilled copies and any disk
+    data they own (analyzer.owned_paths()) are deleted.
+
+    Datasets live in the memory of this process, so the app must be served
+    by a single process (see gunicorn.conf.py).
+    """
+
+    def __init__(self, factory, memory_budget=DEFAULT_MEMORY_BUDGET, spill_dir=DEFAULT_SPILL_DIR,
+                 idle_ttl=DEFAULT_IDLE_TTL):
+        """
+        Args:
+            factory (callable): Creates a new, empty analyzer
+            memory_budget (int): Maximum bytes of resident dataset memory
+            spill_dir (str): Directory for evicted datasets
+            idle_ttl (float): Seconds after last use before a dataset is dropped
+        """
+        self.factory = factory
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.idle_ttl = idle_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def _get_entry(self, dataset_id):
+        with self._lock:
+            entry = self._entries.get(dataset_id)
+            if entry is None:
+                entry = _Entry(self.factory())
+                self._entries[dataset_id] = entry
+            self._entries.move_to_end(dataset_id)
+            entry.pins += 1
+            entry.last_used = time.monotonic()
+            return entry
+
+    @contextmanager
+    def use(self, dataset_id):
+        """
+        Lock a dataset and yield its analyzer.
+
+        The dataset is pinned (never evicted) while in use and its memory
+        footprint is re-measured afterwards.
+
+        Args:
+            dataset_id (str): Session or dataset identifier
+
+        Yields:
+            DataAnalysisTool: The analyzer for this dataset
+        """
+        entry = self._get_entry(dataset_id)
+        try:
+            with entry.lock:
+                if entry.analyzer is None:
+                    self._restore(dataset_id, entry)
+                yield entry.analyzer
+                self._measure(entry)
+        finally:
+            with self._lock:
+                entry.pins -= 1
+                entry.last_used = time.monotonic()
+        self._enforce_budget()
+        self._expire_idle()
+
+    def drop(self, dataset_id):
+        """Forget a dataset and delete its spilled copy and owned disk data."""
+        with self._lock:
+            entry = self._entries.pop(dataset_id, None)
+        if entry is not None:
+            with entry.lock:
+                self._remove_files(entry)
+
+    def _remove_spill(self, entry):
+        if entry.spill_path:
+            try:
+                os.remove(entry.spill_path)
+            except FileNotFoundError:
+                pass
+            entry.spill_path = None
+
+    def _remove_files(self, entry):
+        """Delete the spilled copy and owned disk data of a dropped dataset."""
+        self._remove_spill(entry)
+        for path in entry.owned_paths:
+            shutil.rmtree(path, ignore_errors=True)
+        entry.owned_paths = []
+
+    def _expire_idle(self):
+        """Drop datasets unused for longer than idle_ttl, at most once per SWEEP_INTERVAL."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep < SWEEP_INTERVAL:
+                return
+            self._last_sweep = now
+            # Entries are kept in order of use, so idle ones are at the front
+            expired = []
+            for dataset_id, entry in self._entries.items():
+                if now - entry.last_used <= self.idle_ttl:
+                    break
+                if entry.pins == 0:
+                    expired.append((dataset_id, entry))
+            for dataset_id, _ in expired:
+                del self._entries[dataset_id]
+            live_spills = {e.spill_path for e in self._entries.values() if e.spill_path}
+
+        for dataset_id, entry in expired:
+            # Wait for a spill in progress before deleting its file
+            with entry.lock:
+                self._remove_files(entry)
+                entry.analyzer = None
+            logger.info(f"Dropped dataset {dataset_id} after {self.idle_ttl:.0f}s idle")
+        self._remove_orphaned_spills(live_spills)
+
+    def _remove_orphaned_spills(self, live_spills):
+        """Delete spill files no entry refers to, e.g. left behind by a previous process."""
+        if not os.path.isdir(self.spill_dir):
+            return
+        cutoff = time.time() - self.idle_ttl
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            try:
+                if path not in live_spills and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
+
+    def store_paths(self, exclude=None):
+        """
+        Stores read by registered datasets, resident or spilled.
+
+        Args:
+            exclude (str, optional): Dataset whose recorded stores are left out,
+                e.g. one being reloaded, whose current stores the caller adds
+
+        Returns:
+            set: Store paths
+        """
+        with self._lock:
+            return {path for dataset_id, e in self._entries.items() if dataset_id != exclude
+                    for path in e.store_paths}
+
+    def memory_usage(self):
+        """Total measured bytes of resident datasets."""
+        with self._lock:
+            return sum(e.nbytes for e in self._entries.values() if e.analyzer is not None)
+
+    def stats(self):
+        """Summary of registered datasets for monitoring."""
+        with self._lock:
+            resident = [e for e in self._entries.values() if e.analyzer is not None]
+            return {
+                "datasets": len(self._entries),
+                "idle_ttl": self.idle_ttl,
+                "resident": len(resident),
+                "spilled": len(self._entries) - len(resident),
+                "resident_bytes": sum(e.nbytes for e in resident),
+                "memory_budget": self.memory_budget,
+            }
+
+    def _measure(self, entry):
+        analyzer = entry.analyzer
+        entry.owned_paths = list(analyzer.owned_paths()) if hasattr(analyzer, "owned_paths") else []
+        entry.store_paths = list(analyzer.store_paths()) if hasattr(analyzer, "store_paths") else []
+        # Deep memory_usage is expensive on object columns; only re-measure when the data changed
+        if analyzer.data is entry.measured_data:
+            return
+        entry.nbytes = analyzer.memory_usage()
+        entry.measured_data = analyzer.data
+
+    def _enforce_budget(self):
+        while True:
+            with self._lock:
+                resident = sum(e.nbytes for e in self._entries.values() if e.analyzer is not None)
+                if resident <= self.memory_budget:
+                    return
+                victim = next(
+                    ((key, e) for key, e in self._entries.items()
+                     if e.analyzer is not None and e.pins == 0 and e.nbytes > 0),
+                    None
+                )
+                if victim is None:
+                    logger.warning(f"Dataset memory {resident} bytes exceeds budget but all datasets are in use")
+                    return
+                dataset_id, entry = victim
+                # Pin while spilling so no request grabs a half-written entry
+                entry.pins += 1
+
+            try:
+                with entry.lock:
+                    self._spill(dataset_id, entry)
+            finally:
+                with self._lock:
+                    entry.pins -= 1
+
+    def _spill_path(self, dataset_id):
+        safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in dataset_id)
+        return os.path.join(self.spill_dir, f"{safe_id}.pkl")
+
+    def _spill(self, dataset_id, entry):
+        """Write an analyzer to disk and release its memory."""
+        if entry.analyzer is None:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = self._spill_path(dataset_id)
+        with open(path, "wb") as f:
+            pickle.dump(entry.analyzer, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        logger.info(f"Spilled dataset {dataset_id} ({entry.nbytes} bytes) to {path}")
+        entry.spill_path = path
+        entry.analyzer = None
+        entry.measured_data = None
+        entry.nbytes = 0
+
+    def _restore(self, dataset_id, entry):
+        """Reload a spilled analyzer."""
+        with open(entry.spill_path, "rb") as f:
+            entry.analyzer = pickle.load(f)
+        os.remove(entry.spill_path)
+        entry.spill_path = None
+        logger.info(f"Restored dataset {dataset_id} from disk")
@@ -0,0 +1,150 @@
+"""
+Samples for approximate analysis of very large datasets, and the
+confidence intervals that go with them.
+
+Above APPROX_ROW_THRESHOLD rows, analysis stages can run on a sample of
+APPROX_SAMPLE_ROWS rows. The sample is stratified by a low-cardinality
+categorical column when there is one, so every group keeps its share of
+rows; otherwise it is uniform. Results are annotated with the sample size
+and 95% confidence intervals so estimates are never mistaken for exact
+values.
+"""
+import os
+import numpy as np
+
+# Datasets with more rows than this are analyzed on a sample by default
+APPROX_ROW_THRESHOLD = int(os.environ.get("APPROX_ROW_THRESHOLD", 1000000))
+
+# Rows in the analysis sample
+APPROX_SAMPLE_ROWS = int(os.environ.get("APPROX_SAMPLE_ROWS", 100000))
+
+# Categorical columns with at most this many groups can stratify the sample
+MAX_STRATA = 50
+
+# Normal quantile of the reported confidence level
+CONFIDENCE = 0.95
+Z_SCORE = 1.959964
+
+def choose_strata(profile):
+    """First categorical column with 2..MAX_STRATA groups, or None."""
+    for col in profile.categorical:
+        if 2 <= profile.n_unique[col] <= MAX_STRATA:
+            return col
+    return None
+
+def draw_sample(data, size, strata=None, seed=42):
+    """
+    Sample rows, proportionally per stratum when a strata column is given.
+
+    Args:
+        data (DataFrame): Full dataset
+        size (int): Target number of rows
+        strata (str, optional): Column to stratify by
+        seed (int): Random seed
+
+    Returns:
+        tuple: (sample DataFrame, sampling method name)
+    """
+    if len(data) <= size:
+        return data, "full"
+    if strata is None:
+        return data.sample(n=size, random_state=seed), "uniform"
+
+    # Missing values form their own stratum
+    groups = data.groupby(data[strata].astype(object).fillna("__missing__"), observed=True, sort=False)
+    sample = groups.sample(frac=size / len(data), random_state=seed)
+    return sample, f"stratified:{strata}"
+
+def wilson_interval(count, n, z=Z_SCORE):
+    """
+    Wilson score interval of a proportion.
+
+    Args:
+        count (int): Successes in the sample
+        n (int): Sample size
+
+    Returns:
+        tuple: (lower, upper) proportions
+    """
+    if n == 0:
+        return 0.0, 1.0
+    p = count / n
+    denominator = 1 + z ** 2 / n
+    center = (p + z ** 2 / (2 * n)) / denominator
+    margin = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+def fisher_interval(r, n, z=Z_SCORE):
+    """
+    Confidence interval of a correlation coefficient via Fisher's z transform.
+
+    Args:
+        r (float): Sample correlation
+        n (int): Sample size
+
+    Returns:
+        tuple: (lower, upper) correlations
+    """
+    if n <= 3 or not np.isfinite(r):
+        return -1.0, 1.0
+    center = np.arctanh(np.clip(r, -0.999999, 0.999999))
+    margin = z / np.sqrt(n - 3)
+    return float(np.tanh(center - margin)), float(np.tanh(center + margin))
+
+def _percentage_interval(count, n):
+    lower, upper = wilson_interval(count, n)
+    return [round(float(lower) * 100, 2), round(float(upper) * 100, 2)]
+
+def add_confidence_intervals(stage, result, sample_rows, total_rows, method):
+    """
+    Annotate a stage result computed on a sample.
+
+    Correlations gain Fisher intervals, outlier and cluster percentages gain
+    Wilson intervals, and counts are scaled up to the full dataset (the
+    sample counts are kept alongside). Every result gets an "approximate"
+    entry describing the sample.
+
+    Args:
+        stage (str): Analysis stage name
+        result (dict): Stage result computed on the sample
+        sample_rows (int): Rows in the sample
+        total_rows (int): Rows in the full dataset
+        method (str): How the sample was drawn
+
+    Returns:
+        dict: The annotated result
+    """
+    if not isinstance(result, dict) or "message" in result:
+        return result
+    scale = total_rows / sample_rows if sample_rows else 1.0
+
+    if stage == "correlation":
+        n = result.get("rows_used", sample_rows)
+        for pair in result.get("strong_correlations", []):
+            pair["confidence_interval"] = [round(v, 3) for v in fisher_interval(pair["correlation"], n)]
+
+    elif stage == "outliers":
+        for info in result.values():
+            sample_count = info["count"]
+            info["sample_count"] = sample_count
+            info["count"] = int(round(sample_count * scale))
+            info["percentage_ci"] = _percentage_interval(sample_count, sample_rows)
+
+    elif stage == "clusters":
+        for info in result.get("cluster_analysis", {}).values():
+            sample_size = info["size"]
+            info["sample_size"] = sample_size
+            info["size"] = int(round(sample_size * scale))
+            info["percentage_ci"] = _percentage_interval(sample_size, sample_rows)
+
+    approximate = {
+        "sample_rows": int(sample_rows),
+        "total_rows": int(total_rows),
+        "sampling": method,
+        "confidence": CONFIDENCE
+    }
+    if stage in ("outliers", "important_features"):
+        # These results are keyed by column; keep the marker out of the column map
+        return {col: dict(info, approximate=approximate) for col, info in result.items()}
+    result["approximate"] = approximate
+    return result
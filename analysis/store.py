@@ -0,0 +1,333 @@
+"""
+Columnar on-disk storage for datasets.
+
+ChunkStore persists a dataset as a directory of Parquet part files written
+chunk by chunk, so data larger than RAM can be ingested once and scanned
+later with bounded memory. A new store is built in a private temporary
+directory and renamed into place when complete, together with the merged
+summary state, so reloading the same file reads neither the CSV nor the parts.
+
+DatasetCache keeps parsed uploads as Arrow IPC files keyed by content hash.
+Reopening memory-maps the file, so reloads skip parsing entirely and the
+pages are shared by every worker process that opens the same dataset. The
+least recently used files are evicted beyond DATASET_CACHE_MB.
+"""
+import os
+import json
+import uuid
+import pickle
+import shutil
+import hashlib
+import logging
+import pandas as pd
+
+from analysis.diskcache import evict_lru, evict_lru_dirs, remove_file, touch
+
+logger = logging.getLogger(__name__)
+
+# Root directory for on-disk dataset storage
+DEFAULT_STORE_DIR = os.environ.get("DATASET_STORE_DIR", os.path.join("cache", "stores"))
+
+# Disk space for chunk stores; least recently used stores not in use are evicted beyond it
+STORE_CACHE_BYTES = int(os.environ.get("STORE_CACHE_MB", 16384)) * 1024 * 1024
+
+# Root directory for parsed, memory-mappable copies of uploads
+DEFAULT_CACHE_DIR = os.environ.get("DATASET_CACHE_DIR", os.path.join("cache", "datasets"))
+
+# Disk space for parsed datasets and analysis snapshots; least recently used ones are evicted beyond it
+DATASET_CACHE_BYTES = int(os.environ.get("DATASET_CACHE_MB", 4096)) * 1024 * 1024
+
+META_FILE = "_meta.json"
+
+# Accumulators and sample of a complete store
+STATE_FILE = "_state.pkl"
+
+def hash_file(file_path, block_size=1 << 20):
+    """SHA-256 of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def hash_frame(df):
+    """
+    Content fingerprint of a DataFrame: column names, dtypes and values.
+
+    Args:
+        df (DataFrame): Data to fingerprint
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+class ChunkStore:
+    """A dataset stored as ordered Parquet part files."""
+
+    def __init__(self, path):
+        self.path = path
+        # Where a store built by create() is moved on finalize()
+        self.final_path = None
+        self.meta = {"parts": [], "n_rows": 0, "columns": []}
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+
+    @classmethod
+    def create(cls, path):
+        """
+        Create an empty store that appears at path once finalized.
+
+        Parts are written to a temporary directory of this call only, so
+        concurrent loads of the same file never delete each other's parts,
+        and a store at path is only ever replaced by a complete one.
+        """
+        build_path = f"{path}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+        os.makedirs(build_path)
+        store = cls(build_path)
+        store.final_path = path
+        return store
+
+    def fork(self, path):
+        """
+        New store at path holding this store's rows, without copying them.
+
+        Existing part files are referenced by absolute path, so rows can be
+        appended to the fork while this store stays unchanged. The fork is
+        private to one dataset and removed with it (see remove()).
+        """
+        os.makedirs(path)
+        fork = ChunkStore(path)
+        fork.meta = dict(self.meta, complete=False, forked_from=os.path.abspath(self.path), parts=[
+            os.path.abspath(os.path.join(self.path, name)) for name in self.meta["parts"]
+        ])
+        fork._write_meta()
+        return fork
+
+    @property
+    def n_rows(self):
+        return self.meta["n_rows"]
+
+    @property
+    def columns(self):
+        return self.meta["columns"]
+
+    @property
+    def complete(self):
+        return self.meta.get("complete", False)
+
+    @property
+    def private(self):
+        """Whether this is a fork owned by one dataset, rather than a store shared by content hash."""
+        return "forked_from" in self.meta
+
+    def remove(self):
+        """Delete a private store and its own parts; shared stores and their parts are kept."""
+        if self.private:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def append(self, chunk):
+        """Write a DataFrame chunk as the next part file."""
+        name = f"part-{len(self.meta['parts']):05d}.parquet"
+        chunk.to_parquet(os.path.join(self.path, name), index=False)
+        self.meta["parts"].append(name)
+        self.meta["n_rows"] += len(chunk)
+        if not self.meta["columns"]:
+            self.meta["columns"] = [str(c) for c in chunk.columns]
+        self._write_meta()
+
+    def finalize(self, state=None, **extra):
+        """
+        Mark the store complete, record extra metadata (e.g. the read plan)
+        and move a store built by create() into place.
+
+        Args:
+            state (dict, optional): Picklable summary state (accumulators,
+                sample) to restore instead of re-reading the parts
+        """
+        if state is not None:
+            tmp_path = os.path.join(self.path, STATE_FILE + ".tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, os.path.join(self.path, STATE_FILE))
+        self.meta.update(extra)
+        self.meta["complete"] = True
+        self._write_meta()
+        if self.final_path is not None:
+            self._publish()
+
+    def _publish(self):
+        final_path, self.final_path = self.final_path, None
+        try:
+            os.rename(self.path, final_path)
+        except OSError:
+            existing = ChunkStore(final_path)
+            if existing.complete:
+                # A concurrent load of the same content finished first; use its store
+                shutil.rmtree(self.path, ignore_errors=True)
+                self.meta = existing.meta
+            else:
+                # Swap out an incomplete store left behind by an interrupted load
+                stale_path = f"{final_path}.{os.getpid()}-{uuid.uuid4().hex[:8]}.stale"
+                os.rename(final_path, stale_path)
+                os.rename(self.path, final_path)
+                shutil.rmtree(stale_path, ignore_errors=True)
+                logger.info(f"Replaced incomplete store at {final_path}")
+        self.path = final_path
+
+    def load_state(self):
+        """Summary state saved by finalize(), or None."""
+        try:
+            with open(os.path.join(self.path, STATE_FILE), "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # Missing, or saved by an incompatible version; the caller rebuilds it
+            return None
+
+    def discard(self):
+        """Delete a store built by create() that will not be finalized."""
+        if self.final_path is not None:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.final_path = None
+
+    def _write_meta(self):
+        tmp_path = os.path.join(self.path, META_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f, default=str)
+        os.replace(tmp_path, os.path.join(self.path, META_FILE))
+
+    def iter_chunks(self, columns=None):
+        """
+        Yield the stored chunks in order.
+
+        Args:
+            columns (list, optional): Only read these columns
+
+        Yields:
+            DataFrame: One part file at a time
+        """
+        for name in self.meta["parts"]:
+            yield pd.read_parquet(os.path.join(self.path, name), columns=columns)
+
+    def read(self, columns=None):
+        """Read the whole store into memory (only for data that fits)."""
+        chunks = list(self.iter_chunks(columns))
+        if not chunks:
+            return pd.DataFrame(columns=columns or self.columns)
+        return pd.concat(chunks, ignore_index=True)
+
+def evict_stores(in_use=(), store_dir=DEFAULT_STORE_DIR, max_bytes=STORE_CACHE_BYTES):
+    """
+    Delete least recently used stores until the store directory fits STORE_CACHE_MB.
+
+    Args:
+        in_use (iterable): Store paths datasets still read, never evicted
+        store_dir (str): Root directory of the stores
+        max_bytes (int): Disk space for all stores
+
+    Returns:
+        list: Evicted store paths
+    """
+    return evict_lru_dirs(store_dir, max_bytes, keep=in_use)
+
+class DatasetCache:
+    """Parsed datasets stored as Arrow IPC files, keyed by content hash."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DATASET_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _path(self, key, suffix):
+        return os.path.join(self.cache_dir, f"{key}{suffix}")
+
+    def has(self, key):
+        """Whether a dataset is cached; marks it as used, since callers open it next."""
+        path = self._path(key, ".arrow")
+        if not os.path.exists(path):
+            return False
+        touch(path)
+        return True
+
+    def put(self, key, df, meta=None):
+        """
+        Store a DataFrame under a key, if Arrow can represent it.
+
+        The file is written uncompressed so it can be memory-mapped, and
+        renamed into place atomically so concurrent readers never see a
+        partial file. Caching is best-effort: frames Arrow cannot convert
+        (e.g. object columns mixing numbers and strings) are not stored.
+
+        Args:
+            key (str): Content hash of the source
+            df (DataFrame): Parsed data
+            meta (dict, optional): Extra JSON metadata, e.g. the load report
+
+        Returns:
+            bool: Whether the frame was cached
+        """
+        import pyarrow as pa
+
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except pa.ArrowException as e:
+            logger.warning(f"Not caching dataset {key[:12]}: {str(e)}")
+            return False
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._path(key, f".arrow.{os.getpid()}.tmp")
+        try:
+            with pa.OSFile(tmp_path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        except pa.ArrowException as e:
+            remove_file(tmp_path)
+            logger.warning(f"Not caching dataset {key[:12]}: {str(e)}")
+            return False
+        if meta is not None:
+            with open(self._path(key, ".json"), "w") as f:
+                json.dump(meta, f, default=str)
+        path = self._path(key, ".arrow")
+        os.replace(tmp_path, path)
+        evict_lru(self.cache_dir, self.max_bytes, ".arrow", keep=path, delete=self._remove)
+        return True
+
+    def _remove(self, path):
+        # Metadata goes with its dataset
+        remove_file(path)
+        remove_file(path[:-len(".arrow")] + ".json")
+
+    def open(self, key, columns=None):
+        """
+        Memory-map a cached dataset.
+
+        Args:
+            key (str): Content hash
+            columns (list, optional): Only materialize these columns
+
+        Returns:
+            DataFrame: The dataset; numeric columns without nulls reference
+                the mapped file directly
+        """
+        import pyarrow as pa
+
+        path = self._path(key, ".arrow")
+        source = pa.memory_map(path, "r")
+        # Open mappings survive eviction; the access time only orders what is evicted
+        touch(path)
+        table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        return table.to_pandas(split_blocks=True)
+
+    def meta(self, key):
+        """Metadata stored alongside a dataset, or None."""
+        path = self._path(key, ".json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
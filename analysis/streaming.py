@@ -0,0 +1,226 @@
+"""
+Chunked CSV ingestion for files larger than memory.
+
+The file is parsed in chunks. Each chunk updates mergeable summary
+accumulators, is appended to an on-disk columnar store and contributes to a
+bounded uniform sample that in-memory analysis stages can use. The merged
+accumulators and the sample are saved with the store, so loading the same
+file again restores them without reading any chunk.
+"""
+import os
+import time
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+from analysis.accumulators import DatasetAccumulator
+from analysis.ingest import MemoryMonitor, infer_read_plan, DEFAULT_SAMPLE_ROWS
+from analysis.store import ChunkStore, DEFAULT_STORE_DIR
+from analysis.diskcache import touch
+
+logger = logging.getLogger(__name__)
+
+# Rows parsed per chunk
+DEFAULT_CHUNK_ROWS = int(os.environ.get("STREAMING_CHUNK_ROWS", 200000))
+
+# Rows kept in memory as a uniform sample of the full dataset
+DEFAULT_IN_MEMORY_ROWS = int(os.environ.get("STREAMING_SAMPLE_ROWS", 200000))
+
+# Files larger than this are streamed instead of loaded whole
+STREAMING_THRESHOLD_BYTES = int(os.environ.get("STREAMING_THRESHOLD_MB", 256)) * 1024 * 1024
+
+class StreamingResult:
+    """Outcome of a streaming load."""
+
+    def __init__(self, summary, store, sample, accumulator):
+        self.summary = summary
+        self.store = store
+        self.sample = sample
+        self.accumulator = accumulator
+
+def should_stream(file_path):
+    """Check whether a file is large enough to require streaming ingestion."""
+    return (os.path.splitext(file_path)[1].lower() == '.csv'
+            and os.path.getsize(file_path) > STREAMING_THRESHOLD_BYTES)
+
+def store_path_for(file_path, store_dir=DEFAULT_STORE_DIR):
+    """Store directory for a source file, keyed by path, size and mtime."""
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return os.path.join(store_dir, hashlib.sha1(key.encode()).hexdigest()[:16])
+
+def _reservoir_update(sample, sample_keys, chunk, rng, size):
+    """Keep the rows with the smallest random keys, a uniform sample of everything seen."""
+    keys = rng.random(len(chunk))
+    if sample is None:
+        combined, combined_keys = chunk, keys
+    else:
+        combined = pd.concat([sample, chunk], ignore_index=True)
+        combined_keys = np.concatenate([sample_keys, keys])
+
+    if len(combined) <= size:
+        return combined.reset_index(drop=True), combined_keys
+
+    keep = np.argpartition(combined_keys, size)[:size]
+    keep.sort()
+    return combined.iloc[keep].reset_index(drop=True), combined_keys[keep]
+
+def reservoir_append(sample, seen, chunk, rng, size):
+    """
+    Extend a uniform sample of `seen` rows with the rows of a new chunk.
+
+    Row t of the stream (1-based) enters the sample with probability
+    size / t and replaces a random slot, so the sample stays uniform over
+    everything seen without the keys used by _reservoir_update.
+
+    Returns:
+        DataFrame: Updated sample
+    """
+    room = max(0, size - len(sample))
+    head = chunk.iloc[:room]
+    if len(head):
+        sample = pd.concat([sample, head], ignore_index=True)
+    rest = chunk.iloc[room:]
+    if rest.empty:
+        return sample
+
+    t = seen + len(head) + np.arange(1, len(rest) + 1)
+    chosen = np.flatnonzero(rng.random(len(rest)) < size / t)
+    if chosen.size == 0:
+        return sample
+
+    # A slot hit more than once keeps its latest row
+    slots = pd.Series(rng.integers(0, size, chosen.size))
+    last = ~slots.duplicated(keep='last').to_numpy()
+    slots, chosen = slots.to_numpy()[last], chosen[last]
+
+    sample = sample.copy()
+    for col in sample.columns:
+        values = rest[col].iloc[chosen]
+        if isinstance(sample[col].dtype, pd.CategoricalDtype):
+            new = pd.Index(values.dropna().unique()).difference(sample[col].cat.categories)
+            if len(new):
+                sample[col] = sample[col].cat.add_categories(new)
+        sample.iloc[slots, sample.columns.get_loc(col)] = values.to_numpy()
+    return sample
+
+def append_chunks(chunks, store, accumulator, sample, sample_rows=DEFAULT_IN_MEMORY_ROWS, seed=42):
+    """
+    Add new rows to a streamed dataset.
+
+    Every chunk is appended to the store and folded into the accumulators
+    and the in-memory sample, so the cost depends only on the new rows.
+
+    Args:
+        chunks (iterable): New rows as DataFrames
+        store (ChunkStore): Store to append to
+        accumulator (DatasetAccumulator): Accumulators of the stored rows
+        sample (DataFrame): Uniform sample of the stored rows
+        sample_rows (int): Size of the in-memory sample
+        seed (int): Random seed for sampling
+
+    Returns:
+        tuple: (updated sample, rows appended)
+    """
+    rng = np.random.default_rng([seed, store.n_rows])
+    appended = 0
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        chunk = chunk[store.columns]
+        seen = store.n_rows
+        store.append(chunk)
+        accumulator.update(chunk)
+        sample = reservoir_append(sample, seen, chunk[list(sample.columns)], rng, sample_rows)
+        appended += len(chunk)
+    return sample, appended
+
+def stream_csv(file_path, store_path=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+               sample_rows=DEFAULT_IN_MEMORY_ROWS, seed=42):
+    """
+    Ingest a CSV file chunk by chunk.
+
+    Args:
+        file_path (str): CSV file to read
+        store_path (str, optional): Directory for the columnar store
+        chunk_rows (int): Rows per chunk
+        sample_rows (int): Size of the in-memory uniform sample
+        seed (int): Random seed for sampling
+
+    Returns:
+        StreamingResult: Summary, store, in-memory sample and accumulators
+    """
+    store_path = store_path or store_path_for(file_path)
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+
+    # A complete store for the same content makes re-parsing the CSV unnecessary
+    store = ChunkStore(store_path)
+    reused = store.complete
+    if reused:
+        # The directory's mtime orders store eviction
+        touch(store_path)
+    state = store.load_state() if reused else None
+    if state is not None:
+        plan = store.meta["plan"]
+        chunks = []
+    elif reused:
+        # Stores saved without their state rebuild it from the parts once
+        plan = store.meta["plan"]
+        chunks = store.iter_chunks()
+    else:
+        plan = infer_read_plan(pd.read_csv(file_path, nrows=DEFAULT_SAMPLE_ROWS))
+        store = ChunkStore.create(store_path)
+        chunks = pd.read_csv(file_path, chunksize=chunk_rows, dtype=plan["dtype"] or None,
+                             parse_dates=plan["parse_dates"] or None)
+
+    accumulator = DatasetAccumulator()
+    sample, sample_keys = None, None
+    n_chunks = 0
+    if state is not None:
+        accumulator, sample = state["accumulator"], state["sample"]
+        n_chunks = len(store.meta["parts"])
+
+    try:
+        with MemoryMonitor() as monitor:
+            for chunk in chunks:
+                accumulator.update(chunk)
+                if not reused:
+                    store.append(chunk)
+                sample, sample_keys = _reservoir_update(sample, sample_keys, chunk, rng, sample_rows)
+                n_chunks += 1
+        if sample is None:
+            raise ValueError("No rows found in file")
+    except Exception:
+        # A failed load leaves no partial store behind
+        if not reused:
+            store.discard()
+        raise
+
+    # Categories differ per chunk; re-categorize the concatenated sample
+    for col, dtype in plan["dtype"].items():
+        if col in sample.columns and dtype == "category":
+            sample[col] = sample[col].astype("category")
+
+    if not reused:
+        store.finalize(state={"accumulator": accumulator, "sample": sample},
+                       plan=plan, source=os.path.abspath(file_path))
+    elif state is None:
+        store.finalize(state={"accumulator": accumulator, "sample": sample})
+
+    summary = accumulator.summary()
+    summary["streaming"] = {
+        "chunks": n_chunks,
+        "chunk_rows": chunk_rows,
+        "sample_rows": len(sample),
+        "store_path": store_path,
+        "reused_store": reused,
+        "load_seconds": round(time.perf_counter() - started, 3),
+    }
+    summary["memory"] = {
+        "steady_state_bytes": int(sample.memory_usage(deep=True).sum()),
+        "peak_bytes": monitor.peak_increase,
+    }
+
+    logger.info(f"Streamed {summary['n_rows']} rows in {n_chunks} chunks into {store_path}")
+    return StreamingResult(summary, store, sample, accumulator)
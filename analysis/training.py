@@ -0,0 +1,224 @@
+"""
+Model engines for prediction, with timing, parallelism and row caps.
+
+Three engines trade speed for quality: a random forest with trees fitted on
+every core, histogram-based gradient boosting (fast on millions of rows,
+with early stopping on a validation split) and a scaled linear baseline.
+Training rows are capped by a random sample, cross-validation folds run in
+parallel, and fit and evaluation times are reported with the scores.
+scikit-learn is imported on first use.
+"""
+import os
+import time
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Supported engines
+MODEL_ENGINES = ('random_forest', 'hist_gradient_boosting', 'linear')
+
+# Parallel jobs for tree fitting and cross-validation; -1 uses every core
+TRAINING_JOBS = int(os.environ.get("TRAINING_JOBS", -1))
+
+# Rows above which a random sample is used for training
+PREDICT_SAMPLE_ROWS = int(os.environ.get("PREDICT_SAMPLE_ROWS", 1000000))
+
+# Training rows scored for the training score
+EVAL_SAMPLE_ROWS = 100000
+
+# Largest number of cross-validation folds
+MAX_CV_FOLDS = 10
+
+# Integer targets with fewer distinct values than this are treated as classes
+MAX_CLASSES = 10
+
+def infer_task(y):
+    """
+    'classification' for categorical, boolean or few-valued integer targets,
+    'regression' otherwise.
+    """
+    if y.dtype == 'object' or y.dtype == 'category' or y.dtype == 'bool':
+        return 'classification'
+    values = y.dropna()
+    # A float target with fractional values is a quantity, however few distinct values it has
+    if not np.all(np.mod(values.to_numpy(dtype=np.float64), 1) == 0):
+        return 'regression'
+    return 'classification' if values.nunique() < MAX_CLASSES else 'regression'
+
+def make_model(engine, task, n_jobs=TRAINING_JOBS, early_stopping=True):
+    """
+    Unfitted estimator for an engine and task.
+
+    Args:
+        engine (str): One of MODEL_ENGINES
+        task (str): 'classification' or 'regression'
+        n_jobs (int): Parallel jobs for engines that support them
+        early_stopping (bool): Stop boosting when the validation score stops improving
+
+    Returns:
+        Estimator
+    """
+    classification = task == 'classification'
+    if engine == 'random_forest':
+        from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+        cls = RandomForestClassifier if classification else RandomForestRegressor
+        return cls(n_estimators=100, n_jobs=n_jobs, random_state=42)
+    if engine == 'hist_gradient_boosting':
+        from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
+
+        cls = HistGradientBoostingClassifier if classification else HistGradientBoostingRegressor
+        return cls(max_iter=300, early_stopping=bool(early_stopping), validation_fraction=0.1,
+                   n_iter_no_change=10, random_state=42)
+    if engine == 'linear':
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.linear_model import LogisticRegression, Ridge
+
+        return make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000) if classification else Ridge())
+    raise ValueError(f"Unsupported model engine: {engine}")
+
+def _importance(model, X_test, y_test, n_jobs):
+    """Importance per feature: impurity for forests, |coefficient| for linear models, permutation otherwise."""
+    if hasattr(model, "feature_importances_"):
+        return model.feature_importances_
+    final = model.steps[-1][1] if hasattr(model, "steps") else model
+    if hasattr(final, "coef_"):
+        # Features are standardized, so coefficient magnitudes are comparable
+        coef = np.abs(np.atleast_2d(final.coef_)).mean(axis=0)
+        return coef / coef.sum() if coef.sum() else coef
+
+    from sklearn.inspection import permutation_importance
+
+    if len(X_test) > 2000:
+        X_test = X_test.sample(n=2000, random_state=42)
+        y_test = y_test.loc[X_test.index]
+    result = permutation_importance(model, X_test, y_test, n_repeats=3, random_state=42, n_jobs=n_jobs)
+    importance = np.clip(result.importances_mean, 0, None)
+    return importance / importance.sum() if importance.sum() else importance
+
+def cross_validate_model(model, X, y, folds, n_jobs=TRAINING_JOBS):
+    """
+    k-fold cross-validation with the folds fitted in parallel.
+
+    Args:
+        model: Unfitted estimator
+        X (DataFrame): Features
+        y (Series): Target
+        folds (int): Number of folds
+        n_jobs (int): Folds fitted at once
+
+    Returns:
+        dict: folds, per-fold scores, mean, std and seconds
+    """
+    from sklearn.base import clone
+    from sklearn.model_selection import cross_val_score
+
+    model = clone(model)
+    # Parallelism goes to the folds; per-model threads would oversubscribe the cores
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=1)
+    started = time.perf_counter()
+    scores = cross_val_score(model, X, y, cv=folds, n_jobs=n_jobs)
+    return {
+        "folds": int(folds),
+        "scores": [float(score) for score in scores],
+        "mean": float(scores.mean()),
+        "std": float(scores.std()),
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+def train_model(X, y, engine='random_forest', task=None, test_size=0.3, cv_folds=None,
+                early_stopping=True, sample_rows=PREDICT_SAMPLE_ROWS, n_jobs=TRAINING_JOBS):
+    """
+    Fit and evaluate a model on a train/test split.
+
+    Args:
+        X (DataFrame): Encoded features
+        y (Series): Target
+        engine (str): One of MODEL_ENGINES
+        task (str, optional): 'classification' or 'regression'; inferred from y if omitted
+        test_size (float): Proportion of rows held out for testing
+        cv_folds (int, optional): Also cross-validate with this many folds
+        early_stopping (bool): Early stopping for gradient boosting
+        sample_rows (int): Rows above which a random sample is used
+        n_jobs (int): Parallel jobs
+
+    Returns:
+        tuple: (fitted model, report with model_type, engine, performance,
+            feature_importance, rows and timing)
+    """
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import mean_squared_error, classification_report
+
+    if engine not in MODEL_ENGINES:
+        raise ValueError(f"Unsupported model engine: {engine}")
+    started = time.perf_counter()
+
+    # Rows without a target cannot be learned from
+    known = y.notna()
+    X, y = X[known], y[known]
+    rows_total = len(X)
+    if rows_total > sample_rows:
+        X = X.sample(n=sample_rows, random_state=42)
+        y = y.loc[X.index]
+
+    task = task or infer_task(y)
+    classification = task == 'classification'
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=42)
+
+    model = make_model(engine, task, n_jobs, early_stopping)
+    fit_started = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - fit_started
+
+    # Evaluate; the training score uses a bounded sample of the training rows
+    eval_started = time.perf_counter()
+    X_eval, y_eval = X_train, y_train
+    if len(X_eval) > EVAL_SAMPLE_ROWS:
+        X_eval = X_eval.sample(n=EVAL_SAMPLE_ROWS, random_state=42)
+        y_eval = y_eval.loc[X_eval.index]
+    train_score = float(model.score(X_eval, y_eval))
+    y_pred = model.predict(X_test)
+    test_score = float(model.score(X_test, y_test))
+    if classification:
+        performance = {
+            "train_accuracy": train_score,
+            "test_accuracy": test_score,
+            "classification_report": classification_report(y_test, y_pred, output_dict=True, zero_division=0)
+        }
+    else:
+        performance = {
+            "train_r2": train_score,
+            "test_r2": test_score,
+            "rmse": float(np.sqrt(mean_squared_error(y_test, y_pred)))
+        }
+    performance["fit_seconds"] = round(fit_seconds, 3)
+    performance["eval_seconds"] = round(time.perf_counter() - eval_started, 3)
+    if hasattr(model, "n_iter_") and engine == 'hist_gradient_boosting':
+        performance["boosting_iterations"] = int(model.n_iter_)
+
+    if cv_folds:
+        performance["cross_validation"] = cross_validate_model(
+            make_model(engine, task, n_jobs, early_stopping), X, y, min(int(cv_folds), MAX_CV_FOLDS), n_jobs
+        )
+
+    importance = _importance(model, X_test, y_test, n_jobs)
+    feature_importance = [
+        {"feature": col, "importance": float(imp)}
+        for col, imp in zip(X.columns, importance)
+    ]
+    feature_importance.sort(key=lambda x: x["importance"], reverse=True)
+
+    report = {
+        "model_type": task,
+        "engine": engine,
+        "performance": performance,
+        "feature_importance": feature_importance,
+        "rows_used": int(len(X)),
+        "rows_total": int(rows_total),
+        "training_seconds": round(time.perf_counter() - started, 3)
+    }
+    logger.info(f"Trained {engine} {task} model on {len(X_train)} rows in {fit_seconds:.2f}s")
+    return model, report
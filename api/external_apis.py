@@ -203,6 +203,32 @@ def predict_weather(location, minutes_ahead):
     
     return current_weather
 
+# Async condition providers.
+#
+# The async fare API awaits these concurrently. The mock data is computed
+# in-process, so they simply delegate to the sync versions; a real
+# implementation would await an HTTP client here instead of blocking.
+
+async def get_traffic_conditions_async(location, time_of_day):
+    """Async variant of get_traffic_conditions."""
+    return get_traffic_conditions(location, time_of_day)
+
+async def get_weather_conditions_async(location):
+    """Async variant of get_weather_conditions."""
+    return get_weather_conditions(location)
+
+async def get_exchange_rate_async(currency_code):
+    """Async variant of get_exchange_rate."""
+    return get_exchange_rate(currency_code)
+
+async def predict_traffic_async(location, current_time, minutes_ahead):
+    """Async variant of predict_traffic."""
+    return predict_traffic(location, current_time, minutes_ahead)
+
+async def predict_weather_async(location, minutes_ahead):
+    """Async variant of predict_weather."""
+    return predict_weather(location, minutes_ahead)
+
 def calculate_future_time(current_time, minutes_ahead):
     """Calculate the time period after adding minutes to current time."""
     # Define time periods and their approximate midpoint hour
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import random
 from datetime import datetime
@@ -209,6 +210,83 @@ def predict_fare(distance, duration, taxi_type, location, time_of_day, currency,
     current_weather = get_weather_conditions(location)
     exchange_rate = get_exchange_rate(currency)
     
+    # Predict conditions for different time offsets
+    future_conditions = [
+        (offset, predict_traffic(location, time_of_day, offset), predict_weather(location, offset))
+        for offset in get_prediction_offsets(time_offset)
+    ]
+    
+    return build_fare_predictions(distance, duration, taxi_type, time_of_day, currency,
+                                  current_traffic, current_weather, exchange_rate, future_conditions)
+
+async def estimate_fare_async(distance, duration, taxi_type, location, time_of_day, currency):
+    """
+    Estimate the current fare, awaiting traffic, weather and exchange rate concurrently.
+    
+    Returns:
+        dict: Fare details as returned by calculate_fare
+    """
+    from api.external_apis import get_traffic_conditions_async, get_weather_conditions_async, get_exchange_rate_async
+    
+    traffic_conditions, weather_conditions, exchange_rate = await asyncio.gather(
+        get_traffic_conditions_async(location, time_of_day),
+        get_weather_conditions_async(location),
+        get_exchange_rate_async(currency)
+    )
+    
+    return calculate_fare(
+        distance=distance,
+        duration=duration,
+        taxi_type=taxi_type,
+        traffic_conditions=traffic_conditions,
+        weather_conditions=weather_conditions,
+        time_of_day=time_of_day,
+        exchange_rate=exchange_rate,
+        currency=currency
+    )
+
+async def predict_fare_async(distance, duration, taxi_type, location, time_of_day, currency, time_offset=15):
+    """
+    Predict future fares, awaiting all condition lookups concurrently.
+    
+    Same arguments and result as predict_fare.
+    """
+    from api.external_apis import (get_traffic_conditions_async, get_weather_conditions_async,
+                                   get_exchange_rate_async, predict_traffic_async, predict_weather_async)
+    
+    offsets = get_prediction_offsets(time_offset)
+    
+    current_traffic, current_weather, exchange_rate, *future = await asyncio.gather(
+        get_traffic_conditions_async(location, time_of_day),
+        get_weather_conditions_async(location),
+        get_exchange_rate_async(currency),
+        *[predict_traffic_async(location, time_of_day, offset) for offset in offsets],
+        *[predict_weather_async(location, offset) for offset in offsets]
+    )
+    
+    future_conditions = [
+        (offset, future[i], future[len(offsets) + i])
+        for i, offset in enumerate(offsets)
+    ]
+    
+    return build_fare_predictions(distance, duration, taxi_type, time_of_day, currency,
+                                  current_traffic, current_weather, exchange_rate, future_conditions)
+
+def get_prediction_offsets(time_offset):
+    """Get the minute offsets to predict for a requested time offset."""
+    return [15, 30, 60] if time_offset >= 60 else ([15, 30] if time_offset >= 30 else [15])
+
+def build_fare_predictions(distance, duration, taxi_type, time_of_day, currency,
+                           current_traffic, current_weather, exchange_rate, future_conditions):
+    """
+    Build the prediction response from already resolved conditions.
+    
+    Args:
+        future_conditions (list): (time_offset, traffic, weather) tuples
+        
+    Returns:
+        dict: Predictions for current fare and future fares
+    """
     # Calculate current fare
     current_fare = calculate_fare(
         distance=distance,
@@ -221,20 +299,12 @@ def predict_fare(distance, duration, taxi_type, location, time_of_day, currency,
         currency=currency
     )
     
-    # Predict conditions for different time offsets
     predictions = {
         'current': current_fare,
         'predictions': []
     }
     
-    # Define time offsets to predict
-    offsets = [15, 30, 60] if time_offset >= 60 else ([15, 30] if time_offset >= 30 else [15])
-    
-    for offset in offsets:
-        # Predict future traffic and weather
-        future_traffic = predict_traffic(location, time_of_day, offset)
-        future_weather = predict_weather(location, offset)
-        
+    for offset, future_traffic, future_weather in future_conditions:
         # Calculate new time of day based on offset
         future_time = calculate_future_time_of_day(time_of_day, offset)
         
@@ -0,0 +1,135 @@
+import json
+import math
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack responses are disabled without msgpack
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+def to_serializable(obj):
+    """
+    Convert values the encoders don't understand natively.
+
+    Handles NumPy scalars and arrays, pandas Series/DataFrames/Timestamps,
+    missing values (NaN, NaT) and sets.
+
+    Args:
+        obj: Value to convert
+
+    Returns:
+        A JSON-compatible value
+    """
+    # Missing values (NaN, NaT) compare unequal to themselves
+    try:
+        if obj != obj:
+            return None
+    except (TypeError, ValueError):
+        # pd.NA refuses to be coerced to bool; arrays compare elementwise
+        if type(obj).__name__ == 'NAType':
+            return None
+
+    if hasattr(obj, 'to_dict') and hasattr(obj, 'columns'):
+        return obj.to_dict(orient='records')
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def sanitize(obj):
+    """
+    Recursively convert a structure into plain JSON types.
+
+    Used as a fallback when the fast path rejects the data, e.g. NumPy
+    integers as dict keys or NaN with the stdlib encoder.
+    """
+    if isinstance(obj, dict):
+        return {_sanitize_key(k): sanitize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [sanitize(v) for v in obj]
+    if isinstance(obj, float):
+        return None if math.isnan(obj) or math.isinf(obj) else float(obj)
+    if obj is None or isinstance(obj, (str, int, bool)):
+        return obj
+    return sanitize(to_serializable(obj))
+
+def _sanitize_key(key):
+    if isinstance(key, (str, int, float, bool)) or key is None:
+        return key
+    if hasattr(key, 'item'):
+        return key.item()
+    return str(key)
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson with NumPy/pandas support.
+
+    Falls back to the stdlib encoder when orjson is not installed. Clients
+    that prefer application/msgpack in their Accept header receive
+    MessagePack instead of JSON from every jsonify() call.
+    """
+
+    def dumps_bytes(self, obj, **kwargs):
+        """Serialize obj to UTF-8 encoded JSON bytes."""
+        sort_keys = kwargs.pop('sort_keys', self.sort_keys)
+        indent = kwargs.pop('indent', None)
+
+        if orjson is not None:
+            option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            if sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            try:
+                return orjson.dumps(obj, default=to_serializable, option=option)
+            except TypeError:
+                return orjson.dumps(sanitize(obj), option=option)
+
+        try:
+            data = json.dumps(obj, default=to_serializable, sort_keys=sort_keys,
+                              indent=indent, allow_nan=False, ensure_ascii=self.ensure_ascii)
+        except (TypeError, ValueError):
+            data = json.dumps(sanitize(obj), sort_keys=sort_keys, indent=indent,
+                              ensure_ascii=self.ensure_ascii)
+        return data.encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj, **kwargs).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+
+        if self.wants_msgpack():
+            data = msgpack.packb(obj, default=to_serializable, use_bin_type=True)
+            response = self._app.response_class(data, mimetype=MSGPACK_MIMETYPE)
+        else:
+            indent = None
+            if self.compact is False or (self.compact is None and self._app.debug):
+                indent = 2
+            data = self.dumps_bytes(obj, indent=indent)
+            response = self._app.response_class(data, mimetype=self.mimetype)
+
+        if msgpack is not None:
+            response.vary.add('Accept')
+        return response
+
+    @staticmethod
+    def wants_msgpack():
+        """Check whether the current request prefers a MessagePack response."""
+        if msgpack is None or not has_request_context():
+            return False
+        best = request.accept_mimetypes.best_match([JSON_MIMETYPE, MSGPACK_MIMETYPE])
+        return best == MSGPACK_MIMETYPE
@@ -0,0 +1,188 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+from functools import wraps
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # Brotli variants are skipped without the brotli package
+    brotli = None
+
+# Cache lifetime for fingerprinted asset URLs (one year)
+IMMUTABLE_MAX_AGE = 31536000
+
+# Only text formats benefit from compression
+COMPRESSIBLE_TYPES = {
+    'text/css', 'text/html', 'text/plain', 'text/javascript',
+    'application/javascript', 'application/json', 'image/svg+xml',
+}
+
+# Dynamic responses smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+def compress_variants(data, mimetype):
+    """
+    Build precompressed variants of a payload.
+
+    Args:
+        data (bytes): Uncompressed payload
+        mimetype (str): Content type of the payload
+
+    Returns:
+        dict: Mapping of content coding (identity, gzip, br) to bytes
+    """
+    variants = {'identity': data}
+    if mimetype not in COMPRESSIBLE_TYPES or len(data) < MIN_COMPRESS_SIZE:
+        return variants
+
+    gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gzipped) < len(data):
+        variants['gzip'] = gzipped
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            variants['br'] = compressed
+    return variants
+
+def negotiate_encoding(variants):
+    """Pick the best available content coding for the current request."""
+    offered = [enc for enc in ('br', 'gzip') if enc in variants]
+    if not offered:
+        return 'identity'
+    return request.accept_encodings.best_match(offered, default='identity') or 'identity'
+
+def make_variant_response(variants, mimetype, etag, cache_control):
+    """
+    Build a conditional response for the negotiated variant.
+
+    Sets a per-encoding ETag and Vary header and turns the response into a
+    304 when the client's cached copy is still current.
+    """
+    encoding = negotiate_encoding(variants)
+    response = current_app.response_class(variants[encoding], mimetype=mimetype)
+
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+        etag = f"{etag}-{encoding}"
+    if len(variants) > 1:
+        response.vary.add('Accept-Encoding')
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
+
+class StaticAssets:
+    """
+    Content-hashed, precompressed static file delivery.
+
+    Every file under the static folder is read and hashed once at startup.
+    url_for('static', ...) gains a ?v=<hash> fingerprint, fingerprinted
+    requests are served with far-future immutable caching, and gzip/brotli
+    variants are negotiated from Accept-Encoding.
+    """
+
+    def __init__(self, app=None):
+        self.assets = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.load(app.static_folder)
+        app.url_defaults(self.add_fingerprint)
+        app.view_functions['static'] = self.serve
+        app.extensions['static_assets'] = self
+
+    def load(self, static_folder):
+        """Hash and precompress every file in the static folder."""
+        self.assets = {}
+        for root, _, files in os.walk(static_folder):
+            for name in files:
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, static_folder).replace(os.sep, '/')
+
+                with open(path, 'rb') as f:
+                    data = f.read()
+
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                self.assets[filename] = {
+                    'hash': hashlib.sha256(data).hexdigest()[:12],
+                    'mimetype': mimetype,
+                    'variants': compress_variants(data, mimetype),
+                }
+
+    def add_fingerprint(self, endpoint, values):
+        if endpoint == 'static' and 'v' not in values:
+            asset = self.assets.get(values.get('filename'))
+            if asset:
+                values['v'] = asset['hash']
+
+    def serve(self, filename):
+        asset = self.assets.get(filename)
+        if asset is None:
+            return current_app.send_static_file(filename)
+
+        if request.args.get('v') == asset['hash']:
+            cache_control = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            cache_control = "public, no-cache"
+
+        return make_variant_response(asset['variants'], asset['mimetype'], asset['hash'], cache_control)
+
+def cached_page(view):
+    """
+    Cache a page that renders identically for every request.
+
+    The first render is stored with its compressed variants and served with
+    an ETag, so later hits skip Jinja entirely and repeat visits get a 304.
+    Caching is bypassed when templates auto-reload (debug mode).
+    """
+    cache = {}
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if current_app.jinja_env.auto_reload:
+            return view(*args, **kwargs)
+
+        entry = cache.get(request.path)
+        if entry is None:
+            html = view(*args, **kwargs)
+            if not isinstance(html, str):
+                return html
+
+            data = html.encode('utf-8')
+            entry = {
+                'etag': hashlib.sha256(data).hexdigest()[:16],
+                'variants': compress_variants(data, 'text/html'),
+            }
+            cache[request.path] = entry
+
+        # Pages sit behind login, so shared caches must not store them
+        return make_variant_response(entry['variants'], 'text/html', entry['etag'], "private, no-cache")
+
+    return wrapper
+
+def compress_response(response):
+    """
+    after_request hook that gzips large dynamic text responses.
+
+    Skips streamed responses (e.g. server-sent events), responses that are
+    already encoded and clients that don't accept gzip.
+    """
+    if (response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES
+            or 'gzip' not in request.accept_encodings):
+        return response
+
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
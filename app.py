@@ -7,7 +7,9 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from api.fare_calculator import calculate_fare, predict_fare
 from api.external_apis import get_traffic_conditions, get_weather_conditions, get_exchange_rate
 from api.helpers import calculate_eco_score, calculate_co2_emissions, get_eco_suggestions
-from database import db, init_db
+from api.serialization import FastJSONProvider
+from api.static_assets import StaticAssets, cached_page, compress_response
+from database import db, init_db, create_schema
 from models import User
 
 # Configure logging
@@ -17,8 +19,13 @@ logger = logging.getLogger(__name__)
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
+app.json = FastJSONProvider(app)
 CORS(app)
 
+# Fingerprinted, precompressed static files and compressed dynamic responses
+StaticAssets(app)
+app.after_request(compress_response)
+
 # Configure database
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///app.db")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
@@ -103,12 +110,14 @@ def api_login():
 # Protected routes
 @app.route('/')
 @login_required
+@cached_page
 def index():
     """Render the main page of the application."""
     return render_template('index.html')
 
 @app.route('/about')
 @login_required
+@cached_page
 def about():
     """Render the about page."""
     return render_template('about.html')
@@ -122,12 +131,14 @@ def fare_calculator():
 
 @app.route('/eco-friendly')
 @login_required
+@cached_page
 def eco_friendly():
     """Render the eco-friendly options page."""
     return render_template('eco_friendly.html')
 
 @app.route('/how-it-works')
 @login_required
+@cached_page
 def how_it_works():
     """Render the how it works page explaining fare calculation."""
     return render_template('how_it_works.html')
@@ -407,4 +418,5 @@ def init_map():
     })
 
 if __name__ == '__main__':
+    create_schema(app)
     app.run(host='0.0.0.0', port=5000, debug=True)
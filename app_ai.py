@@ -1,15 +1,33 @@
 import os
+import re
+import time
+import uuid
+import hashlib
 import logging
 import json
-import base64
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+
+# Import time of the app itself, reported by /api/status/imports
+_import_started = time.perf_counter()
+
 import pandas as pd
-from flask import Flask, request, jsonify, render_template, send_file
+from flask import Flask, Response, request, jsonify, render_template, send_file, session, url_for, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from io import BytesIO
-import matplotlib.pyplot as plt
-import seaborn as sns
-from data_analysis_tool import DataAnalysisTool
+from data_analysis_tool import (DataAnalysisTool, ANALYSIS_STAGES, run_analysis_stage, complete_ai_request,
+                                analyze_chart_image, llm_gateway, model_registry)
+from analysis.images import ImageTooLarge, prepare_chart
+from analysis.llm import stream_concurrently
+from analysis.registry import DatasetRegistry
+from analysis.store import evict_stores
+from analysis.plots import PlotRenderer, PLOT_FORMATS
+from analysis.jobs import JobManager
+from analysis.models import SCORE_BATCH_ROWS, score_frame, read_batches, format_batch
+from analysis.training import MODEL_ENGINES, MAX_CV_FOLDS
+from analysis.imports import warm_up, import_report, record_import_time
+from api.serialization import FastJSONProvider
+from api.static_assets import StaticAssets, cached_page, compress_response
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -18,8 +36,13 @@ logger = logging.getLogger(__name__)
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "default_secret_key")
+app.json = FastJSONProvider(app)
 CORS(app)
 
+# Fingerprinted, precompressed static files and compressed dynamic responses
+StaticAssets(app)
+app.after_request(compress_response)
+
 # Configure upload folder
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls', 'json'}
@@ -28,21 +51,117 @@ if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
+# Large CSVs are streamed to disk and ingested in chunks, so the cap only guards the disk
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 16)) * 1024 * 1024
+
+# Datasets and analyzers are kept per session (or explicit dataset ID)
+registry = DatasetRegistry(DataAnalysisTool)
+
+# Plot images are rendered on first request in worker processes and cached on disk
+plot_renderer = PlotRenderer()
+PLOT_KEY_PATTERN = re.compile(r'[0-9a-f]{16}')
+
+# Analysis jobs run their stages in a local process pool
+job_manager = JobManager()
+
+# Stored models are addressed by a 32-character key; predictions stream as CSV or NDJSON
+MODEL_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+SCORE_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+# Seconds between keep-alive comments on idle event streams
+SSE_KEEPALIVE_SECONDS = 15
 
-# Initialize data analysis tool
-analyzer = DataAnalysisTool()
+# AI tasks and the threads making their LLM calls, so concurrent calls never hold a dataset lock
+AI_TASKS = ('insights', 'story')
+ai_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('AI_WORKERS', 8)))
+
+# scikit-learn, matplotlib and the OpenAI SDK load on first use; WARM_UP_STAGES preloads them,
+# e.g. in the gunicorn master so forked workers share the pages
+record_import_time('app_ai', time.perf_counter() - _import_started)
+if warm_up():
+    logger.info(f"Warm-up imports: {import_report()['import_seconds']}")
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def save_upload(file, filepath, block_size=1 << 20):
+    """Save an uploaded file while hashing it, so duplicates are recognized without a second read."""
+    digest = hashlib.sha256()
+    with open(filepath, 'wb') as f:
+        for block in iter(lambda: file.stream.read(block_size), b''):
+            digest.update(block)
+            f.write(block)
+    return digest.hexdigest()
+
+def current_dataset_id():
+    """Dataset ID from the X-Dataset-Id header or dataset_id argument, else the session's own."""
+    dataset_id = request.headers.get('X-Dataset-Id') or request.args.get('dataset_id')
+    if dataset_id:
+        return dataset_id
+    if 'dataset_id' not in session:
+        session['dataset_id'] = uuid.uuid4().hex
+    return session['dataset_id']
+
+def plot_specs_with_urls(specs, fingerprint):
+    """Plot specs with the URL of each image."""
+    fingerprint = fingerprint[:16]
+    # Image requests cannot send headers, so an explicit dataset ID travels in the URL
+    explicit_id = request.headers.get('X-Dataset-Id') or request.args.get('dataset_id')
+    extra = {'dataset_id': explicit_id} if explicit_id else {}
+    return [
+        dict(spec, fingerprint=fingerprint,
+             url=url_for('get_plot', fingerprint=fingerprint, plot_id=spec['id'], fmt='png', **extra))
+        for spec in specs
+    ]
+
+def plot_image_path(fingerprint, plot_id, fmt='png'):
+    """
+    Path of a rendered plot image, rendering it first if needed.
+    
+    Raises:
+        LookupError: If the plot does not belong to the current dataset
+    """
+    if fmt not in PLOT_FORMATS or not PLOT_KEY_PATTERN.fullmatch(fingerprint) \
+            or not PLOT_KEY_PATTERN.fullmatch(plot_id):
+        raise LookupError('Plot not found')
+        
+    path = plot_renderer.cached(fingerprint, plot_id, fmt)
+    if path is not None:
+        return path
+        
+    # Only the plot's data is extracted under the dataset lock; rendering happens outside it
+    with registry.use(current_dataset_id()) as analyzer:
+        if analyzer.data is None or analyzer.fingerprint[:16] != fingerprint:
+            raise LookupError('Plot not found')
+        spec, payload = analyzer.get_plot_payload(plot_id)
+    if spec is None:
+        raise LookupError('Plot not found')
+    return plot_renderer.render(fingerprint, spec, payload, fmt)
+
+# Dataset decorator
+def sweep_stores(analyzer):
+    """Keep the chunk stores within STORE_CACHE_MB after a write, sparing those still in use."""
+    # The registry records this dataset's stores only after the request, so ask it directly
+    in_use = registry.store_paths(exclude=current_dataset_id()) | set(analyzer.store_paths())
+    evict_stores(in_use)
+
+def with_dataset(f):
+    """Run the view with the current dataset's analyzer locked for its duration."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with registry.use(current_dataset_id()) as analyzer:
+            return f(analyzer, *args, **kwargs)
+    return decorated_function
+
 @app.route('/')
+@cached_page
 def index():
     """Render the data analyst dashboard."""
     return render_template('data_analyst.html')
 
 @app.route('/api/upload', methods=['POST'])
-def upload_file():
+@with_dataset
+def upload_file(analyzer):
     """Upload a data file for analysis."""
     try:
         # Check if file part exists
@@ -59,17 +178,32 @@ def upload_file():
         if not allowed_file(file.filename):
             return jsonify({'error': f'File type not allowed. Must be one of {ALLOWED_EXTENSIONS}'}), 400
             
-        # Secure filename and save
+        # Save under the content hash, so concurrent sessions uploading the same name never
+        # overwrite each other's file and identical uploads share one copy
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        tmp_path = os.path.join(app.config['UPLOAD_FOLDER'], f".upload-{uuid.uuid4().hex}.tmp")
+        try:
+            content_hash = save_upload(file, tmp_path)
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{content_hash[:16]}-{filename}")
+            os.replace(tmp_path, filepath)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
         
-        # Load data
-        data_summary = analyzer.load_data(filepath)
+        # Load data (mode=stream forces chunked ingestion, otherwise chosen by file size)
+        mode = request.form.get('mode') or request.args.get('mode')
+        streaming = {'stream': True, 'memory': False}.get(mode)
+        columns = request.form.get('columns') or request.args.get('columns')
+        columns = [c.strip() for c in columns.split(',')] if columns else None
+        data_summary = analyzer.load_data(filepath, streaming=streaming, columns=columns,
+                                          content_hash=content_hash)
+        sweep_stores(analyzer)
         
         return jsonify({
             'message': 'File uploaded successfully',
             'filename': filename,
+            'content_hash': content_hash,
+            'dataset_id': current_dataset_id(),
             'summary': data_summary
         })
         
@@ -77,8 +211,46 @@ def upload_file():
         logger.error(f"Error uploading file: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/append', methods=['POST'])
+@with_dataset
+def append_data(analyzer):
+    """
+    Append rows to the loaded dataset, from an uploaded file or a JSON
+    {"rows": [...]} body. With verify=true the incremental statistics are
+    checked against a recomputation from all rows.
+    """
+    try:
+        if analyzer.data is None:
+            return jsonify({'error': 'No data loaded. Please upload a file first.'}), 400
+            
+        verify = (request.form.get('verify') or request.args.get('verify', '')).lower() in ('1', 'true', 'yes')
+        if 'file' in request.files:
+            file = request.files['file']
+            if file.filename == '' or not allowed_file(file.filename):
+                return jsonify({'error': f'File type not allowed. Must be one of {ALLOWED_EXTENSIONS}'}), 400
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"append-{uuid.uuid4().hex}-{secure_filename(file.filename)}")
+            save_upload(file, filepath)
+            try:
+                result = analyzer.append_data(file_path=filepath, verify=verify)
+            finally:
+                os.remove(filepath)
+        else:
+            body = request.get_json(silent=True) or {}
+            rows = body.get('rows')
+            if not rows:
+                return jsonify({'error': 'No rows provided'}), 400
+            result = analyzer.append_data(dataframe=pd.DataFrame(rows), verify=verify or bool(body.get('verify')))
+        sweep_stores(analyzer)
+            
+        return jsonify(dict(result, message=f"Appended {result['rows_appended']} rows"))
+        
+    except Exception as e:
+        logger.error(f"Error appending data: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/sample_data', methods=['GET'])
-def load_sample_data():
+@with_dataset
+def load_sample_data(analyzer):
     """Load a sample dataset for demo purposes."""
     try:
         dataset_type = request.args.get('type', 'iris')
@@ -122,6 +294,7 @@ def load_sample_data():
         return jsonify({
             'message': f'Loaded sample {dataset_type} dataset',
             'dataset_type': dataset_type,
+            'dataset_id': current_dataset_id(),
             'summary': data_summary
         })
         
@@ -130,34 +303,201 @@ def load_sample_data():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/analyze', methods=['POST'])
-def analyze_data():
+@with_dataset
+def analyze_data(analyzer):
     """Perform comprehensive data analysis."""
     try:
         if analyzer.data is None:
             return jsonify({'error': 'No data loaded. Please upload a file first.'}), 400
             
         # Run analysis
-        analysis_results = analyzer.analyze_data()
+        analysis_results = analyzer.analyze_data(**analysis_options())
         
         return jsonify({
             'message': 'Analysis completed successfully',
             'results': analysis_results,
-            'plots': analyzer.plot_paths
+            'plots': plot_specs_with_urls(analyzer.plot_paths, analyzer.fingerprint)
         })
         
     except Exception as e:
         logger.error(f"Error analyzing data: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def analysis_options():
+    """Analysis options from the JSON body of an analysis request."""
+    options = request.get_json(silent=True) or {}
+    return {
+        'correlation_method': options.get('correlation_method', 'pearson'),
+        'outlier_method': options.get('outlier_method', 'iqr'),
+        'importance_mode': options.get('importance_mode', 'random_forest'),
+        # None lets large datasets be sampled; false requests exact results
+        'approximate': options.get('approximate')
+    }
+
+def store_stage_result(dataset_id, version, stage, result):
+    """Keep a finished job stage on the analyzer, unless its data changed since."""
+    with registry.use(dataset_id) as analyzer:
+        if analyzer.version != version:
+            return
+        if stage == 'plots':
+            analyzer.plot_paths = result
+        else:
+            analyzer.analysis_results[stage] = result
+
+def stage_result_view(job, stage, result):
+    """Stage result as sent to clients (plot specs gain image URLs)."""
+    if stage == 'plots' and result is not None:
+        return plot_specs_with_urls(result, job.meta['fingerprint'])
+    return result
+
+def get_owned_job(job_id):
+    """Job by ID if it belongs to the current dataset, else None."""
+    job = job_manager.get(job_id)
+    if job is None or job.owner != current_dataset_id():
+        return None
+    return job
+
+@app.route('/api/jobs', methods=['POST'])
+@with_dataset
+def submit_analysis_job(analyzer):
+    """
+    Start a background analysis and return its job ID.
+    
+    A "stages" list runs only those stages, e.g. to refine an approximate
+    result with {"stages": ["correlation"], "approximate": false}; the
+    other stored results are kept.
+    """
+    try:
+        if analyzer.data is None:
+            return jsonify({'error': 'No data loaded. Please upload a file first.'}), 400
+            
+        stages = (request.get_json(silent=True) or {}).get('stages') or list(ANALYSIS_STAGES)
+        unknown = [stage for stage in stages if stage not in ANALYSIS_STAGES]
+        if unknown:
+            return jsonify({'error': f"Unknown analysis stages: {', '.join(map(str, unknown))}"}), 400
+            
+        options = analysis_options()
+        snapshot = analyzer.snapshot()
+        dataset_id = current_dataset_id()
+        
+        # Results from a previous full analysis no longer apply
+        if set(stages) == set(ANALYSIS_STAGES):
+            analyzer.analysis_results = {}
+            analyzer.plot_paths = []
+        
+        job = job_manager.submit(
+            dataset_id,
+            {stage: (run_analysis_stage, (snapshot, stage, options)) for stage in stages},
+            on_result=lambda job, stage, result: store_stage_result(dataset_id, snapshot['version'], stage, result),
+            meta={'fingerprint': snapshot['fingerprint']}
+        )
+        
+        return jsonify({
+            'job_id': job.id,
+            'status': job.status,
+            'stages': list(stages),
+            'status_url': url_for('get_analysis_job', job_id=job.id),
+            'events_url': url_for('analysis_job_events', job_id=job.id)
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Error starting analysis job: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    """Status and the results finished so far of an analysis job."""
+    job = get_owned_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+        
+    state = job.to_dict()
+    state['results'] = {stage: stage_result_view(job, stage, result) for stage, result in state['results'].items()}
+    return jsonify(state)
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def analysis_job_events(job_id):
+    """Server-sent events for an analysis job: one event per stage and status change."""
+    job = get_owned_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+        
+    # Reconnecting clients resume after the last event they received
+    last_seen = request.headers.get('Last-Event-ID') or request.args.get('since') or 0
+    try:
+        last_seen = max(0, int(last_seen))
+    except ValueError:
+        # A malformed ID replays the stream from the start
+        last_seen = 0
+    
+    def generate(seq):
+        while True:
+            events = job.events_after(seq, timeout=SSE_KEEPALIVE_SECONDS)
+            if not events:
+                if job.done:
+                    return
+                yield ': keep-alive\n\n'
+                continue
+            for seq, event, data in events:
+                if event == 'stage' and 'result' in data:
+                    data = dict(data, result=stage_result_view(job, data['stage'], data['result']))
+                yield f"id: {seq}\nevent: {event}\ndata: {app.json.dumps(data)}\n\n"
+            if job.done and seq == len(job.events):
+                return
+                
+    response = Response(stream_with_context(generate(last_seen)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_analysis_job(job_id):
+    """Cancel an analysis job."""
+    job = get_owned_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+        
+    job_manager.cancel(job_id)
+    return jsonify({'job_id': job.id, 'status': job.status})
+
+def build_ai_requests(tasks, title=None, focus_areas=None):
+    """
+    LLM requests for AI tasks, built from one snapshot of the current analysis.
+    
+    The dataset is only locked while the prompts are built, not during the
+    model calls.
+    
+    Returns:
+        dict: {task: request}, or None if no analysis results exist
+    """
+    with registry.use(current_dataset_id()) as analyzer:
+        if analyzer.data is None or not analyzer.analysis_results:
+            return None
+        return {task: analyzer.ai_request(task, title, focus_areas) for task in tasks}
+
+def ai_request_options(options):
+    """Tasks, story title and focus areas from a JSON body or query arguments."""
+    tasks = options.get('tasks') or list(AI_TASKS)
+    focus_areas = options.get('focus_areas') or None
+    if isinstance(tasks, str):
+        tasks = [task.strip() for task in tasks.split(',') if task.strip()]
+    if isinstance(focus_areas, str):
+        focus_areas = [area.strip() for area in focus_areas.split(',') if area.strip()]
+    unknown = [task for task in tasks if task not in AI_TASKS]
+    if unknown:
+        raise ValueError(f"Unknown AI tasks: {', '.join(map(str, unknown))}")
+    return tasks, options.get('title') or 'Data Analysis Findings', focus_areas
+
 @app.route('/api/insights', methods=['GET'])
 def get_insights():
     """Get AI-generated insights for the analyzed data."""
     try:
-        if analyzer.data is None or not analyzer.analysis_results:
+        ai_requests = build_ai_requests(['insights'])
+        if ai_requests is None:
             return jsonify({'error': 'No data analyzed. Please analyze data first.'}), 400
             
         # Get AI insights
-        insights = analyzer.get_ai_insights()
+        insights = complete_ai_request(ai_requests['insights'], 'insights')
         
         return jsonify({
             'message': 'Insights generated successfully',
@@ -172,16 +512,17 @@ def get_insights():
 def generate_story():
     """Generate a data story from analysis results."""
     try:
-        if analyzer.data is None or not analyzer.analysis_results:
-            return jsonify({'error': 'No data analyzed. Please analyze data first.'}), 400
-            
         # Get request parameters
         data = request.json
         title = data.get('title', 'Data Analysis Findings')
         focus_areas = data.get('focus_areas', None)
         
+        ai_requests = build_ai_requests(['story'], title, focus_areas)
+        if ai_requests is None:
+            return jsonify({'error': 'No data analyzed. Please analyze data first.'}), 400
+            
         # Generate story
-        story = analyzer.generate_data_story(title, focus_areas)
+        story = complete_ai_request(ai_requests['story'], 'story')
         
         return jsonify({
             'message': 'Data story generated successfully',
@@ -192,8 +533,75 @@ def generate_story():
         logger.error(f"Error generating story: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/ai', methods=['POST'])
+def generate_ai_content():
+    """
+    Generate insights and a story in parallel from one analysis snapshot.
+    
+    JSON body: tasks (default both), title and focus_areas for the story.
+    """
+    try:
+        tasks, title, focus_areas = ai_request_options(request.get_json(silent=True) or {})
+        ai_requests = build_ai_requests(tasks, title, focus_areas)
+        if ai_requests is None:
+            return jsonify({'error': 'No data analyzed. Please analyze data first.'}), 400
+            
+        futures = {task: ai_executor.submit(complete_ai_request, ai_request, task)
+                   for task, ai_request in ai_requests.items()}
+        results = {task: future.result() for task, future in futures.items()}
+        
+        return jsonify(dict(results, message='AI content generated successfully'))
+        
+    except Exception as e:
+        logger.error(f"Error generating AI content: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ai/stream', methods=['GET'])
+def stream_ai_content():
+    """
+    Server-sent events with AI output as it is generated.
+    
+    Query arguments: tasks (comma list, default insights,story), title and
+    focus_areas (comma list). Every task streams 'delta' events with text,
+    then a 'result' event with the parsed JSON or a 'failed' event with the
+    error; a final 'done' event closes the stream.
+    """
+    try:
+        tasks, title, focus_areas = ai_request_options(request.args)
+        ai_requests = build_ai_requests(tasks, title, focus_areas)
+        if ai_requests is None:
+            return jsonify({'error': 'No data analyzed. Please analyze data first.'}), 400
+            
+    except Exception as e:
+        logger.error(f"Error starting AI stream: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+        
+    def generate():
+        events = stream_concurrently(llm_gateway, ai_requests, ai_executor, idle_timeout=SSE_KEEPALIVE_SECONDS)
+        for task, event, data in events:
+            if event == 'idle':
+                yield ': keep-alive\n\n'
+                continue
+            if event == 'delta':
+                payload = {'task': task, 'text': data}
+            elif event == 'done':
+                try:
+                    event, payload = 'result', {'task': task, 'result': json.loads(data)}
+                except ValueError as e:
+                    event, payload = 'failed', {'task': task, 'error': f'Invalid JSON from model: {str(e)}'}
+            else:
+                event, payload = 'failed', {'task': task, 'error': data}
+            yield f"event: {event}\ndata: {app.json.dumps(payload)}\n\n"
+        yield f"event: done\ndata: {{}}\n\n"
+        
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/predict', methods=['POST'])
-def predict():
+@with_dataset
+def predict(analyzer):
     """Train a prediction model on the dataset."""
     try:
         if analyzer.data is None:
@@ -203,22 +611,44 @@ def predict():
         data = request.json
         target_column = data.get('target_column')
         features = data.get('features', None)
-        test_size = float(data.get('test_size', 0.3))
         include_categorical = data.get('include_categorical', False)
+        engine = data.get('engine') or 'random_forest'
+        task = data.get('task') or None
+        try:
+            test_size = float(data.get('test_size', 0.3))
+            cv_folds = int(data['cv_folds']) if data.get('cv_folds') not in (None, '') else None
+            sample_rows = int(data['sample_rows']) if data.get('sample_rows') not in (None, '') else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'test_size, cv_folds and sample_rows must be numbers'}), 400
         
         if not target_column:
             return jsonify({'error': 'Target column must be specified'}), 400
+        if engine not in MODEL_ENGINES:
+            return jsonify({'error': f"Unknown engine. Use one of: {', '.join(MODEL_ENGINES)}"}), 400
+        if task not in (None, 'classification', 'regression'):
+            return jsonify({'error': "Task must be 'classification' or 'regression'"}), 400
+        if cv_folds is not None and not 2 <= cv_folds <= MAX_CV_FOLDS:
+            return jsonify({'error': f'cv_folds must be between 2 and {MAX_CV_FOLDS}'}), 400
+        if sample_rows is not None and sample_rows < 1:
+            return jsonify({'error': 'sample_rows must be at least 1'}), 400
             
         # Run prediction
         prediction_results = analyzer.predict(
             target_column=target_column,
             features=features,
             test_size=test_size,
-            include_categorical=include_categorical
+            include_categorical=include_categorical,
+            engine=engine,
+            cv_folds=cv_folds,
+            early_stopping=bool(data.get('early_stopping', True)),
+            sample_rows=sample_rows,
+            task=task,
+            owner=current_dataset_id()
         )
         
         return jsonify({
             'message': 'Prediction model trained successfully',
+            'model_id': prediction_results.get('model_id'),
             'results': prediction_results
         })
         
@@ -226,27 +656,170 @@ def predict():
         logger.error(f"Error in prediction: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def scoring_input_format():
+    """Format of the rows posted for scoring: 'csv', 'ndjson', 'json' or None."""
+    fmt = request.args.get('format')
+    if fmt:
+        return fmt
+    if request.mimetype in ('text/csv', 'application/csv'):
+        return 'csv'
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl', 'application/json-lines'):
+        return 'ndjson'
+    if request.mimetype == 'application/json':
+        return 'json'
+    return None
+
+def owns_model(model_id):
+    """Whether a stored model was trained by the current dataset."""
+    if not MODEL_ID_PATTERN.fullmatch(model_id):
+        return False
+    meta = model_registry.meta(model_id)
+    return meta is not None and meta.get('owner') == current_dataset_id()
+
+def get_owned_model(model_id):
+    """Stored model by ID if it belongs to the current dataset, else None."""
+    return model_registry.get(model_id) if owns_model(model_id) else None
+
+@app.route('/api/models', methods=['GET'])
+def list_models():
+    """List the current dataset's stored prediction models."""
+    try:
+        return jsonify({'models': model_registry.list(owner=current_dataset_id())})
+        
+    except Exception as e:
+        logger.error(f"Error listing models: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/models/<model_id>', methods=['GET'])
+def get_model(model_id):
+    """Get the metadata and training results of a stored model."""
+    try:
+        entry = get_owned_model(model_id)
+        if entry is None:
+            return jsonify({'error': 'Model not found'}), 404
+        return jsonify({'model': entry['meta'], 'results': entry['result']})
+        
+    except Exception as e:
+        logger.error(f"Error getting model: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/models/<model_id>', methods=['DELETE'])
+def delete_model(model_id):
+    """Delete a stored model."""
+    if not owns_model(model_id) or not model_registry.delete(model_id):
+        return jsonify({'error': 'Model not found'}), 404
+    return jsonify({'message': 'Model deleted', 'model_id': model_id})
+
+@app.route('/api/models/<model_id>/predict', methods=['POST'])
+def score_model(model_id):
+    """
+    Score rows with a stored model, streaming predictions back.
+    
+    Rows are posted as CSV (text/csv), NDJSON (application/x-ndjson) or
+    JSON {"rows": [...]}, and read and scored in batches. Predictions are
+    returned as CSV or NDJSON (?output=), by default in the input format.
+    ?id_column= echoes an input column instead of the row number.
+    """
+    try:
+        entry = get_owned_model(model_id)
+        if entry is None:
+            return jsonify({'error': 'Model not found'}), 404
+            
+        fmt = scoring_input_format()
+        if fmt == 'json':
+            rows = (request.get_json(silent=True) or {}).get('rows')
+            if not rows:
+                return jsonify({'error': 'No rows provided'}), 400
+            frame = pd.DataFrame(rows)
+            batches = (frame.iloc[i:i + SCORE_BATCH_ROWS] for i in range(0, len(frame), SCORE_BATCH_ROWS))
+        elif fmt in SCORE_FORMATS:
+            batches = read_batches(request.stream, fmt)
+        else:
+            return jsonify({'error': 'Send rows as text/csv, application/x-ndjson or JSON {"rows": [...]}'}), 400
+            
+        output = request.args.get('output') or (fmt if fmt in SCORE_FORMATS else 'ndjson')
+        if output not in SCORE_FORMATS:
+            return jsonify({'error': f'Unsupported output format: {output}'}), 400
+        id_column = request.args.get('id_column')
+        
+        # The first batch is scored before the response starts, so malformed input is still a 400
+        batches = iter(batches)
+        try:
+            first = score_frame(entry, next(batches), id_column)
+        except StopIteration:
+            return jsonify({'error': 'No rows provided'}), 400
+        except (ValueError, KeyError) as e:
+            return jsonify({'error': f'Invalid rows: {str(e)}'}), 400
+            
+    except Exception as e:
+        logger.error(f"Error scoring with model {model_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+        
+    def generate():
+        yield format_batch(first, output, header=True)
+        try:
+            for batch in batches:
+                yield format_batch(score_frame(entry, batch, id_column), output)
+        except Exception as e:
+            # Headers are already sent; report the failure in the body
+            logger.error(f"Error scoring with model {model_id}: {str(e)}")
+            yield f"# error: {str(e)}\n" if output == 'csv' else app.json.dumps({'error': str(e)}) + "\n"
+            
+    response = Response(stream_with_context(generate()), mimetype=SCORE_FORMATS[output])
+    response.headers['X-Model-Id'] = model_id
+    return response
+
+@app.route('/api/plots/<fingerprint>/<plot_id>.<fmt>', methods=['GET'])
+def get_plot(fingerprint, plot_id, fmt):
+    """Serve a plot image, rendering it on first request."""
+    try:
+        path = plot_image_path(fingerprint, plot_id, fmt)
+        response = send_file(path, mimetype=PLOT_FORMATS[fmt], conditional=True,
+                             etag=f"{fingerprint}-{plot_id}-{fmt}")
+        # The URL names both the data and the plot, so the image never changes
+        response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+        return response
+        
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        logger.error(f"Error rendering plot: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/analyze_chart', methods=['POST'])
 def analyze_chart():
     """Analyze data visualization using AI."""
     try:
-        # Get image data
+        # Get image data, either inline or as a reference to a rendered plot
         data = request.json
         image_data = data.get('image_data')
         
+        if not image_data and data.get('plot_id'):
+            try:
+                path = plot_image_path(data.get('fingerprint', ''), data['plot_id'])
+            except LookupError as e:
+                return jsonify({'error': str(e)}), 404
+            with open(path, 'rb') as f:
+                image_data = f.read()
+        
         if not image_data:
             return jsonify({'error': 'No image data provided'}), 400
             
-        # Remove data URL prefix if present
-        if image_data.startswith('data:image'):
-            image_data = image_data.split(',')[1]
+        # Decoded once, size-checked, downscaled and hashed; the dataset is not locked
+        try:
+            chart = prepare_chart(image_data)
+        except ImageTooLarge as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
             
-        # Analyze image
-        analysis = analyzer.analyze_image_data(image_data)
+        # Analyze image; near-identical charts are answered from the cache
+        analysis = analyze_chart_image(chart)
         
         return jsonify({
             'message': 'Chart analysis completed',
-            'analysis': analysis
+            'analysis': analysis,
+            'image': {key: chart[key] for key in ('width', 'height', 'bytes', 'original_bytes')}
         })
         
     except Exception as e:
@@ -254,26 +827,15 @@ def analyze_chart():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/columns', methods=['GET'])
-def get_columns():
+@with_dataset
+def get_columns(analyzer):
     """Get list of columns in the loaded dataset."""
     try:
         if analyzer.data is None:
             return jsonify({'error': 'No data loaded. Please upload a file first.'}), 400
             
-        # Get column information
-        columns = []
-        for col in analyzer.data.columns:
-            dtype = str(analyzer.data[col].dtype)
-            unique_count = analyzer.data[col].nunique()
-            missing_count = analyzer.data[col].isnull().sum()
-            
-            columns.append({
-                'name': col,
-                'dtype': dtype,
-                'unique_count': int(unique_count),
-                'missing_count': int(missing_count),
-                'missing_percentage': round((missing_count / len(analyzer.data)) * 100, 2)
-            })
+        # Cached per data version, so repeated requests do not rescan the data
+        columns = analyzer.profile.columns_info()
             
         return jsonify({
             'columns': columns
@@ -284,7 +846,8 @@ def get_columns():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/data', methods=['GET'])
-def get_data():
+@with_dataset
+def get_data(analyzer):
     """Get a sample of the loaded dataset."""
     try:
         if analyzer.data is None:
@@ -296,9 +859,12 @@ def get_data():
         # Get sample of data
         sample = analyzer.data.head(rows).to_dict(orient='records')
         
+        # Streamed datasets keep only a sample in memory; the store has every row
+        total_rows = analyzer.store.n_rows if analyzer.store is not None else len(analyzer.data)
+        
         return jsonify({
             'data': sample,
-            'total_rows': len(analyzer.data),
+            'total_rows': total_rows,
             'displayed_rows': min(rows, len(analyzer.data))
         })
         
@@ -306,5 +872,10 @@ def get_data():
         logger.error(f"Error getting data: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/status/imports', methods=['GET'])
+def get_import_status():
+    """Which heavy modules are loaded and how long their imports took."""
+    return jsonify(import_report())
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -1,136 +1,458 @@
 import os
+import time
+import uuid
 import logging
 import json
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.cluster import KMeans
-from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, classification_report, confusion_matrix
-from openai import OpenAI
 from datetime import datetime
-import base64
-from io import BytesIO
+from analysis.ingest import MemoryMonitor, optimize_dtypes, read_dataset, append_rows
+from analysis.streaming import should_stream, stream_csv, append_chunks, DEFAULT_CHUNK_ROWS
+from analysis.accumulators import DatasetAccumulator, verify_accumulator
+from analysis.store import DatasetCache, DEFAULT_STORE_DIR, hash_file, hash_frame
+from analysis.profile import ColumnProfile
+from analysis.correlation import CorrelationEngine, chunked_corr, correlation_report
+from analysis.outliers import detect_outliers, detect_outliers_streaming
+from analysis.clustering import cluster_numeric
+from analysis.importance import feature_importance
+from analysis.plots import build_plot_specs, plot_payload
+from analysis.llm import LLMGateway
+from analysis.models import FeatureEncoder, ModelRegistry, model_key
+from analysis.training import PREDICT_SAMPLE_ROWS, train_model
+from analysis.imports import ensure_loaded
+from analysis.images import ChartAnalysisCache, chart_cache_key, prepare_chart
+from analysis.prompts import PROMPT_TOKEN_BUDGET, TASK_SECTIONS, build_analysis_context, compact_text
+from analysis.sampling import (APPROX_ROW_THRESHOLD, APPROX_SAMPLE_ROWS, choose_strata,
+                               draw_sample, add_confidence_intervals)
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+# LLM calls are cached, deduplicated and time-limited; LLM_BACKEND=stub works offline
+llm_gateway = LLMGateway()
+
+# Chart analyses, cached by prompt and prepared image
+chart_cache = ChartAnalysisCache()
+CHART_PROMPT = ("Analyze this data visualization. Explain what it shows, the key patterns or trends, and any insights "
+                "that can be derived from it. Include any anomalies or interesting points.")
+
+# Parsed uploads, keyed by content hash and shared by all workers
+dataset_cache = DatasetCache()
+
+# Fitted prediction models, reused by identical training requests and for batch scoring
+model_registry = ModelRegistry()
+
+# Analysis stages, in the order they are run and reported
+ANALYSIS_STAGES = ('correlation', 'outliers', 'clusters', 'important_features', 'plots')
 
 class DataAnalysisTool:
     """A tool for analyzing data and generating insights with AI assistance."""
     
     def __init__(self):
+        # Bumped whenever data is replaced; cached column profiles are keyed by it
+        self.version = 0
+        self._profile = None
+        self._correlations = None
+        self._fingerprint = (None, None)
+        self._sample = (None, None)
         self.data = None
-        self.original_data = None
+        self._original_data = None
+        self._original_source = None
         self.analysis_results = {}
         self.data_summary = None
         self.plot_paths = []
+        # Set for streamed datasets: on-disk store of all rows and summary accumulators
+        self.store = None
+        self.accumulator = None
+        # Data version the accumulators of an in-memory dataset describe
+        self._accumulated_version = None
+        # Content hash of a file-backed dataset in the dataset cache
+        self.cache_key = None
+        # How this analyzer's data was sampled from a larger dataset, if it was
+        self.sampling = None
+        
+    @property
+    def data(self):
+        return self._data
+        
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self.version += 1
+        
+    @property
+    def profile(self):
+        """
+        Column profile of the current data, computed once per data version.
+        
+        Code that modifies self.data in place must assign it again (or call
+        invalidate_profile) so the profile is recomputed.
+        """
+        if self._data is None:
+            return None
+        if self._profile is None or self._profile.version != self.version:
+            self._profile = ColumnProfile(self._data, version=self.version)
+        return self._profile
         
-    def load_data(self, file_path=None, dataframe=None):
+    @property
+    def correlations(self):
+        """Correlation engine over the numeric columns, shared per data version."""
+        if self._data is None:
+            return None
+        if self._correlations is None or self._correlations.version != self.version:
+            self._correlations = CorrelationEngine(self._data, self.profile.numeric, version=self.version)
+        return self._correlations
+        
+    @property
+    def fingerprint(self):
+        """Content hash of the current data, computed once per data version."""
+        if self._data is None:
+            return None
+        version, fingerprint = self._fingerprint
+        if version != self.version:
+            fingerprint = hash_frame(self._data)
+            self._fingerprint = (self.version, fingerprint)
+        return fingerprint
+        
+    @property
+    def sample_analyzer(self):
+        """
+        Analyzer over a stratified sample of the current data, drawn once per
+        data version for approximate analysis.
+        """
+        if self._data is None:
+            return None
+        version, analyzer = self._sample
+        if version != self.version:
+            sample, method = draw_sample(self._data, APPROX_SAMPLE_ROWS, strata=choose_strata(self.profile))
+            analyzer = DataAnalysisTool()
+            analyzer.data = sample
+            analyzer.sampling = method
+            self._sample = (self.version, analyzer)
+        return analyzer
+        
+    def invalidate_profile(self):
+        """Force the column profile and correlations to be recomputed on next access."""
+        self.version += 1
+        
+    @property
+    def original_data(self):
+        """
+        Snapshot of the data as loaded, materialized on first access.
+        
+        File-backed datasets are reopened from the dataset cache instead of
+        being kept as a second in-memory copy, or re-read from the file if
+        the cache evicted them.
+        """
+        if self._original_data is None and self._original_source is not None:
+            content_hash, columns, file_path = self._original_source
+            if dataset_cache.has(content_hash):
+                self._original_data = dataset_cache.open(content_hash, columns=columns)
+            else:
+                data = read_dataset(file_path)[0]
+                self._original_data = data[columns] if columns else data
+        return self._original_data
+        
+    @original_data.setter
+    def original_data(self, value):
+        self._original_data = value
+        self._original_source = None
+        
+    def load_data(self, file_path=None, dataframe=None, streaming=None, columns=None, content_hash=None):
         """
         Load data from file or pandas DataFrame.
         
+        Numeric columns are downcast, low-cardinality strings become
+        categoricals and date columns are parsed once. The summary reports
+        peak and steady-state memory of the load.
+        
+        Parsed files are cached as memory-mapped Arrow files keyed by content
+        hash, so loading an identical file again skips parsing.
+        
+        Large CSV files are streamed: the summary is computed in one pass
+        over chunks, all rows are persisted to an on-disk columnar store and
+        self.data holds a bounded uniform sample for the in-memory stages.
+        
         Args:
             file_path (str, optional): Path to csv, excel, or json file
             dataframe (DataFrame, optional): Pandas DataFrame
+            streaming (bool, optional): Force streaming on or off; by default
+                CSV files above STREAMING_THRESHOLD_MB are streamed
+            columns (list, optional): Only load these columns
+            content_hash (str, optional): SHA-256 of the file if already known
             
         Returns:
             dict: Data summary
         """
         try:
+            self._replace_store(None)
+            self.accumulator = None
+            self.cache_key = None
+            
             if dataframe is not None:
-                self.data = dataframe.copy()
+                with MemoryMonitor() as monitor:
+                    self.data = dataframe[columns].copy() if columns else dataframe.copy()
+                    dtype_changes = optimize_dtypes(self.data)
+                memory = {
+                    "steady_state_bytes": int(self.data.memory_usage(deep=True).sum()),
+                    "peak_bytes": monitor.peak_increase,
+                }
+                # The caller's frame already is an untouched snapshot
+                self.original_data = dataframe
             elif file_path:
-                file_extension = os.path.splitext(file_path)[1].lower()
+                content_hash = content_hash or hash_file(file_path)
                 
-                if file_extension == '.csv':
-                    self.data = pd.read_csv(file_path)
-                elif file_extension in ['.xls', '.xlsx']:
-                    self.data = pd.read_excel(file_path)
-                elif file_extension == '.json':
-                    self.data = pd.read_json(file_path)
+                if streaming or (streaming is None and should_stream(file_path)):
+                    result = stream_csv(file_path, store_path=os.path.join(DEFAULT_STORE_DIR, content_hash[:16]))
+                    self.data = result.sample[columns] if columns else result.sample
+                    self._replace_store(result.store)
+                    self.accumulator = result.accumulator
+                    # The store is the snapshot; never re-read the whole file into memory
+                    self.original_data = None
+                    self.data_summary = result.summary
+                    return self.data_summary
+                
+                cached = dataset_cache.has(content_hash)
+                if cached:
+                    with MemoryMonitor() as monitor:
+                        self.data = dataset_cache.open(content_hash, columns=columns)
+                    dtype_changes = (dataset_cache.meta(content_hash) or {}).get("dtype_changes", {})
+                    memory = {
+                        "steady_state_bytes": int(self.data.memory_usage(deep=True).sum()),
+                        "peak_bytes": monitor.peak_increase,
+                        "cached": True,
+                    }
                 else:
-                    raise ValueError(f"Unsupported file format: {file_extension}")
+                    self.data, report = read_dataset(file_path)
+                    # Best-effort: frames Arrow cannot store stay in memory only
+                    cached = dataset_cache.put(content_hash, self.data, meta={
+                        "source": os.path.basename(file_path),
+                        "dtype_changes": report["dtype_changes"],
+                    })
+                    if columns:
+                        self.data = self.data[columns]
+                    dtype_changes = report["dtype_changes"]
+                    memory = dict(report["memory"], cached=False)
+                
+                self.cache_key = content_hash if cached else None
+                # Reopen from the cache if anyone asks for the original
+                self.original_data = None
+                self._original_source = (content_hash, columns, file_path)
             else:
                 raise ValueError("Either file_path or dataframe must be provided")
             
-            # Store original data
-            self.original_data = self.data.copy()
-            
             # Generate data summary
             self.data_summary = self._generate_data_summary()
+            if self.data_summary is not None:
+                self.data_summary["memory"] = memory
+                self.data_summary["dtype_changes"] = dtype_changes
             return self.data_summary
             
         except Exception as e:
             logger.error(f"Error loading data: {str(e)}")
             raise
             
-    def _generate_data_summary(self):
-        """Generate a summary of the dataset."""
+    def append_data(self, file_path=None, dataframe=None, verify=False):
+        """
+        Append rows to the loaded dataset and update results incrementally.
+        
+        The summary and pearson correlations are updated from mergeable
+        accumulators (moments, co-moments, quantile sketches and top-k
+        counts), so their cost depends only on the new rows. In-memory
+        datasets build their accumulators from the current data on the first
+        append and keep exact quartiles; streamed datasets report sketch
+        estimates, flagged by the summary's "approximate" entry. Stages that
+        need every row again are dropped from the results and reported as
+        stale.
+        
+        Args:
+            file_path (str, optional): csv, excel or json file with the new rows
+            dataframe (DataFrame, optional): New rows
+            verify (bool): Recompute the statistics from all rows and report
+                whether the incremental results match
+            
+        Returns:
+            dict: rows_appended, n_rows, summary, correlation, stale_stages,
+                seconds and, with verify, verification
+        """
         if self.data is None:
-            return None
+            raise ValueError("No data loaded. Please load data first.")
+        if file_path is None and dataframe is None:
+            raise ValueError("Either file_path or dataframe must be provided")
             
         try:
-            # Basic info
-            n_rows, n_cols = self.data.shape
-            data_types = self.data.dtypes.value_counts().to_dict()
-            data_types = {str(k): v for k, v in data_types.items()}
-            
-            # Missing values
-            missing_values = self.data.isnull().sum().sum()
-            missing_percentage = (missing_values / (n_rows * n_cols)) * 100
-            
-            # Column types
-            numeric_cols = self.data.select_dtypes(include=['number']).columns.tolist()
-            categorical_cols = self.data.select_dtypes(include=['object', 'category']).columns.tolist()
-            datetime_cols = self.data.select_dtypes(include=['datetime']).columns.tolist()
-            
-            # Generate numeric summary if numeric columns exist
-            numeric_summary = None
-            if numeric_cols:
-                numeric_summary = self.data[numeric_cols].describe().to_dict()
+            started = time.perf_counter()
+            if self.store is not None:
+                appended = self._append_streamed(file_path, dataframe)
+            else:
+                appended = self._append_in_memory(file_path, dataframe)
                 
-            # Generate categorical summary if categorical columns exist
-            categorical_summary = {}
-            for col in categorical_cols:
-                if len(self.data[col].unique()) <= 20:  # Only for columns with reasonable number of categories
-                    categorical_summary[col] = self.data[col].value_counts().head(10).to_dict()
-            
-            summary = {
-                "n_rows": n_rows,
-                "n_cols": n_cols,
-                "data_types": data_types,
-                "missing_values": {
-                    "count": int(missing_values),
-                    "percentage": float(missing_percentage)
-                },
-                "columns": {
-                    "numeric": numeric_cols,
-                    "categorical": categorical_cols,
-                    "datetime": datetime_cols
-                },
-                "numeric_summary": numeric_summary,
-                "categorical_summary": categorical_summary
+            # Keep load details (memory, dtype changes, streaming) next to the updated summary
+            summary = dict(self.data_summary or {})
+            summary.update(self.accumulator.summary())
+            if self.store is None:
+                self._use_exact_quartiles(summary)
+            if self.store is not None and "streaming" in summary:
+                summary["streaming"] = dict(summary["streaming"], store_path=self.store.path,
+                                            sample_rows=len(self.data))
+            self.data_summary = summary
+            
+            correlation, stale_stages = self._update_results_after_append()
+            result = {
+                "rows_appended": appended,
+                "n_rows": self.accumulator.n_rows,
+                "summary": self.data_summary,
+                "correlation": correlation,
+                "stale_stages": stale_stages,
+                "seconds": round(time.perf_counter() - started, 3)
             }
             
-            return summary
+            if verify:
+                started = time.perf_counter()
+                chunks = self.store.iter_chunks() if self.store is not None else [self.data]
+                result["verification"] = dict(verify_accumulator(self.accumulator, chunks),
+                                              seconds=round(time.perf_counter() - started, 3))
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error appending data: {str(e)}")
+            raise
+            
+    def _append_in_memory(self, file_path, dataframe):
+        rows = dataframe if dataframe is not None else read_dataset(file_path)[0]
+        
+        # Accumulators describe one data version; rebuild them if the data changed otherwise
+        if self.accumulator is None or self._accumulated_version != self.version:
+            self.accumulator = DatasetAccumulator()
+            self.accumulator.update(self.data)
+            
+        n_before = len(self.data)
+        combined = append_rows(self.data, rows)
+        self.accumulator.update(combined.iloc[n_before:])
+        self.data = combined
+        self._accumulated_version = self.version
+        # The data no longer matches the cached upload it was loaded from
+        self.cache_key = None
+        return len(combined) - n_before
+        
+    def _append_streamed(self, file_path, dataframe):
+        # A complete store is shared by every load of the same file; append to a fork of it
+        if self.store.complete:
+            self._replace_store(self.store.fork(os.path.join(DEFAULT_STORE_DIR, uuid.uuid4().hex[:16])))
+            
+        plan = self.store.meta.get("plan")
+        if dataframe is not None:
+            rows = dataframe.copy()
+            optimize_dtypes(rows, plan)
+            chunks = [rows]
+        elif os.path.splitext(file_path)[1].lower() == '.csv':
+            chunks = pd.read_csv(file_path, chunksize=DEFAULT_CHUNK_ROWS, dtype=plan["dtype"] or None,
+                                 parse_dates=plan["parse_dates"] or None)
+        else:
+            chunks = [read_dataset(file_path, plan=plan)[0]]
+            
+        sample, appended = append_chunks(chunks, self.store, self.accumulator, self.data)
+        self.data = sample
+        return appended
+        
+    def _use_exact_quartiles(self, summary):
+        """Replace the sketch quartiles of a summary with exact ones from the in-memory data."""
+        numeric = summary.get("numeric_summary")
+        if numeric:
+            quartiles = self.data[list(numeric)].quantile([0.25, 0.5, 0.75])
+            for col, stats in numeric.items():
+                stats["25%"], stats["50%"], stats["75%"] = (float(v) for v in quartiles[col])
+        summary.pop("approximate", None)
+        
+    def _update_results_after_append(self):
+        """
+        Replace the pearson correlation result with one from the co-moments
+        and drop results that need a full recomputation.
+        
+        Returns:
+            tuple: (correlation result or None, stale stage names)
+        """
+        previous = self.analysis_results.get("correlation") or {}
+        comoments = self.accumulator.comoments
+        self.analysis_results = {}
+        self.plot_paths = []
+        
+        if comoments is None or not comoments.columns or previous.get("method", "pearson") != "pearson":
+            return None, list(ANALYSIS_STAGES)
+            
+        corr_matrix = comoments.correlation()
+        correlation = correlation_report(corr_matrix, "pearson", comoments.rows)
+        self.analysis_results["correlation"] = correlation
+        # The heatmap and top pair of the new version reuse the incremental matrix
+        if self.store is None and comoments.columns == self.profile.numeric:
+            self.correlations.seed("pearson", corr_matrix, comoments.rows)
+        return correlation, [stage for stage in ANALYSIS_STAGES if stage != "correlation"]
+        
+    def _replace_store(self, store):
+        """Point the dataset at another store, deleting the previous one if it was private."""
+        previous, self.store = self.store, store
+        if previous is not None and previous.private and (store is None or store.path != previous.path):
+            previous.remove()
+            
+    def owned_paths(self):
+        """
+        On-disk data owned by this dataset alone, to delete when it is dropped.
+        
+        Returns:
+            list: Directories of private (forked) stores
+        """
+        return [self.store.path] if self.store is not None and self.store.private else []
+        
+    def store_paths(self):
+        """
+        Stores this dataset reads, which must not be evicted while it is alive.
+        
+        Returns:
+            list: The store and, for a fork, the store whose parts it references
+        """
+        if self.store is None:
+            return []
+        return [self.store.path] + ([self.store.meta["forked_from"]] if self.store.private else [])
+        
+    def memory_usage(self):
+        """
+        Deep memory footprint of the loaded data.
+        
+        Returns:
+            int: Bytes used by data and original_data
+        """
+        total = 0
+        for frame in (self.data, self._original_data):
+            if frame is not None:
+                total += int(frame.memory_usage(deep=True).sum())
+        return total
+        
+    def _generate_data_summary(self):
+        """Generate a summary of the dataset."""
+        if self.data is None:
+            return None
+            
+        try:
+            return self.profile.summary()
             
         except Exception as e:
             logger.error(f"Error generating data summary: {str(e)}")
             return None
             
-    def analyze_data(self):
+    def analyze_data(self, correlation_method='pearson', outlier_method='iqr', importance_mode='random_forest',
+                     approximate=None):
         """
         Perform comprehensive data analysis.
         
+        Args:
+            correlation_method (str): 'pearson' or 'spearman'
+            outlier_method (str): 'iqr', 'zscore', 'mad' or 'isolation_forest'
+            importance_mode (str): 'random_forest', 'hist_gradient_boosting' or
+                'mutual_information'
+            approximate (bool, optional): Analyze a sample; by default only
+                above APPROX_ROW_THRESHOLD rows (see run_stage)
+        
         Returns:
             dict: Analysis results
         """
@@ -138,16 +460,18 @@ class DataAnalysisTool:
             raise ValueError("No data loaded. Please load data first.")
             
         try:
-            # Statistical analysis
-            self.analysis_results["correlation"] = self._analyze_correlations()
-            self.analysis_results["outliers"] = self._detect_outliers()
-            
-            # Advanced analytics
-            self.analysis_results["clusters"] = self._perform_clustering()
-            self.analysis_results["important_features"] = self._identify_important_features()
-            
-            # Generate visualizations
-            self.plot_paths = self._generate_visualizations()
+            options = {
+                "correlation_method": correlation_method,
+                "outlier_method": outlier_method,
+                "importance_mode": importance_mode,
+                "approximate": approximate
+            }
+            for stage in ANALYSIS_STAGES:
+                result = self.run_stage(stage, **options)
+                if stage == "plots":
+                    self.plot_paths = result
+                else:
+                    self.analysis_results[stage] = result
             
             return self.analysis_results
             
@@ -155,335 +479,253 @@ class DataAnalysisTool:
             logger.error(f"Error in data analysis: {str(e)}")
             raise
             
-    def _analyze_correlations(self):
-        """Analyze correlations between numeric variables."""
-        numeric_data = self.data.select_dtypes(include=['number'])
+    def run_stage(self, stage, correlation_method='pearson', outlier_method='iqr',
+                  importance_mode='random_forest', approximate=None):
+        """
+        Run one analysis stage.
         
-        if numeric_data.empty:
-            return {"message": "No numeric columns to analyze correlations"}
+        In approximate mode the stage runs on a stratified sample of
+        APPROX_SAMPLE_ROWS rows and the result carries an "approximate" entry
+        with the sample size, plus confidence intervals for correlations,
+        outlier and cluster shares. Streamed datasets only hold a reservoir
+        sample in memory, so their results are always approximate except for
+        outliers (scanned on disk) and exact pearson correlations.
+        
+        Args:
+            stage (str): One of ANALYSIS_STAGES
+            correlation_method (str): Used by correlation and plots
+            outlier_method (str): Used by outliers
+            importance_mode (str): Used by important_features
+            approximate (bool, optional): True to sample, False for an exact
+                result; by default datasets above APPROX_ROW_THRESHOLD rows
+                are sampled
             
-        # Calculate correlation matrix
-        corr_matrix = numeric_data.corr().round(2)
-        
-        # Find strong correlations (abs > 0.7) excluding self-correlations
-        strong_correlations = []
-        for i, col1 in enumerate(corr_matrix.columns):
-            for j, col2 in enumerate(corr_matrix.columns):
-                if i < j:  # Only look at unique pairs
-                    corr_value = corr_matrix.iloc[i, j]
-                    if abs(corr_value) > 0.7:
-                        strong_correlations.append({
-                            "variables": [col1, col2],
-                            "correlation": float(corr_value),
-                            "interpretation": "strong positive" if corr_value > 0 else "strong negative"
-                        })
-                        
-        return {
-            "correlation_matrix": corr_matrix.to_dict(),
-            "strong_correlations": strong_correlations
-        }
+        Returns:
+            The stage result (plot specs for 'plots')
+        """
+        if stage not in ANALYSIS_STAGES:
+            raise ValueError(f"Unknown analysis stage: {stage}")
+        if stage == "plots":
+            # Specs are cheap; images are drawn from bounded payloads on request
+            return self._generate_visualizations(correlation_method)
+        if stage != "outliers" or outlier_method == "isolation_forest":
+            # Heavy modules are imported (and timed) by the first stage that needs them
+            ensure_loaded(stage)
         
-    def _detect_outliers(self):
-        """Detect outliers in numeric columns using IQR method."""
-        numeric_data = self.data.select_dtypes(include=['number'])
+        if self.store is not None:
+            return self._run_streamed_stage(stage, correlation_method, outlier_method,
+                                            importance_mode, approximate)
         
-        if numeric_data.empty:
-            return {"message": "No numeric columns to detect outliers"}
-            
-        outliers_summary = {}
-        
-        for column in numeric_data.columns:
-            # Calculate IQR
-            Q1 = numeric_data[column].quantile(0.25)
-            Q3 = numeric_data[column].quantile(0.75)
-            IQR = Q3 - Q1
-            
-            # Define outlier boundaries
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            
-            # Find outliers
-            outliers = numeric_data[(numeric_data[column] < lower_bound) | 
-                                   (numeric_data[column] > upper_bound)][column]
-            
-            if not outliers.empty:
-                outliers_summary[column] = {
-                    "count": len(outliers),
-                    "percentage": round((len(outliers) / len(numeric_data)) * 100, 2),
-                    "bounds": {
-                        "lower": float(lower_bound),
-                        "upper": float(upper_bound)
-                    },
-                    "examples": outliers.head(5).tolist() if len(outliers) > 0 else []
-                }
-                
-        return outliers_summary
+        if approximate is None:
+            approximate = len(self.data) > APPROX_ROW_THRESHOLD
+        sample = self.sample_analyzer if approximate else None
+        if sample is None or len(sample.data) == len(self.data):
+            return self._run_exact_stage(stage, correlation_method, outlier_method, importance_mode,
+                                         exact=approximate is False)
         
-    def _perform_clustering(self):
-        """Perform K-means clustering on the numeric data."""
-        numeric_data = self.data.select_dtypes(include=['number'])
+        result = sample._run_exact_stage(stage, correlation_method, outlier_method, importance_mode)
+        return add_confidence_intervals(stage, result, len(sample.data), len(self.data), sample.sampling)
         
-        if numeric_data.empty or numeric_data.shape[1] < 2:
-            return {"message": "Insufficient numeric columns for clustering"}
-            
-        # Handle missing values for clustering
-        numeric_data_clean = numeric_data.fillna(numeric_data.mean())
+    def _run_exact_stage(self, stage, correlation_method, outlier_method, importance_mode, exact=False):
+        if stage == "correlation":
+            return self._analyze_correlations(correlation_method, exact=exact)
+        if stage == "outliers":
+            return self._detect_outliers(outlier_method)
+        if stage == "clusters":
+            return self._perform_clustering()
+        return self._identify_important_features(importance_mode)
+        
+    def _run_streamed_stage(self, stage, correlation_method, outlier_method, importance_mode, approximate):
+        # Outliers are always counted over the whole store
+        if stage == "outliers":
+            return self._detect_outliers(outlier_method)
+        if approximate is False:
+            if stage == "correlation":
+                return self._analyze_correlations(correlation_method, exact=True)
+            raise ValueError(f"Exact {stage} analysis is not available for streamed datasets")
+        
+        result = self._run_exact_stage(stage, correlation_method, outlier_method, importance_mode)
+        if len(self.data) >= self.store.n_rows:
+            return result
+        return add_confidence_intervals(stage, result, len(self.data), self.store.n_rows, "reservoir")
+        
+    def snapshot(self):
+        """
+        Picklable reference to the current data for analysis in another process.
         
-        # Standardize data
-        scaler = StandardScaler()
-        scaled_data = scaler.fit_transform(numeric_data_clean)
+        The data is written once per version to the dataset cache, keyed by
+        its fingerprint, so worker processes memory-map it instead of
+        receiving a pickled copy. Data Arrow cannot store travels as a
+        pickled frame instead.
         
-        # Determine optimal number of clusters using silhouette score
-        from sklearn.metrics import silhouette_score
+        Returns:
+            dict: Cache key, version, streaming state and, if uncached, the data
+        """
+        fingerprint = self.fingerprint
+        # has() marks an existing copy as used, so it is not evicted before the worker opens it
+        cached = dataset_cache.has(fingerprint) or dataset_cache.put(fingerprint, self.data)
+        return {
+            "fingerprint": fingerprint,
+            "version": self.version,
+            "store": self.store,
+            "accumulator": self.accumulator,
+            "data": None if cached else self.data
+        }
         
-        scores = []
-        max_clusters = min(10, len(numeric_data) // 10)  # Limit based on data size
-        max_clusters = max(2, max_clusters)  # Ensure at least 2 clusters
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Rebuild an analyzer from snapshot() output, e.g. in a worker process."""
+        analyzer = cls()
+        data = snapshot.get("data")
+        analyzer.data = data if data is not None else dataset_cache.open(snapshot["fingerprint"])
+        analyzer._fingerprint = (analyzer.version, snapshot["fingerprint"])
+        analyzer.store = snapshot["store"]
+        analyzer.accumulator = snapshot["accumulator"]
+        return analyzer
         
-        for k in range(2, max_clusters + 1):
-            kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-            labels = kmeans.fit_predict(scaled_data)
-            score = silhouette_score(scaled_data, labels)
-            scores.append((k, score))
+    def _analyze_correlations(self, method='pearson', exact=False):
+        """
+        Analyze correlations between numeric variables.
+        
+        Args:
+            method (str): 'pearson' or 'spearman'
+            exact (bool): Use every row, even where the engine would sample
+        """
+        numeric_cols = self.profile.numeric
+        if not numeric_cols:
+            return {"message": "No numeric columns to analyze correlations"}
             
-        best_k = max(scores, key=lambda x: x[1])[0]
+        if exact and self.store is not None:
+            # Ranks need the whole column at once, sums can be added per chunk
+            if method != 'pearson':
+                raise ValueError("Exact correlations of streamed datasets are only available for pearson")
+            comoments = self.accumulator.comoments
+            if comoments is not None and comoments.columns == numeric_cols:
+                # Accumulated while ingesting and appending, so no pass over the store
+                return correlation_report(comoments.correlation(), method, comoments.rows)
+            means = [self.accumulator.columns[col].moments.mean for col in numeric_cols]
+            corr_matrix, rows = chunked_corr(self.store.iter_chunks(numeric_cols), numeric_cols, means)
+            return correlation_report(corr_matrix, method, rows)
+            
+        # Matrix is computed once per data version and shared with the plots
+        return self.correlations.report(method, approximate=False if exact else None)
         
-        # Perform clustering with optimal k
-        kmeans = KMeans(n_clusters=best_k, random_state=42, n_init=10)
-        clusters = kmeans.fit_predict(scaled_data)
+    def _detect_outliers(self, method='iqr'):
+        """
+        Detect outliers in numeric columns.
         
-        # Add cluster labels to dataframe
-        self.data['cluster'] = clusters
+        Args:
+            method (str): 'iqr', 'zscore', 'mad' or 'isolation_forest'
+        """
+        numeric_cols = self.profile.numeric
         
-        # Analyze clusters
-        cluster_analysis = {}
-        for cluster_id in range(best_k):
-            cluster_data = self.data[self.data['cluster'] == cluster_id]
-            cluster_analysis[f"cluster_{cluster_id}"] = {
-                "size": len(cluster_data),
-                "percentage": round((len(cluster_data) / len(self.data)) * 100, 2),
-                "summary": {}
-            }
+        if not numeric_cols:
+            return {"message": "No numeric columns to detect outliers"}
             
-            # Summarize numeric features by cluster
-            for col in numeric_data.columns:
-                cluster_analysis[f"cluster_{cluster_id}"]["summary"][col] = {
-                    "mean": float(cluster_data[col].mean()),
-                    "median": float(cluster_data[col].median()),
-                    "std": float(cluster_data[col].std())
-                }
-                
-        # Remove the temporary cluster column
-        self.data.drop('cluster', axis=1, inplace=True)
+        # Streamed datasets are scanned on disk so counts cover every row
+        if self.store is not None and self.accumulator is not None:
+            return detect_outliers_streaming(self.store, self.accumulator, numeric_cols,
+                                             method=method, sample=self.data)
+            
+        return detect_outliers(self.data[numeric_cols], method=method)
         
-        return {
-            "optimal_clusters": best_k,
-            "silhouette_scores": dict(scores),
-            "cluster_analysis": cluster_analysis
-        }
+    def _perform_clustering(self):
+        """Perform K-means clustering on the numeric data."""
+        numeric_data = self.data[self.profile.numeric]
+        
+        if numeric_data.empty or numeric_data.shape[1] < 2:
+            return {"message": "Insufficient numeric columns for clustering"}
+            
+        # Labels stay local to the result so self.data is never mutated
+        return cluster_numeric(numeric_data)
         
-    def _identify_important_features(self):
-        """Identify important features using Random Forest."""
-        numeric_data = self.data.select_dtypes(include=['number'])
+    def _identify_important_features(self, mode='random_forest'):
+        """
+        Identify important features with each numeric column as the target.
+        
+        Args:
+            mode (str): 'random_forest', 'hist_gradient_boosting' or 'mutual_information'
+        """
+        numeric_data = self.data[self.profile.numeric]
         
         if numeric_data.shape[1] < 2:
             return {"message": "Insufficient numeric columns for feature importance analysis"}
             
-        # For each numeric column, treat it as target and find feature importance
-        feature_importance = {}
+        # Cached by data fingerprint, so re-running the analysis skips model fitting
+        return feature_importance(numeric_data, mode=mode, fingerprint=self.fingerprint)
         
-        for target_col in numeric_data.columns:
-            # Skip if too many missing values
-            if numeric_data[target_col].isnull().sum() / len(numeric_data) > 0.2:
-                continue
-                
-            # Prepare features and target
-            features = numeric_data.drop(target_col, axis=1)
-            target = numeric_data[target_col]
-            
-            # Skip if all remaining columns have missing values
-            if features.isnull().all(axis=0).all():
-                continue
-                
-            # Fill missing values for this analysis
-            features = features.fillna(features.mean())
-            target = target.fillna(target.mean())
-            
-            # Split data
-            X_train, X_test, y_train, y_test = train_test_split(
-                features, target, test_size=0.3, random_state=42
-            )
-            
-            # Train random forest
-            rf = RandomForestRegressor(n_estimators=100, random_state=42)
-            rf.fit(X_train, y_train)
-            
-            # Calculate feature importance
-            importance = rf.feature_importances_
-            
-            # Create results
-            feature_importance[target_col] = {
-                "features": [
-                    {"feature": col, "importance": float(imp)}
-                    for col, imp in zip(features.columns, importance)
-                ],
-                "model_score": float(rf.score(X_test, y_test))
-            }
-            
-            # Sort features by importance
-            feature_importance[target_col]["features"].sort(
-                key=lambda x: x["importance"], reverse=True
-            )
-            
-        return feature_importance
+    def _generate_visualizations(self, correlation_method='pearson'):
+        """
+        Decide which plots to show.
         
-    def _generate_visualizations(self):
-        """Generate data visualizations."""
+        Only plot specs are produced here; images are rendered on request
+        from get_plot_payload, so analysis never waits for drawing.
+        
+        Returns:
+            list: Plot specs with id, type, title and columns
+        """
         if self.data is None:
             return []
             
-        plot_data = []
-        
         try:
-            # Set style
-            sns.set(style="whitegrid")
-            plt.rcParams.update({'font.size': 10})
-            plt.rcParams["figure.figsize"] = (10, 6)
-            
-            # 1. Distribution of numeric variables
-            numeric_data = self.data.select_dtypes(include=['number'])
-            if not numeric_data.empty:
-                for col in numeric_data.columns[:5]:  # Limit to first 5 columns
-                    plt.figure()
-                    sns.histplot(numeric_data[col].dropna(), kde=True)
-                    plt.title(f'Distribution of {col}')
-                    plt.tight_layout()
-                    
-                    # Save to memory
-                    buf = BytesIO()
-                    plt.savefig(buf, format='png', dpi=100)
-                    plt.close()
-                    
-                    # Convert to base64
-                    buf.seek(0)
-                    img_str = base64.b64encode(buf.read()).decode('utf-8')
-                    
-                    plot_data.append({
-                        "title": f"Distribution of {col}",
-                        "type": "histogram",
-                        "image_data": img_str
-                    })
-                    
-            # 2. Correlation heatmap
-            if len(numeric_data.columns) > 1:
-                plt.figure()
-                corr = numeric_data.corr()
-                mask = np.triu(np.ones_like(corr, dtype=bool))
-                sns.heatmap(corr, mask=mask, annot=True, cmap='coolwarm', linewidths=0.5, fmt='.2f')
-                plt.title('Correlation Heatmap')
-                plt.tight_layout()
-                
-                # Save to memory
-                buf = BytesIO()
-                plt.savefig(buf, format='png', dpi=100)
-                plt.close()
-                
-                # Convert to base64
-                buf.seek(0)
-                img_str = base64.b64encode(buf.read()).decode('utf-8')
-                
-                plot_data.append({
-                    "title": "Correlation Heatmap",
-                    "type": "heatmap",
-                    "image_data": img_str
-                })
-                
-            # 3. Scatter plot for top correlated pairs
-            if len(numeric_data.columns) > 1:
-                # Find top correlated pairs
-                corr = numeric_data.corr().abs().unstack()
-                corr = corr[corr < 1].sort_values(ascending=False)
-                
-                if not corr.empty:
-                    top_pair = corr.index[0]
-                    col1, col2 = top_pair
-                    
-                    plt.figure()
-                    sns.regplot(x=self.data[col1], y=self.data[col2], scatter_kws={'alpha':0.5})
-                    plt.title(f'Relationship between {col1} and {col2}')
-                    plt.tight_layout()
-                    
-                    # Save to memory
-                    buf = BytesIO()
-                    plt.savefig(buf, format='png', dpi=100)
-                    plt.close()
-                    
-                    # Convert to base64
-                    buf.seek(0)
-                    img_str = base64.b64encode(buf.read()).decode('utf-8')
-                    
-                    plot_data.append({
-                        "title": f"Relationship between {col1} and {col2}",
-                        "type": "scatter",
-                        "image_data": img_str
-                    })
-                    
-            # 4. Box plots for numeric variables
-            if not numeric_data.empty:
-                for col in numeric_data.columns[:3]:  # Limit to first 3 columns
-                    plt.figure()
-                    sns.boxplot(y=numeric_data[col].dropna())
-                    plt.title(f'Box Plot of {col}')
-                    plt.tight_layout()
-                    
-                    # Save to memory
-                    buf = BytesIO()
-                    plt.savefig(buf, format='png', dpi=100)
-                    plt.close()
-                    
-                    # Convert to base64
-                    buf.seek(0)
-                    img_str = base64.b64encode(buf.read()).decode('utf-8')
-                    
-                    plot_data.append({
-                        "title": f"Box Plot of {col}",
-                        "type": "boxplot",
-                        "image_data": img_str
-                    })
-                    
-            # 5. Bar charts for categorical variables
-            categorical_data = self.data.select_dtypes(include=['object', 'category'])
-            if not categorical_data.empty:
-                for col in categorical_data.columns[:3]:  # Limit to first 3 columns
-                    if len(self.data[col].unique()) <= 15:  # Only plot if reasonable number of categories
-                        plt.figure()
-                        value_counts = self.data[col].value_counts().head(10)  # Top 10 categories
-                        sns.barplot(x=value_counts.index, y=value_counts.values)
-                        plt.title(f'Frequency of {col}')
-                        plt.xticks(rotation=45, ha='right')
-                        plt.tight_layout()
-                        
-                        # Save to memory
-                        buf = BytesIO()
-                        plt.savefig(buf, format='png', dpi=100)
-                        plt.close()
-                        
-                        # Convert to base64
-                        buf.seek(0)
-                        img_str = base64.b64encode(buf.read()).decode('utf-8')
-                        
-                        plot_data.append({
-                            "title": f"Frequency of {col}",
-                            "type": "bar",
-                            "image_data": img_str
-                        })
-                        
-            return plot_data
+            return build_plot_specs(self.profile, self.correlations, correlation_method)
             
         except Exception as e:
             logger.error(f"Error generating visualizations: {str(e)}")
             return []
             
+    def get_plot_payload(self, plot_id):
+        """
+        Look up a plot of the last analysis and extract the data it needs.
+        
+        Args:
+            plot_id (str): ID from the plot spec
+            
+        Returns:
+            tuple: (spec, payload), or (None, None) if the plot is unknown
+        """
+        spec = next((s for s in self.plot_paths if s["id"] == plot_id), None)
+        if spec is None or self.data is None:
+            return None, None
+        return spec, plot_payload(spec, self.data, self.profile, self.correlations)
+        
+    def ai_request(self, task, title=None, focus_areas=None, token_budget=None):
+        """
+        Build the LLM request for an AI task from the current analysis results.
+        
+        The request is a plain dict, so it can be built while the dataset is
+        locked and sent after the lock is released.
+        
+        Args:
+            task (str): 'insights' or 'story'
+            title (str, optional): Title of the story
+            focus_areas (list, optional): Specific aspects the story focuses on
+            token_budget (int, optional): Tokens for the analysis context;
+                PROMPT_TOKEN_BUDGET by default
+            
+        Returns:
+            dict: Keyword arguments for llm_gateway.complete() or stream()
+        """
+        if self.data is None or self.analysis_results is None:
+            raise ValueError("No data or analysis results available. Run analyze_data first.")
+        token_budget = token_budget or PROMPT_TOKEN_BUDGET
+        if task == "insights":
+            prompt, temperature = self._insights_prompt(token_budget), 0.5
+        elif task == "story":
+            prompt, temperature = self._story_prompt(title or "Data Analysis Findings", focus_areas, token_budget), 0.7
+        else:
+            raise ValueError(f"Unknown AI task: {task}")
+            
+        # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
+        # do not change this unless explicitly requested by the user
+        return {
+            "messages": [{"role": "user", "content": compact_text(prompt)}],
+            "model": "gpt-4o",
+            "response_format": {"type": "json_object"},
+            "temperature": temperature,
+            "max_tokens": 2000
+        }
+        
     def get_ai_insights(self):
         """
         Use OpenAI to generate advanced insights on the data analysis results.
@@ -491,27 +733,29 @@ class DataAnalysisTool:
         Returns:
             dict: AI-generated insights
         """
-        if self.data is None or self.analysis_results is None:
-            raise ValueError("No data or analysis results available. Run analyze_data first.")
-            
-        try:
-            # Prepare data summary and analysis results for AI
-            data_info = {
-                "data_summary": self.data_summary,
-                "correlation_results": self.analysis_results.get("correlation", {}),
-                "outliers_detected": self.analysis_results.get("outliers", {}),
-                "clustering_results": self.analysis_results.get("clusters", {}),
-                "important_features": self.analysis_results.get("important_features", {})
-            }
-            
-            data_info_str = json.dumps(data_info, indent=2)
-            
-            # Truncate if too large for API
-            if len(data_info_str) > 15000:
-                data_info_str = data_info_str[:15000] + "... [truncated]"
+        # Identical analyses produce identical prompts and are answered from the cache
+        return complete_ai_request(self.ai_request("insights"), "insights")
+        
+    def generate_data_story(self, title, focus_areas=None):
+        """
+        Generate a cohesive data story using AI.
+        
+        Args:
+            title (str): Title of the story
+            focus_areas (list, optional): Specific aspects to focus on
             
-            # Use OpenAI to generate insights
-            prompt = f"""You are a data science expert analyzing a dataset. Below is information about the dataset and analysis results.
+        Returns:
+            dict: AI-generated data story
+        """
+        return complete_ai_request(self.ai_request("story", title, focus_areas), "story")
+        
+    def _insights_prompt(self, token_budget=PROMPT_TOKEN_BUDGET):
+        """Prompt asking for insights on the analysis results."""
+        # Most salient facts first, compactly serialized, within the token budget
+        data_info_str, _ = build_analysis_context(self.data_summary, self.analysis_results,
+                                                  budget=token_budget, sections=TASK_SECTIONS["insights"])
+        
+        return f"""You are a data science expert analyzing a dataset. Below is information about the dataset and analysis results.
             
             {data_info_str}
             
@@ -534,62 +778,17 @@ class DataAnalysisTool:
             }}
             """
             
-            # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-            # do not change this unless explicitly requested by the user
-            response = openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"},
-                temperature=0.5,
-                max_tokens=2000
-            )
-            
-            # Parse the JSON response
-            ai_insights = json.loads(response.choices[0].message.content)
-            return ai_insights
-            
-        except Exception as e:
-            logger.error(f"Error getting AI insights: {str(e)}")
-            return {"error": str(e)}
-            
-    def generate_data_story(self, title, focus_areas=None):
-        """
-        Generate a cohesive data story using AI.
+    def _story_prompt(self, title, focus_areas=None, token_budget=PROMPT_TOKEN_BUDGET):
+        """Prompt asking for a data story about the analysis results."""
+        data_info_str, _ = build_analysis_context(self.data_summary, self.analysis_results,
+                                                  budget=token_budget, sections=TASK_SECTIONS["story"])
         
-        Args:
-            title (str): Title of the story
-            focus_areas (list, optional): Specific aspects to focus on
-            
-        Returns:
-            dict: AI-generated data story
-        """
-        if self.data is None or self.analysis_results is None:
-            raise ValueError("No data or analysis results available. Run analyze_data first.")
-            
-        try:
-            # Prepare data summary
-            data_info = {
-                "data_summary": self.data_summary,
-                "key_findings": {
-                    "correlations": self.analysis_results.get("correlation", {}).get("strong_correlations", []),
-                    "outliers": self.analysis_results.get("outliers", {}),
-                    "segments": self.analysis_results.get("clusters", {})
-                }
-            }
-            
-            data_info_str = json.dumps(data_info, indent=2)
-            
-            # Truncate if too large for API
-            if len(data_info_str) > 15000:
-                data_info_str = data_info_str[:15000] + "... [truncated]"
-            
-            # Format focus areas if provided
-            focus_content = ""
-            if focus_areas:
-                focus_content = "Please focus particularly on: " + ", ".join(focus_areas)
-            
-            # Use OpenAI to generate a data story
-            prompt = f"""You are a professional data storyteller with expertise in explaining data insights in an engaging way.
+        # Format focus areas if provided
+        focus_content = ""
+        if focus_areas:
+            focus_content = "Please focus particularly on: " + ", ".join(focus_areas)
+        
+        return f"""You are a professional data storyteller with expertise in explaining data insights in an engaging way.
 
             Create a compelling data story from the following analysis:
             
@@ -620,77 +819,46 @@ class DataAnalysisTool:
             }}
             """
             
-            # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-            # do not change this unless explicitly requested by the user
-            response = openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"},
-                temperature=0.7,
-                max_tokens=2000
-            )
-            
-            # Parse the JSON response
-            data_story = json.loads(response.choices[0].message.content)
-            return data_story
-            
-        except Exception as e:
-            logger.error(f"Error generating data story: {str(e)}")
-            return {"error": str(e)}
-            
     def analyze_image_data(self, image_data):
         """
         Analyze data visualized in an image using OpenAI's vision capabilities.
         
         Args:
-            image_data (str): Base64 encoded image string
+            image_data (str or bytes): Base64 encoded image string, data URL or raw bytes
             
         Returns:
             dict: AI analysis of the visualization
         """
         try:
-            # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-            # do not change this unless explicitly requested by the user
-            response = openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "Analyze this data visualization. Explain what it shows, the key patterns or trends, and any insights that can be derived from it. Include any anomalies or interesting points."
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": f"data:image/png;base64,{image_data}"}
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=1000
-            )
-            
-            return {
-                "analysis": response.choices[0].message.content
-            }
+            return analyze_chart_image(prepare_chart(image_data))
             
         except Exception as e:
             logger.error(f"Error analyzing image: {str(e)}")
             return {"error": str(e)}
     
-    def predict(self, target_column, features=None, test_size=0.3, include_categorical=False):
+    def predict(self, target_column, features=None, test_size=0.3, include_categorical=False,
+                engine='random_forest', cv_folds=None, early_stopping=True, sample_rows=None, task=None,
+                owner=None):
         """
         Train a prediction model on the dataset.
         
+        Fitted models are stored in model_registry with their feature
+        encoding; an identical request returns the stored model's results.
+        
         Args:
             target_column (str): Column to predict
             features (list, optional): Specific feature columns to use
             test_size (float): Proportion of data to use for testing
             include_categorical (bool): Whether to include categorical features
+            engine (str): 'random_forest', 'hist_gradient_boosting' or 'linear'
+            cv_folds (int, optional): Also cross-validate with this many folds
+            early_stopping (bool): Early stopping for gradient boosting
+            sample_rows (int, optional): Training row cap; PREDICT_SAMPLE_ROWS by default
+            task (str, optional): 'classification' or 'regression'; inferred if omitted
+            owner (str, optional): Dataset or session the stored model belongs to
             
         Returns:
-            dict: Prediction results
+            dict: Prediction results, with the model_id for batch scoring
         """
         if self.data is None:
             raise ValueError("No data loaded. Please load data first.")
@@ -705,113 +873,116 @@ class DataAnalysisTool:
                 # Use all columns except target
                 features = [col for col in self.data.columns if col != target_column]
             
+            # The same data, target, features and parameters give the same model
+            params = {"test_size": test_size, "include_categorical": include_categorical, "engine": engine,
+                      "cv_folds": cv_folds, "early_stopping": early_stopping,
+                      "sample_rows": sample_rows or PREDICT_SAMPLE_ROWS, "task": task, "random_state": 42}
+            model_id = model_key(owner, self.fingerprint, target_column, features, params)
+            stored = model_registry.get(model_id)
+            if stored is not None:
+                return dict(stored["result"], model_id=model_id, cached=True)
+            
             # Get X and y
-            X = self.data[features].copy()
             y = self.data[target_column]
             
-            # Handle categorical features
-            if include_categorical:
-                # Get categorical columns
-                categorical_cols = X.select_dtypes(include=['object', 'category']).columns.tolist()
-                
-                # Encode categorical variables
-                for col in categorical_cols:
-                    # Skip if too many unique values (>10)
-                    if X[col].nunique() > 10:
-                        X = X.drop(col, axis=1)
-                        continue
-                    
-                    # One-hot encode
-                    dummies = pd.get_dummies(X[col], prefix=col, drop_first=True)
-                    X = pd.concat([X.drop(col, axis=1), dummies], axis=1)
-            else:
-                # Use only numeric features
-                X = X.select_dtypes(include=['number'])
-            
-            # Handle missing values
-            X = X.fillna(X.mean())
+            # Numeric features, plus one-hot encoded categoricals if requested; missing values
+            # are filled with training means. The encoder is stored with the model for scoring.
+            encoder = FeatureEncoder(include_categorical).fit(self.data[features])
+            X = encoder.transform(self.data[features])
             
             # Check if we have features after preprocessing
             if X.empty:
                 return {"error": "No usable features after preprocessing"}
                 
-            # Split data
-            X_train, X_test, y_train, y_test = train_test_split(
-                X, y, test_size=test_size, random_state=42
-            )
-            
-            # Determine if classification or regression problem
-            is_classification = False
-            if y.dtype == 'object' or y.dtype == 'category' or y.nunique() < 10:
-                is_classification = True
-                
-            # Train model
-            if is_classification:
-                model = RandomForestClassifier(n_estimators=100, random_state=42)
-                model.fit(X_train, y_train)
+            ensure_loaded("predict")
+            model, report = train_model(X, y, engine=engine, task=task, test_size=test_size, cv_folds=cv_folds,
+                                        early_stopping=early_stopping,
+                                        sample_rows=sample_rows or PREDICT_SAMPLE_ROWS)
+            result = dict(report, target_column=target_column, features_used=X.columns.tolist())
                 
-                # Evaluate
-                train_score = model.score(X_train, y_train)
-                test_score = model.score(X_test, y_test)
-                
-                # Get predictions
-                y_pred = model.predict(X_test)
-                
-                # Generate classification report
-                report = classification_report(y_test, y_pred, output_dict=True)
-                
-                # Feature importance
-                feature_importance = [
-                    {"feature": col, "importance": float(imp)}
-                    for col, imp in zip(X.columns, model.feature_importances_)
-                ]
-                feature_importance.sort(key=lambda x: x["importance"], reverse=True)
-                
-                return {
-                    "model_type": "classification",
-                    "target_column": target_column,
-                    "features_used": X.columns.tolist(),
-                    "performance": {
-                        "train_accuracy": float(train_score),
-                        "test_accuracy": float(test_score),
-                        "classification_report": report
-                    },
-                    "feature_importance": feature_importance
-                }
-                
-            else:
-                model = RandomForestRegressor(n_estimators=100, random_state=42)
-                model.fit(X_train, y_train)
-                
-                # Evaluate
-                train_score = model.score(X_train, y_train)
-                test_score = model.score(X_test, y_test)
-                
-                # Get predictions
-                y_pred = model.predict(X_test)
-                
-                # Calculate RMSE
-                rmse = float(np.sqrt(mean_squared_error(y_test, y_pred)))
-                
-                # Feature importance
-                feature_importance = [
-                    {"feature": col, "importance": float(imp)}
-                    for col, imp in zip(X.columns, model.feature_importances_)
-                ]
-                feature_importance.sort(key=lambda x: x["importance"], reverse=True)
-                
-                return {
-                    "model_type": "regression",
-                    "target_column": target_column,
-                    "features_used": X.columns.tolist(),
-                    "performance": {
-                        "train_r2": float(train_score),
-                        "test_r2": float(test_score),
-                        "rmse": rmse
-                    },
-                    "feature_importance": feature_importance
-                }
+            # Keep the fitted model and its encoding for batch scoring
+            model_registry.put(model_id, encoder, model, {
+                "owner": owner,
+                "target_column": target_column,
+                "model_type": result["model_type"],
+                "input_columns": encoder.input_columns,
+                "features_used": result["features_used"],
+                "dataset_fingerprint": self.fingerprint,
+                "params": params
+            }, result)
+            return dict(result, model_id=model_id, cached=False)
                 
         except Exception as e:
             logger.error(f"Error in prediction: {str(e)}")
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
+
+def complete_ai_request(ai_request, task="insights"):
+    """
+    Send a request built by DataAnalysisTool.ai_request and parse the reply.
+    
+    Args:
+        ai_request (dict): Output of ai_request()
+        task (str): Task name, for error messages
+        
+    Returns:
+        dict: Parsed JSON reply, or {"error": message}
+    """
+    try:
+        return json.loads(llm_gateway.complete(**ai_request))
+        
+    except Exception as e:
+        logger.error(f"Error getting AI {task}: {str(e)}")
+        return {"error": str(e)}
+
+def analyze_chart_image(chart):
+    """
+    Analysis of a prepared chart image, cached per prompt and image.
+    
+    Args:
+        chart (dict): Output of analysis.images.prepare_chart
+        
+    Returns:
+        dict: {"analysis": text, "cached": bool}
+    """
+    key = chart_cache_key(CHART_PROMPT, chart)
+    cached = chart_cache.get(key)
+    if cached is not None:
+        return {"analysis": cached, "cached": True}
+        
+    # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
+    # do not change this unless explicitly requested by the user
+    analysis = llm_gateway.complete(
+        model="gpt-4o",
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": CHART_PROMPT
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": chart["data_url"]}
+                    }
+                ]
+            }
+        ],
+        max_tokens=1000
+    )
+    chart_cache.put(key, analysis)
+    return {"analysis": analysis, "cached": False}
+
+def run_analysis_stage(snapshot, stage, options):
+    """
+    Run one analysis stage on a data snapshot; entry point for worker processes.
+    
+    Args:
+        snapshot (dict): Output of DataAnalysisTool.snapshot()
+        stage (str): One of ANALYSIS_STAGES
+        options (dict): Keyword arguments for DataAnalysisTool.run_stage
+        
+    Returns:
+        The stage result
+    """
+    return DataAnalysisTool.from_snapshot(snapshot).run_stage(stage, **options)
@@ -20,6 +20,27 @@ def init_db(app):
     # Import models here to avoid circular imports
     from models import User, RideHistory, SavedLocation, UserPreference, FareFactorHistory
     
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Create all database tables."""
+        create_schema(app)
+
+def create_schema(app):
+    """Create all tables if they don't exist.
+    
+    Called once at startup (by the gunicorn master, the dev server or
+    ``flask init-db``) instead of on every import of the app.
+    """
+    with app.app_context():
+        db.create_all()
+
+def dispose_engines(app):
+    """Drop pooled connections inherited from a parent process.
+    
+    Must be called in each worker after fork so that workers never share a
+    socket opened by the preloaded master. ``close=False`` leaves the parent's
+    connections untouched while giving the child a fresh pool.
+    """
     with app.app_context():
-        # Create all tables if they don't exist
-        db.create_all()
\ No newline at end of file
+        for engine in db.engines.values():
+            engine.dispose(close=False)
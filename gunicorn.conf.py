@@ -0,0 +1,153 @@
+"""
+Gunicorn configuration for the taxi fare app.
+
+Gunicorn picks this file up automatically from the working directory, so
+``gunicorn main:app`` runs the production profile. Every setting can be
+overridden through environment variables:
+
+    GUNICORN_BIND           Address to bind (default 0.0.0.0:5000)
+    GUNICORN_WORKERS        Worker processes (default 2 * CPUs + 1)
+    GUNICORN_WORKER_CLASS   sync, gthread, gevent or eventlet (default gthread)
+    GUNICORN_THREADS        Threads per gthread worker (default 4)
+    APP_AI_THREADS          Threads of the single app_ai worker (default 32)
+    GUNICORN_CONNECTIONS    Max concurrent clients per gevent/eventlet worker (default 1000)
+    GUNICORN_TIMEOUT        Worker timeout in seconds (default 60)
+    GUNICORN_MAX_REQUESTS   Requests before a worker is recycled, with 10% jitter (default 0, never)
+    GUNICORN_RELOAD         Set to 1 for development auto-reload (disables preloading)
+
+Worker models and their concurrency per process:
+
+    sync      1 request at a time. Only useful for debugging.
+    gthread   GUNICORN_THREADS requests at a time. Best default: the fare
+              endpoints are short and CPU-light, and SQLAlchemy sessions are
+              thread-scoped.
+    gevent    Up to GUNICORN_CONNECTIONS requests at a time. Only worth it once
+              condition lookups call real external APIs; requires the gevent
+              package and its monkey-patching.
+
+The data analysis app (``gunicorn app_ai:app``) always runs a single worker:
+its analysis jobs, session datasets and their event streams live in the
+memory of the process that created them, so a second worker would answer
+"job not found" for half of the requests. The limit is re-applied whenever
+the worker count changes, so a HUP reload or TTIN cannot raise it.
+
+Its concurrency comes from APP_AI_THREADS and from the analysis process pool
+(ANALYSIS_WORKERS). Every open event stream (job events, streamed AI
+insights and stories) holds one thread until its job or generation
+finishes, so APP_AI_THREADS must cover the expected open streams plus the
+ordinary requests served alongside them.
+
+Total concurrency is workers * (threads or connections). With preload_app the
+master imports the app once and workers share its pages copy-on-write, so
+per-worker RSS is mostly the memory touched after fork. Startup time and
+per-worker RSS are logged by the hooks below.
+"""
+import multiprocessing
+import os
+import time
+
+_started_at = time.monotonic()
+
+
+def _env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def _rss_mb():
+    """Resident set size of the current process in MB, read from /proc."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_CONNECTIONS', 1000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = 5
+reuse_port = True
+
+# Reloading re-imports the app in each worker, which defeats preloading
+reload = _env_bool('GUNICORN_RELOAD')
+preload_app = not reload
+
+# Recycling workers bounds memory growth but drops keep-alive connections
+# (0.10% of requests in the loadtest.py runs), so deployments opt in
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+
+# Apps keeping per-process state that other workers cannot see
+SINGLE_WORKER_APPS = ('app_ai',)
+
+# Modules serving the fare app, which owns the database schema
+FARE_APP_MODULES = ('main', 'app')
+
+# Threads of a single-worker app; each open event stream holds one
+single_worker_threads = int(os.environ.get('APP_AI_THREADS', 32))
+
+
+def _app_module(server):
+    return (getattr(server.app, 'app_uri', None) or '').split(':')[0]
+
+
+def nworkers_changed(server, new_value, old_value):
+    """
+    Keep single-worker apps at one worker.
+
+    Gunicorn calls this whenever the worker count is set: at startup, on
+    every configuration reload (HUP) and on TTIN/TTOU.
+    """
+    if _app_module(server) not in SINGLE_WORKER_APPS:
+        return
+    if server.cfg.threads != single_worker_threads:
+        # Reloads re-read the config file, so the thread count is re-applied with the worker cap
+        server.cfg.set('threads', single_worker_threads)
+    if server.cfg.workers != 1:
+        # A reload spawns cfg.workers new workers before trimming to num_workers
+        server.cfg.set('workers', 1)
+    if new_value != 1:
+        server.log.warning(
+            f"{server.app.app_uri} keeps jobs and datasets in process memory; "
+            f"running 1 worker instead of {new_value}"
+        )
+        # Setting the count calls this hook again with 1, which changes nothing
+        server.num_workers = 1
+
+
+def when_ready(server):
+    """Create the fare schema once in the master and report startup time."""
+    if _app_module(server) in FARE_APP_MODULES:
+        from app import app
+        from database import create_schema
+
+        create_schema(app)
+    server.log.info(
+        f"Master ready in {time.monotonic() - _started_at:.2f}s "
+        f"(preload_app={preload_app}, rss={_rss_mb():.1f} MB)"
+    )
+
+
+def post_fork(server, worker):
+    """Give each fare worker its own connection pool."""
+    if preload_app and _app_module(server) in FARE_APP_MODULES:
+        from app import app
+        from database import dispose_engines
+
+        dispose_engines(app)
+
+
+def post_worker_init(worker):
+    worker.log.info(
+        f"Worker {worker.pid} booted ({worker_class}, rss={_rss_mb():.1f} MB)"
+    )
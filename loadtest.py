@@ -0,0 +1,511 @@
+"""
+Load generator for the taxi fare API.
+
+Starts the real application under gunicorn on localhost (or targets an
+already running server), drives a configurable mix of API requests against it
+and reports throughput, latency percentiles and error rates per endpoint
+together with server CPU and RSS usage.
+
+Examples:
+    python loadtest.py --workers 4 --concurrency 32 --duration 30
+    python loadtest.py --mix /api/fare/estimate=3,/api/ride/history=1
+    python loadtest.py --replay captured_requests.jsonl --url http://127.0.0.1:5000
+"""
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+try:
+    import psutil
+except ImportError:  # psutil is optional, /proc is used as a fallback
+    psutil = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default request mix (relative weights)
+DEFAULT_MIX = {
+    '/api/fare/estimate': 4,
+    '/api/fare/predict': 3,
+    '/api/ride/save': 1,
+    '/api/ride/history': 2,
+}
+
+ENDPOINT_METHODS = {
+    '/api/fare/estimate': 'POST',
+    '/api/fare/predict': 'POST',
+    '/api/fare/quote': 'POST',
+    '/api/ride/save': 'POST',
+    '/api/ride/history': 'GET',
+}
+
+TAXI_TYPES = ['Sedan', 'SUV', 'Electric', 'Luxury']
+LOCATIONS = ['Chennai', 'New York', 'Los Angeles', 'Chicago']
+CURRENCIES = ['INR', 'USD', 'EUR']
+TIMES_OF_DAY = ['early_morning', 'morning_rush', 'day', 'evening_rush', 'evening', 'night']
+
+PERCENTILES = (50, 95, 99)
+
+
+def synthetic_payload(path, rng):
+    """
+    Build a realistic request body for an endpoint.
+
+    Args:
+        path (str): Endpoint path
+        rng (random.Random): Random generator
+
+    Returns:
+        dict: JSON body, or None for GET endpoints
+    """
+    distance = round(rng.uniform(1, 40), 2)
+    duration = round(distance * rng.uniform(2, 4), 1)
+    trip = {
+        'distance': distance,
+        'duration': duration,
+        'taxi_type': rng.choice(TAXI_TYPES),
+        'location': rng.choice(LOCATIONS),
+        'currency': rng.choice(CURRENCIES),
+        'time_of_day': rng.choice(TIMES_OF_DAY),
+    }
+
+    if path in ('/api/fare/predict', '/api/fare/quote'):
+        trip['time_offset'] = rng.choice([15, 30, 60])
+        return trip
+    if path == '/api/ride/save':
+        return {
+            'pickup_location': 'Loadtest pickup',
+            'dropoff_location': 'Loadtest dropoff',
+            'distance': distance,
+            'duration': duration,
+            'taxi_type': trip['taxi_type'],
+            'base_fare': 2.5,
+            'distance_fare': round(distance * 1.5, 2),
+            'time_fare': round(duration * 0.35, 2),
+            'total_fare': round(2.5 + distance * 1.5 + duration * 0.35, 2),
+            'currency': trip['currency'],
+        }
+    if ENDPOINT_METHODS.get(path, 'POST') == 'GET':
+        return None
+    return trip
+
+
+def parse_mix(spec):
+    """Parse a mix specification such as "/api/fare/estimate=3,/api/ride/history=1"."""
+    if not spec:
+        return dict(DEFAULT_MIX)
+
+    mix = {}
+    for item in spec.split(','):
+        path, _, weight = item.partition('=')
+        mix[path.strip()] = float(weight) if weight else 1.0
+    return mix
+
+
+def synthetic_requests(mix, seed=None):
+    """Yield an endless stream of (method, path, body) tuples following the mix."""
+    rng = random.Random(seed)
+    paths = list(mix.keys())
+    weights = [mix[p] for p in paths]
+
+    while True:
+        path = rng.choices(paths, weights=weights, k=1)[0]
+        yield ENDPOINT_METHODS.get(path, 'POST'), path, synthetic_payload(path, rng)
+
+
+def load_replay(file_path):
+    """
+    Load recorded requests from a JSON-lines capture.
+
+    Each line is an object with a "path" and optionally "method" and a
+    "json"/"body" payload. Lines without a path are skipped.
+
+    Args:
+        file_path (str): Path to the capture file
+
+    Returns:
+        list: (method, path, body) tuples in capture order
+    """
+    recorded = []
+    skipped = 0
+
+    with open(file_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            if not isinstance(entry, dict) or not entry.get('path'):
+                skipped += 1
+                continue
+
+            path = entry['path']
+            body = entry.get('json', entry.get('body'))
+            method = entry.get('method') or ENDPOINT_METHODS.get(path, 'POST' if body else 'GET')
+            recorded.append((method.upper(), path, body))
+
+    if skipped:
+        logger.warning(f"Skipped {skipped} lines without a request in {file_path}")
+    if not recorded:
+        raise ValueError(f"No replayable requests found in {file_path}")
+    return recorded
+
+
+def replay_requests(recorded):
+    """Yield the recorded requests in order, looping when exhausted."""
+    while True:
+        for item in recorded:
+            yield item
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100.0 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(len(sorted_values) - 1, rank))]
+
+
+class ProcessMonitor:
+    """Samples CPU time and RSS of a server process and its workers."""
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._clock_ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+        self._page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+    def _pids(self):
+        if psutil is not None:
+            try:
+                parent = psutil.Process(self.pid)
+                return [self.pid] + [child.pid for child in parent.children(recursive=True)]
+            except psutil.Error:
+                return []
+
+        pids = [self.pid]
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+                if int(fields[1]) in pids:
+                    pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+        return pids
+
+    def _read(self, pid):
+        """Return (cpu_seconds, rss_bytes) for a single process."""
+        if psutil is not None:
+            proc = psutil.Process(pid)
+            times = proc.cpu_times()
+            return times.user + times.system, proc.memory_info().rss
+
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / self._clock_ticks
+        rss = int(fields[21]) * self._page_size
+        return cpu, rss
+
+    def sample(self):
+        """Take one sample of total CPU seconds, total RSS and per-process RSS."""
+        cpu_total = 0.0
+        rss = {}
+        for pid in self._pids():
+            try:
+                cpu, rss[pid] = self._read(pid)
+                cpu_total += cpu
+            except Exception:
+                continue
+        return {'time': time.monotonic(), 'cpu': cpu_total, 'rss': rss}
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.samples.append(self.sample())
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self.samples.append(self.sample())
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.samples.append(self.sample())
+
+    def summary(self):
+        """Summarize CPU utilisation and memory over the monitored interval."""
+        if len(self.samples) < 2:
+            return {}
+
+        first, last = self.samples[0], self.samples[-1]
+        elapsed = max(last['time'] - first['time'], 1e-9)
+        peak_total_rss = max(sum(s['rss'].values()) for s in self.samples)
+        worker_rss = [rss for pid, rss in last['rss'].items() if pid != self.pid]
+
+        return {
+            'cpu_seconds': round(last['cpu'] - first['cpu'], 2),
+            'cpu_percent': round((last['cpu'] - first['cpu']) / elapsed * 100, 1),
+            'processes': len(last['rss']),
+            'peak_total_rss_mb': round(peak_total_rss / 1024 / 1024, 1),
+            'master_rss_mb': round(last['rss'].get(self.pid, 0) / 1024 / 1024, 1),
+            'max_worker_rss_mb': round(max(worker_rss) / 1024 / 1024, 1) if worker_rss else 0.0,
+        }
+
+
+def start_server(app='main:app', port=5055, workers=2, worker_class='sync', threads=1,
+                 server='gunicorn', extra_args=None):
+    """
+    Launch the application on localhost and wait for it to accept connections.
+
+    Args:
+        app (str): Application import path
+        port (int): Local port to bind
+        workers (int): Number of worker processes
+        worker_class (str): Gunicorn worker class (sync, gthread, gevent, ...)
+        threads (int): Threads per worker for gthread
+        server (str): "gunicorn" or "uvicorn"
+        extra_args (list, optional): Additional command-line arguments
+
+    Returns:
+        subprocess.Popen: Running server process
+    """
+    if server == 'uvicorn':
+        cmd = [sys.executable, '-m', 'uvicorn', app, '--host', '127.0.0.1',
+               '--port', str(port), '--workers', str(workers), '--no-access-log']
+    else:
+        cmd = [sys.executable, '-m', 'gunicorn', app, '--bind', f'127.0.0.1:{port}',
+               '--workers', str(workers), '--worker-class', worker_class,
+               '--threads', str(threads), '--log-level', 'warning']
+    cmd += extra_args or []
+
+    logger.info(f"Starting server: {' '.join(cmd)}")
+    started = time.monotonic()
+    proc = subprocess.Popen(cmd, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    deadline = started + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited during startup with code {proc.returncode}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                logger.info(f"Server ready in {time.monotonic() - started:.2f}s")
+                return proc
+        except OSError:
+            time.sleep(0.1)
+
+    stop_server(proc)
+    raise RuntimeError("Server did not start within 60 seconds")
+
+
+def stop_server(proc):
+    """Terminate a server started by start_server."""
+    if proc.poll() is None:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+class LoadRunner:
+    """Drives requests from several client threads over keep-alive connections."""
+
+    def __init__(self, base_url, request_source, concurrency=16, duration=None, total=None,
+                 timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.request_source = request_source
+        self.concurrency = concurrency
+        self.duration = duration
+        self.total = total
+        self.timeout = timeout
+        self.results = {}
+        self._lock = threading.Lock()
+        self._issued = 0
+
+    def _next_request(self):
+        with self._lock:
+            if self.total is not None and self._issued >= self.total:
+                return None
+            self._issued += 1
+            return next(self.request_source)
+
+    def _record(self, path, latency, ok):
+        with self._lock:
+            stats = self.results.setdefault(path, {'latencies': [], 'errors': 0})
+            stats['latencies'].append(latency)
+            if not ok:
+                stats['errors'] += 1
+
+    def _worker(self, deadline):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        while deadline is None or time.monotonic() < deadline:
+            item = self._next_request()
+            if item is None:
+                break
+            method, path, body = item
+            payload = json.dumps(body) if body is not None else None
+            headers = {'Content-Type': 'application/json'} if payload is not None else {}
+
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._record(path, time.perf_counter() - start, ok)
+        conn.close()
+
+    def run(self):
+        """Run the load and return the elapsed wall time in seconds."""
+        deadline = time.monotonic() + self.duration if self.duration else None
+        threads = [threading.Thread(target=self._worker, args=(deadline,), daemon=True)
+                   for _ in range(self.concurrency)]
+
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.monotonic() - started
+
+    def report(self, elapsed):
+        """Build the per-endpoint and overall report."""
+        endpoints = {}
+        all_latencies = []
+        total_errors = 0
+
+        for path, stats in sorted(self.results.items()):
+            latencies = sorted(stats['latencies'])
+            all_latencies.extend(latencies)
+            total_errors += stats['errors']
+            endpoints[path] = _latency_summary(latencies, stats['errors'], elapsed)
+
+        overall = _latency_summary(sorted(all_latencies), total_errors, elapsed)
+        return {'elapsed_s': round(elapsed, 2), 'overall': overall, 'endpoints': endpoints}
+
+
+def _latency_summary(latencies, errors, elapsed):
+    count = len(latencies)
+    summary = {
+        'requests': count,
+        'throughput_rps': round(count / elapsed, 1) if elapsed else 0.0,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+    for pct in PERCENTILES:
+        summary[f'p{pct}_ms'] = round(percentile(latencies, pct) * 1000, 2)
+    return summary
+
+
+def format_report(report):
+    """Render a report as a fixed-width table."""
+    header = f"{'endpoint':<24}{'reqs':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'err%':>8}"
+    lines = [header, '-' * len(header)]
+
+    rows = list(report['endpoints'].items()) + [('TOTAL', report['overall'])]
+    for path, s in rows:
+        lines.append(
+            f"{path:<24}{s['requests']:>8}{s['throughput_rps']:>9}{s['p50_ms']:>9}"
+            f"{s['p95_ms']:>9}{s['p99_ms']:>9}{s['max_ms']:>9}{s['error_rate'] * 100:>8.2f}"
+        )
+
+    server = report.get('server')
+    if server:
+        lines.append('')
+        lines.append(
+            f"server: cpu {server['cpu_percent']}% ({server['cpu_seconds']}s), "
+            f"{server['processes']} processes, peak RSS {server['peak_total_rss_mb']} MB, "
+            f"master {server['master_rss_mb']} MB, max worker {server['max_worker_rss_mb']} MB"
+        )
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the taxi fare API.')
+    parser.add_argument('--url', help='Target an already running server instead of starting one')
+    parser.add_argument('--server-pid', type=int, help='PID of the running server to monitor with --url')
+    parser.add_argument('--app', default='main:app', help='Application import path')
+    parser.add_argument('--server', choices=['gunicorn', 'uvicorn'], default='gunicorn')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--worker-class', default='sync')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent client connections')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds to run (ignored with --requests)')
+    parser.add_argument('--requests', type=int, help='Total number of requests to send')
+    parser.add_argument('--mix', help='Comma-separated path=weight list for synthetic traffic')
+    parser.add_argument('--replay', help='JSON-lines capture to replay instead of synthetic traffic')
+    parser.add_argument('--seed', type=int, help='Random seed for synthetic traffic')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        source = replay_requests(load_replay(args.replay))
+    else:
+        source = synthetic_requests(parse_mix(args.mix), seed=args.seed)
+
+    proc = None
+    if args.url:
+        base_url = args.url
+        server_pid = args.server_pid
+    else:
+        proc = start_server(app=args.app, port=args.port, workers=args.workers,
+                            worker_class=args.worker_class, threads=args.threads,
+                            server=args.server)
+        base_url = f'http://127.0.0.1:{args.port}'
+        server_pid = proc.pid
+
+    monitor = ProcessMonitor(server_pid) if server_pid else None
+    try:
+        runner = LoadRunner(base_url, source, concurrency=args.concurrency,
+                            duration=None if args.requests else args.duration,
+                            total=args.requests)
+        if monitor:
+            monitor.start()
+        elapsed = runner.run()
+        if monitor:
+            monitor.stop()
+
+        report = runner.report(elapsed)
+        if monitor:
+            report['server'] = monitor.summary()
+    finally:
+        if proc is not None:
+            stop_server(proc)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+    return report
+
+
+if __name__ == '__main__':
+    main()
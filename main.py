@@ -1,4 +1,6 @@
 from app import app
+from database import create_schema
 
 if __name__ == "__main__":
+    create_schema(app)
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -437,6 +437,9 @@ function updateColumnsTable(columns) {
     document.getElementById('columns-table-loading').classList.add('d-none');
 }
 
+// Analysis job currently streaming results
+let analysisJob = null;
+
 // Run data analysis
 function runAnalysis() {
     // Show loading state
@@ -447,42 +450,129 @@ function runAnalysis() {
     // Switch to analysis tab
     document.getElementById('analysis-tab').click();
     
-    // Run analysis
-    axios.post('/api/analyze')
+    // A new analysis replaces one still running
+    cancelAnalysis();
+    
+    // Start the analysis as a background job; stages arrive as they finish
+    axios.post('/api/jobs')
         .then(function(response) {
-            analysisResults = response.data.results;
-            
-            // Update visualizations
-            updateVisualizations(response.data.plots);
-            
-            // Update correlations
-            updateCorrelations(analysisResults.correlation);
-            
-            // Update outliers
-            updateOutliers(analysisResults.outliers);
-            
-            // Update clusters
-            updateClusters(analysisResults.clusters);
-            
-            // Update feature importance
-            updateFeatureImportance(analysisResults.important_features);
-            
-            // Show results
-            document.getElementById('analysis-loading').classList.add('d-none');
-            document.getElementById('analysis-results').classList.remove('d-none');
+            analysisResults = {};
+            followAnalysisJob(response.data);
         })
-        .catch(function(error) {
-            console.error('Error running analysis:', error);
-            
-            // Hide loading state
-            document.getElementById('analysis-loading').classList.add('d-none');
-            
-            // Show empty state with error
-            document.getElementById('analysis-empty').classList.remove('d-none');
-            
-            // Show alert
-            alert('Error running analysis. Please try again.');
-        });
+        .catch(handleAnalysisError);
+}
+
+// Receive stage results of an analysis job over server-sent events
+function followAnalysisJob(job) {
+    const source = new EventSource(job.events_url);
+    analysisJob = { id: job.job_id, source: source };
+    
+    source.addEventListener('stage', function(event) {
+        const data = JSON.parse(event.data);
+        if (data.status === 'completed') {
+            showStageResult(data.stage, data.result);
+        } else {
+            console.error(`Analysis stage ${data.stage} failed:`, data.error);
+        }
+    });
+    
+    source.addEventListener('status', function(event) {
+        const data = JSON.parse(event.data);
+        if (data.status === 'completed' || data.status === 'failed' || data.status === 'cancelled') {
+            source.close();
+            analysisJob = null;
+            if (Object.keys(analysisResults).length === 0) {
+                handleAnalysisError(new Error(`Analysis ${data.status}`));
+            }
+        }
+    });
+    
+    source.onerror = function() {
+        // The stream was interrupted; fetch whatever has finished and stop listening
+        source.close();
+        axios.get(job.status_url)
+            .then(function(response) {
+                Object.entries(response.data.results).forEach(([stage, result]) => showStageResult(stage, result));
+            })
+            .catch(handleAnalysisError);
+    };
+}
+
+// Render the result of one analysis stage
+function showStageResult(stage, result) {
+    if (stage === 'plots') {
+        updateVisualizations(result);
+    } else {
+        analysisResults[stage] = result;
+        if (stage === 'correlation') updateCorrelations(result);
+        if (stage === 'outliers') updateOutliers(result);
+        if (stage === 'clusters') updateClusters(result);
+        if (stage === 'important_features') updateFeatureImportance(result);
+        showApproximateNote(stage, result);
+    }
+    
+    // Show results as soon as the first stage is in
+    document.getElementById('analysis-loading').classList.add('d-none');
+    document.getElementById('analysis-results').classList.remove('d-none');
+}
+
+// Containers of the stage results
+const STAGE_CONTAINERS = {
+    correlation: 'strong-correlations',
+    outliers: 'outliers-summary',
+    clusters: 'clusters-summary',
+    important_features: 'feature-importance'
+};
+
+// Mark results computed on a sample and offer an exact re-run
+function showApproximateNote(stage, result) {
+    if (!result || result.message) return;
+    const first = Object.values(result)[0];
+    const approximate = result.approximate || (first && first.approximate);
+    const container = document.getElementById(STAGE_CONTAINERS[stage]);
+    if (!approximate || !container) return;
+    
+    const note = document.createElement('div');
+    note.className = 'alert alert-secondary d-flex justify-content-between align-items-center py-2';
+    note.innerHTML = `
+        <small>Estimated from a ${escapeHtml(approximate.sampling)} sample of
+            ${approximate.sample_rows.toLocaleString()} of ${approximate.total_rows.toLocaleString()} rows
+            (${Math.round(approximate.confidence * 100)}% intervals shown)</small>
+        <button class="btn btn-sm btn-outline-primary">Exact</button>
+    `;
+    note.querySelector('button').addEventListener('click', function() {
+        this.disabled = true;
+        refineStage(stage);
+    });
+    container.prepend(note);
+}
+
+// Re-run one stage on every row; its result replaces the approximate one
+function refineStage(stage) {
+    axios.post('/api/jobs', { stages: [stage], approximate: false })
+        .then(response => followAnalysisJob(response.data))
+        .catch(handleAnalysisError);
+}
+
+// Cancel the running analysis job, if any
+function cancelAnalysis() {
+    if (!analysisJob) return;
+    analysisJob.source.close();
+    axios.delete(`/api/jobs/${analysisJob.id}`).catch(() => {});
+    analysisJob = null;
+}
+
+function handleAnalysisError(error) {
+    console.error('Error running analysis:', error);
+    
+    // Hide loading state
+    document.getElementById('analysis-loading').classList.add('d-none');
+    
+    // Show empty state with error
+    document.getElementById('analysis-empty').classList.remove('d-none');
+    
+    // Show alert
+    alert('Error running analysis. Please try again.');
 }
 
 // Update visualizations
@@ -499,12 +589,16 @@ function updateVisualizations(plots) {
         const col = document.createElement('div');
         col.className = 'col-md-6 col-lg-4 mb-4';
         
+        // Images are rendered by the server on first request and cached by the browser
         const img = document.createElement('img');
-        img.src = `data:image/png;base64,${plot.image_data}`;
+        img.src = plot.url;
+        img.loading = 'lazy';
         img.alt = plot.title;
         img.className = 'viz-thumbnail img-fluid mb-2';
         img.setAttribute('data-index', index);
         img.setAttribute('data-title', plot.title);
+        img.setAttribute('data-plot-id', plot.id);
+        img.setAttribute('data-fingerprint', plot.fingerprint);
         
         // Add click handler to open modal
         img.addEventListener('click', function() {
@@ -529,6 +623,8 @@ function openVisualizationModal(imgElement) {
     
     modalTitle.textContent = imgElement.getAttribute('data-title');
     modalImage.src = imgElement.src;
+    modalImage.setAttribute('data-plot-id', imgElement.getAttribute('data-plot-id'));
+    modalImage.setAttribute('data-fingerprint', imgElement.getAttribute('data-fingerprint'));
     
     // Reset analysis
     document.getElementById('viz-analysis-content').classList.add('d-none');
@@ -540,19 +636,38 @@ function openVisualizationModal(imgElement) {
     vizModal.show();
 }
 
+// Longest side of chart images sent for analysis (matches the server default)
+const CHART_MAX_SIDE = 1024;
+
+// Data URL of an image scaled down to fit maxSide, or unchanged if it already fits
+function downscaleImage(img, maxSide) {
+    const scale = maxSide / Math.max(img.naturalWidth, img.naturalHeight);
+    if (!(scale < 1)) {
+        return img.src;
+    }
+    const canvas = document.createElement('canvas');
+    canvas.width = Math.round(img.naturalWidth * scale);
+    canvas.height = Math.round(img.naturalHeight * scale);
+    canvas.getContext('2d').drawImage(img, 0, 0, canvas.width, canvas.height);
+    return canvas.toDataURL('image/png');
+}
+
 // Analyze visualization with AI
 function analyzeVisualization() {
     const modalImage = document.getElementById('viz-modal-image');
-    const imgData = modalImage.src.split(',')[1];
+    
+    // Rendered plots are referenced by ID; the server already has the image.
+    // Inline images are downscaled first, since the server would shrink them anyway.
+    const payload = modalImage.src.startsWith('data:')
+        ? { image_data: downscaleImage(modalImage, CHART_MAX_SIDE) }
+        : { plot_id: modalImage.getAttribute('data-plot-id'), fingerprint: modalImage.getAttribute('data-fingerprint') };
     
     // Show loading state
     document.getElementById('analyze-viz-btn').classList.add('d-none');
     document.getElementById('viz-analysis-loading').classList.remove('d-none');
     
     // Call API to analyze image
-    axios.post('/api/analyze_chart', {
-        image_data: imgData
-    })
+    axios.post('/api/analyze_chart', payload)
     .then(function(response) {
         // Show analysis
         const analysisText = document.getElementById('viz-analysis-text');
@@ -599,6 +714,9 @@ function updateCorrelations(correlationData) {
         const variables = correlation.variables.join(' and ');
         const corrValue = correlation.correlation.toFixed(2);
         const isPositive = correlation.correlation > 0;
+        const interval = correlation.confidence_interval
+            ? ` <small class="text-muted">[${correlation.confidence_interval.map(v => v.toFixed(2)).join(', ')}]</small>`
+            : '';
         const badgeClass = isPositive ? 'correlation-high' : 'correlation-negative';
         
         cardBody.innerHTML = `
@@ -607,7 +725,7 @@ function updateCorrelations(correlationData) {
                     <strong>${escapeHtml(variables)}</strong>
                     <span class="correlation-badge ${badgeClass}">
                         ${isPositive ? '+' : ''}${corrValue}
-                    </span>
+                    </span>${interval}
                 </div>
             </div>
             <p class="mb-0 text-muted">
@@ -776,21 +894,25 @@ function updateFeatureImportance(featureData) {
         const sortedFeatures = [...data.features].sort((a, b) => b.importance - a.importance);
         
         // Get max importance for scaling
-        const maxImportance = sortedFeatures[0].importance;
+        const maxImportance = sortedFeatures[0].importance || 1;
+        
+        // Mutual information has no model, so no score
+        const hasScore = typeof data.model_score === 'number';
         
         accordionHtml += `
             <div class="accordion-item">
                 <h2 class="accordion-header">
                     <button class="accordion-button ${index !== 0 ? 'collapsed' : ''}" type="button" data-bs-toggle="collapse" data-bs-target="#collapse-${index}">
                         <strong>Predicting ${escapeHtml(target)}</strong>
-                        <span class="badge bg-primary ms-2">R² = ${data.model_score.toFixed(3)}</span>
+                        ${hasScore ? `<span class="badge bg-primary ms-2">R² = ${data.model_score.toFixed(3)}</span>` : ''}
                     </button>
                 </h2>
                 <div id="collapse-${index}" class="accordion-collapse collapse ${index === 0 ? 'show' : ''}" data-bs-parent="#feature-importance-accordion">
                     <div class="accordion-body">
+                        ${hasScore ? `
                         <div class="mb-3">
                             <small class="text-muted">Model Score (R²): <strong>${data.model_score.toFixed(3)}</strong></small>
-                        </div>
+                        </div>` : ''}
                         <p class="mb-3">Features ranked by importance:</p>
                         <div class="feature-importance-list">
                             ${sortedFeatures.map(feature => `
@@ -832,10 +954,10 @@ function getInsights() {
     // Switch to insights tab
     document.getElementById('insights-tab').click();
     
-    // Get insights
-    axios.get('/api/insights')
-        .then(function(response) {
-            insightsData = response.data.insights;
+    // Stream insights; the raw model output is previewed until the result is parsed
+    streamAiContent(['insights'], {},
+        function(task, result) {
+            insightsData = result;
             
             // Update insights display
             updateInsightsDisplay(insightsData);
@@ -843,8 +965,8 @@ function getInsights() {
             // Show results
             document.getElementById('insights-loading').classList.add('d-none');
             document.getElementById('insights-results').classList.remove('d-none');
-        })
-        .catch(function(error) {
+        },
+        function(task, error) {
             console.error('Error getting insights:', error);
             
             // Hide loading state
@@ -858,6 +980,44 @@ function getInsights() {
         });
 }
 
+// Stream AI output over server-sent events; calls onResult or onError once per task
+function streamAiContent(tasks, options, onResult, onError) {
+    const params = new URLSearchParams({ tasks: tasks.join(',') });
+    if (options.title) params.set('title', options.title);
+    if (options.focusAreas) params.set('focus_areas', options.focusAreas.join(','));
+    
+    const pending = new Set(tasks);
+    tasks.forEach(task => {
+        const preview = document.getElementById(`${task}-stream`);
+        if (preview) preview.textContent = '';
+    });
+    
+    const source = new EventSource(`/api/ai/stream?${params}`);
+    source.addEventListener('delta', function(event) {
+        const data = JSON.parse(event.data);
+        const preview = document.getElementById(`${data.task}-stream`);
+        if (preview) preview.textContent += data.text;
+    });
+    source.addEventListener('result', function(event) {
+        const data = JSON.parse(event.data);
+        pending.delete(data.task);
+        onResult(data.task, data.result);
+    });
+    source.addEventListener('failed', function(event) {
+        const data = JSON.parse(event.data);
+        pending.delete(data.task);
+        onError(data.task, data.error);
+    });
+    source.addEventListener('done', () => source.close());
+    source.onerror = function() {
+        // Connection failed or was refused (e.g. no analysis yet); fail what is still pending
+        source.close();
+        pending.forEach(task => onError(task, 'Connection to the AI stream failed'));
+        pending.clear();
+    };
+    return source;
+}
+
 // Update insights display
 function updateInsightsDisplay(insights) {
     // Update key insights list
@@ -989,33 +1149,30 @@ function generateStory() {
         storyModal.hide();
     }
     
-    // Generate story
-    axios.post('/api/story', {
-        title: title,
-        focus_areas: focusAreas.length > 0 ? focusAreas : null
-    })
-    .then(function(response) {
-        storyData = response.data.story;
-        
-        // Update story display
-        updateStoryDisplay(storyData, title);
-        
-        // Show results
-        document.getElementById('story-loading').classList.add('d-none');
-        document.getElementById('story-results').classList.remove('d-none');
-    })
-    .catch(function(error) {
-        console.error('Error generating story:', error);
-        
-        // Hide loading state
-        document.getElementById('story-loading').classList.add('d-none');
-        
-        // Show empty state with error
-        document.getElementById('story-empty').classList.remove('d-none');
-        
-        // Show alert
-        alert('Error generating data story. Please try again.');
-    });
+    // Stream the story; the raw model output is previewed until the result is parsed
+    streamAiContent(['story'], { title: title, focusAreas: focusAreas.length > 0 ? focusAreas : null },
+        function(task, result) {
+            storyData = result;
+            
+            // Update story display
+            updateStoryDisplay(storyData, title);
+            
+            // Show results
+            document.getElementById('story-loading').classList.add('d-none');
+            document.getElementById('story-results').classList.remove('d-none');
+        },
+        function(task, error) {
+            console.error('Error generating story:', error);
+            
+            // Hide loading state
+            document.getElementById('story-loading').classList.add('d-none');
+            
+            // Show empty state with error
+            document.getElementById('story-empty').classList.remove('d-none');
+            
+            // Show alert
+            alert('Error generating data story. Please try again.');
+        });
 }
 
 // Update story display
@@ -1167,6 +1324,8 @@ function buildModel() {
     
     const testSize = parseFloat(document.getElementById('test-size').value);
     const includeCategorical = document.getElementById('include-categorical').checked;
+    const engine = document.getElementById('model-engine').value;
+    const cvFolds = document.getElementById('cv-folds').value;
     
     // Close modal
     const modelModal = bootstrap.Modal.getInstance(document.getElementById('model-modal'));
@@ -1187,7 +1346,9 @@ function buildModel() {
         target_column: targetColumn,
         features: features.length > 0 ? features : null,
         test_size: testSize,
-        include_categorical: includeCategorical
+        include_categorical: includeCategorical,
+        engine: engine,
+        cv_folds: cvFolds ? parseInt(cvFolds) : null
     })
     .then(function(response) {
         modelResults = response.data.results;
@@ -1218,6 +1379,24 @@ function buildModel() {
     });
 }
 
+// Engine, rows and training time of a model, plus cross-validation if it ran
+function formatModelTiming(model) {
+    if (!model.engine) {
+        return '';
+    }
+    const perf = model.performance;
+    let text = `${model.engine.replace(/_/g, ' ')} on ${model.rows_used.toLocaleString()}`;
+    if (model.rows_used < model.rows_total) {
+        text += ` of ${model.rows_total.toLocaleString()}`;
+    }
+    text += ` rows, trained in ${perf.fit_seconds.toFixed(2)}s`;
+    if (perf.cross_validation) {
+        const cv = perf.cross_validation;
+        text += `; ${cv.folds}-fold CV ${cv.mean.toFixed(3)} ± ${cv.std.toFixed(3)} (${cv.seconds.toFixed(2)}s)`;
+    }
+    return model.cached ? text + ' (stored model)' : text;
+}
+
 // Update model display
 function updateModelDisplay(model) {
     const container = document.getElementById('models-results');
@@ -1309,6 +1488,7 @@ function updateModelDisplay(model) {
     overviewBody.innerHTML = `
         <div class="mb-3">
             <small class="text-muted">Model predicts <strong>${escapeHtml(model.target_column)}</strong> using ${model.features_used.length} features</small>
+            <small class="text-muted d-block">${escapeHtml(formatModelTiming(model))}</small>
         </div>
         ${performanceMetrics}
         <h5 class="mb-3">Model Evaluation</h5>